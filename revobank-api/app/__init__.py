@@ -1,35 +1,128 @@
 import os
 import logging
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
 from flask_migrate import Migrate
 from dotenv import load_dotenv
 from werkzeug.exceptions import HTTPException
-from app.middleware.logger_middleware import LoggerMiddleware
+from werkzeug.middleware.proxy_fix import ProxyFix
+from app.middleware.compression import CompressionMiddleware
+from app.middleware.query_counter import init_query_counter
+from app.middleware.pool_stats import init_pool_stats
+from app.middleware.metrics import init_metrics
+from app.middleware.access_log import init_access_log
+from app.middleware.sql_profiler import init_sql_profiler
+from app.middleware.read_replica import RoutingSession, init_read_replica
+from app.middleware.rate_limit import init_rate_limiter
+from app.serialization import init_json
 
 # Load environment variables from .env file
 load_dotenv()
 
 # Initialize extensions
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 jwt = JWTManager()
 migrate = Migrate()
 
-def create_app(config_name=None):
+def create_app(config_name=None, config=None):
+    """Build the app; config overrides settings from the environment, e.g. in tests"""
     app = Flask(__name__)
 
     # Base configuration
     app.config.update(
         SQLALCHEMY_TRACK_MODIFICATIONS=False,
         JWT_ALGORITHM="HS256",
-        JWT_SECRET_KEY=os.getenv('JWT_SECRET_KEY', 'fallback-secret-key')
+        JWT_SECRET_KEY=os.getenv('JWT_SECRET_KEY', 'fallback-secret-key'),
+        # Keyset pagination for transaction history
+        TRANSACTIONS_PAGE_SIZE=int(os.getenv('TRANSACTIONS_PAGE_SIZE', '50')),
+        TRANSACTIONS_MAX_PAGE_SIZE=int(os.getenv('TRANSACTIONS_MAX_PAGE_SIZE', '200')),
+        TRANSACTIONS_BATCH_MAX_SIZE=int(os.getenv('TRANSACTIONS_BATCH_MAX_SIZE', '1000')),
+        # Idempotency-Key replay window, how long a duplicate waits for the original,
+        # and how long a claim holds before a retry may take it over (keep it
+        # above the worker timeout, or a slow original can run twice)
+        IDEMPOTENCY_KEY_TTL=int(os.getenv('IDEMPOTENCY_KEY_TTL', '86400')),
+        IDEMPOTENCY_WAIT_TIMEOUT=float(os.getenv('IDEMPOTENCY_WAIT_TIMEOUT', '10')),
+        IDEMPOTENCY_LOCK_TIMEOUT=int(os.getenv('IDEMPOTENCY_LOCK_TIMEOUT', '120')),
+        # Balance checkpoints: postings between intra-day checkpoints, and how
+        # recent a transaction can be and still be included
+        BALANCE_CHECKPOINT_INTERVAL=int(os.getenv('BALANCE_CHECKPOINT_INTERVAL', '500')),
+        BALANCE_CHECKPOINT_GRACE=int(os.getenv('BALANCE_CHECKPOINT_GRACE', '60')),
+        # N+1 detector: off unless QUERY_COUNT_MODE is 'warn' or 'raise'
+        QUERY_COUNT_MODE=os.getenv('QUERY_COUNT_MODE'),
+        QUERY_COUNT_LIMIT=int(os.getenv('QUERY_COUNT_LIMIT', '20')),
+        LAZY_LOAD_LIMIT=int(os.getenv('LAZY_LOAD_LIMIT', '0')),
+        # Encode responses with orjson when it is installed
+        FAST_JSON=os.getenv('FAST_JSON', 'true').lower() == 'true',
+        # Response compression: off when a proxy in front already compresses
+        COMPRESS_RESPONSES=os.getenv('COMPRESS_RESPONSES', 'true').lower() == 'true',
+        COMPRESS_MIN_SIZE=int(os.getenv('COMPRESS_MIN_SIZE', '1024')),
+        COMPRESS_GZIP_LEVEL=int(os.getenv('COMPRESS_GZIP_LEVEL', '6')),
+        COMPRESS_BROTLI_QUALITY=int(os.getenv('COMPRESS_BROTLI_QUALITY', '4')),
+        # Token bucket rate limits per user (or IP) and blueprint; use the
+        # sqlite storage to share buckets between gunicorn workers
+        RATE_LIMIT_ENABLED=os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true',
+        RATE_LIMIT_STORAGE=os.getenv('RATE_LIMIT_STORAGE', 'memory'),
+        RATE_LIMITS=os.getenv('RATE_LIMITS', 'auth=10/minute;transactions=120/minute'),
+        RATE_LIMIT_DEFAULT=os.getenv('RATE_LIMIT_DEFAULT', '300/minute'),
+        RATE_LIMIT_BY_ADDRESS=set(os.getenv('RATE_LIMIT_BY_ADDRESS', 'auth').split(',')),
+        # Proxies in front of the app whose X-Forwarded-For/-Proto are trusted
+        # (1 on Koyeb); client addresses feed the rate limits and access log
+        TRUSTED_PROXY_COUNT=int(os.getenv('TRUSTED_PROXY_COUNT', '0')),
+        # Revoked token blocklist: filter size, false positive rate and how
+        # often other workers' revocations are picked up
+        TOKEN_BLOCKLIST_CAPACITY=int(os.getenv('TOKEN_BLOCKLIST_CAPACITY', '100000')),
+        TOKEN_BLOCKLIST_ERROR_RATE=float(os.getenv('TOKEN_BLOCKLIST_ERROR_RATE', '0.01')),
+        TOKEN_BLOCKLIST_REFRESH=float(os.getenv('TOKEN_BLOCKLIST_REFRESH', '5')),
+        # Password hashing: werkzeug method string, and the process pool that
+        # runs it (0 workers hashes inline). Logins beyond the queue get a 503.
+        PASSWORD_HASH_METHOD=os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1'),
+        PASSWORD_HASH_WORKERS=int(os.getenv('PASSWORD_HASH_WORKERS', '2')),
+        PASSWORD_HASH_QUEUE=int(os.getenv('PASSWORD_HASH_QUEUE', '8')),
+        PASSWORD_HASH_TIMEOUT=float(os.getenv('PASSWORD_HASH_TIMEOUT', '10')),
+        # ASGI serving (app.asgi): read endpoints on async engines, derived
+        # from the database and replica URIs unless ASYNC_DATABASE_URI or
+        # ASYNC_REPLICA_DATABASE_URI is set, and threads for the requests
+        # handed to the WSGI app
+        ASYNC_READS=os.getenv('ASYNC_READS', 'true').lower() == 'true',
+        ASYNC_DATABASE_URI=os.getenv('ASYNC_DATABASE_URI'),
+        ASYNC_REPLICA_DATABASE_URI=os.getenv('ASYNC_REPLICA_DATABASE_URI'),
+        ASYNC_WSGI_THREADS=int(os.getenv('ASYNC_WSGI_THREADS', '8')),
+        # Read replica (set from DB_REPLICA_HOST): blueprints whose GET requests
+        # read from it, and seconds a user reads from the primary after a write,
+        # remembered per worker ('memory') or per host ('sqlite:///path')
+        REPLICA_DATABASE_URI=None,
+        REPLICA_BLUEPRINTS=set(os.getenv(
+            'REPLICA_BLUEPRINTS', 'accounts,transactions,bills,budgets,transaction_categories'
+        ).split(',')),
+        REPLICA_READ_YOUR_WRITES=int(os.getenv('REPLICA_READ_YOUR_WRITES', '5')),
+        REPLICA_WRITES_STORAGE=os.getenv('REPLICA_WRITES_STORAGE', os.getenv('RATE_LIMIT_STORAGE', 'memory')),
+        # Prometheus metrics on /metrics; set METRICS_DIR to a directory shared
+        # by the gunicorn workers to report their sum
+        METRICS_ENABLED=os.getenv('METRICS_ENABLED', 'true').lower() == 'true',
+        METRICS_DIR=os.getenv('METRICS_DIR'),
+        # JSON access log on stdout: records allowed to wait for the writer
+        # thread, and sampling of successful requests, e.g.
+        # "accounts.get_all_accounts=0.1;transactions.get_all_transactions=0.1"
+        ACCESS_LOG_ENABLED=os.getenv('ACCESS_LOG_ENABLED', 'true').lower() == 'true',
+        ACCESS_LOG_QUEUE_SIZE=int(os.getenv('ACCESS_LOG_QUEUE_SIZE', '10000')),
+        ACCESS_LOG_SAMPLING=os.getenv('ACCESS_LOG_SAMPLING', ''),
+        # SQL profiling: Server-Timing header (for debugging, it reveals
+        # timings to clients), slow-query log and EXPLAIN thresholds in ms
+        SQL_PROFILING=os.getenv('SQL_PROFILING', 'false').lower() == 'true',
+        SLOW_QUERY_MS=float(os.getenv('SLOW_QUERY_MS', '200')),
+        SLOW_QUERY_EXPLAIN_MS=float(os.getenv('SLOW_QUERY_EXPLAIN_MS', '0')),
+        # Clients allowed to call /metrics and the /internal endpoints
+        INTERNAL_ALLOWED_IPS=set(os.getenv('INTERNAL_ALLOWED_IPS', '127.0.0.1,::1').split(','))
     )
 
     # Database configuration
     if config_name == 'testing':
         app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
         app.config['TESTING'] = True
+        app.config['QUERY_COUNT_MODE'] = 'raise'
+        app.config['RATE_LIMIT_ENABLED'] = False
+        app.config['PASSWORD_HASH_WORKERS'] = 0
     else:
         ssl_mode = os.getenv('DB_SSL_MODE', 'require')
         connection_str = (
@@ -38,15 +131,43 @@ def create_app(config_name=None):
             f"?sslmode={ssl_mode}"
         )
         app.config['SQLALCHEMY_DATABASE_URI'] = connection_str
+        if os.getenv('DB_REPLICA_HOST'):
+            app.config['REPLICA_DATABASE_URI'] = (
+                f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}"
+                f"@{os.getenv('DB_REPLICA_HOST')}:{os.getenv('DB_REPLICA_PORT', os.getenv('DB_PORT', '5432'))}"
+                f"/{os.getenv('DB_NAME')}?sslmode={ssl_mode}"
+            )
+        # Per engine and worker process. Every engine has a pool of its own:
+        # the primary's, the replica's (on the replica server) and, under
+        # ASGI, the async engine's, which is also on the primary. Keep
+        # workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW, plus the async pool
+        # under ASGI) below the server's max_connections, see GET /internal/pool
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            'pool_size': int(os.getenv('DB_POOL_SIZE', '5')),
+            'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '10')),
+            'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', '30')),
+            'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '1800')),
+            'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true',
+        }
+        app.config['ASYNC_ENGINE_OPTIONS'] = {
+            **app.config['SQLALCHEMY_ENGINE_OPTIONS'],
+            'pool_size': int(os.getenv('DB_ASYNC_POOL_SIZE', os.getenv('DB_POOL_SIZE', '5'))),
+            'max_overflow': int(os.getenv('DB_ASYNC_MAX_OVERFLOW', os.getenv('DB_MAX_OVERFLOW', '10'))),
+        }
         app.logger.info(f"Connecting to database at {os.getenv('DB_HOST')} with SSL mode: {ssl_mode}")
 
+    if config:
+        app.config.update(config)
+
     # Global error handlers
     @app.errorhandler(HTTPException)
     def handle_exception(e):
+        # Keep headers such as Retry-After and Allow, the body is JSON instead
+        headers = [(name, value) for name, value in e.get_headers() if name.lower() != 'content-type']
         return jsonify({
             'description': e.description,
             'code': e.code
-        }), e.code
+        }), e.code, headers
 
     @app.errorhandler(Exception)
     def handle_generic_exception(e):
@@ -57,9 +178,17 @@ def create_app(config_name=None):
             'code': 500
         }), 500
 
-    # Initialize extensions
+    # Initialize extensions (metrics and access log first, so their timers cover the other hooks)
+    init_metrics(app)
+    init_access_log(app)
+    init_sql_profiler(app)
     db.init_app(app)
     jwt.init_app(app)
+    init_query_counter(app)
+    init_pool_stats(app, db)
+    init_read_replica(app)
+    init_rate_limiter(app)
+    init_json(app)
 
     # Import models in proper order
     from app.models.user import User
@@ -68,6 +197,19 @@ def create_app(config_name=None):
     from app.models.transaction import Transaction
     from app.models.budget import Budget
     from app.models.bill import Bill
+    from app.models.idempotency_key import IdempotencyKey
+    from app.models.balance_checkpoint import BalanceCheckpoint
+    from app.models.transaction_rollup import TransactionRollup
+    from app.models.collection_version import CollectionVersion
+    from app.models.token_revocation import TokenRevocation
+
+    # Reject revoked access tokens
+    from app.services.revocation import init_token_blocklist
+    init_token_blocklist(app)
+
+    # Keep collection ETags in step with every ORM write
+    from app.services.conditional import track_collection_versions
+    track_collection_versions()
 
     # Initialize migrations after models are imported
     migrate.init_app(app, db)
@@ -79,6 +221,7 @@ def create_app(config_name=None):
     from app.routes.budgets import budgets_bp      # New: Budget Management endpoints
     from app.routes.bills import bills_bp          # New: Bill Payment Management endpoints
     from app.routes.transaction_categories import transaction_categories_bp  # New: Transaction Categories endpoints
+    from app.routes.internal import internal_bp, metrics_bp
 
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(accounts_bp, url_prefix='/api/accounts')
@@ -86,11 +229,32 @@ def create_app(config_name=None):
     app.register_blueprint(budgets_bp, url_prefix='/api/budgets')
     app.register_blueprint(bills_bp, url_prefix='/api/bills')
     app.register_blueprint(transaction_categories_bp, url_prefix='/api/transactions/categories')
+    app.register_blueprint(internal_bp, url_prefix='/internal')
+    app.register_blueprint(metrics_bp, url_prefix='/metrics')
 
-    # Add middleware (example: logging each request)
-    @app.before_request
-    def before_request_middleware():
-        app.logger.info(f"Incoming request: {request.method} {request.path}")
+    # CLI commands
+    from app.commands import (
+        checkpoint_balances_command, rebuild_rollups_command, prune_revoked_tokens_command,
+        prune_idempotency_keys_command, import_users_command
+    )
+    app.cli.add_command(checkpoint_balances_command)
+    app.cli.add_command(rebuild_rollups_command)
+    app.cli.add_command(prune_revoked_tokens_command)
+    app.cli.add_command(prune_idempotency_keys_command)
+    app.cli.add_command(import_users_command)
+
+    if app.config['TRUSTED_PROXY_COUNT']:
+        app.wsgi_app = ProxyFix(
+            app.wsgi_app, x_for=app.config['TRUSTED_PROXY_COUNT'], x_proto=app.config['TRUSTED_PROXY_COUNT']
+        )
+
+    if app.config['COMPRESS_RESPONSES']:
+        app.wsgi_app = CompressionMiddleware(
+            app.wsgi_app,
+            min_size=app.config['COMPRESS_MIN_SIZE'],
+            gzip_level=app.config['COMPRESS_GZIP_LEVEL'],
+            brotli_quality=app.config['COMPRESS_BROTLI_QUALITY']
+        )
 
     # Root route
     @app.route('/')
@@ -111,8 +275,6 @@ def create_app(config_name=None):
 # Expose the app for Gunicorn
 app = create_app()
 
-app.wsgi_app = LoggerMiddleware(app.wsgi_app)
-
 # Use Gunicorn's logger if not running as __main__
 if __name__ != '__main__':
     gunicorn_logger = logging.getLogger('gunicorn.error')
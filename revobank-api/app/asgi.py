@@ -0,0 +1,283 @@
+# ASGI serving mode: read endpoints on an async engine, everything else on the Flask app
+import asyncio
+import contextvars
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from flask_jwt_extended import verify_jwt_in_request
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from werkzeug.exceptions import HTTPException
+from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.routing import Map, Rule
+from app.middleware.compression import CompressionMiddleware
+from app.middleware.pool_stats import PoolStats
+from app.middleware.read_replica import reads_from_replica
+
+# Backend -> async driver used for it
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+}
+
+def async_database_uri(uri):
+    """The async driver URL for a synchronous database URI"""
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver for {backend!r}, set ASYNC_DATABASE_URI")
+    if backend == 'sqlite' and url.database in (None, '', ':memory:'):
+        raise ValueError("An in-memory SQLite database cannot be shared with an async engine")
+    url = url.set(drivername=ASYNC_DRIVERS[backend])
+    if backend == 'postgresql' and 'sslmode' in url.query:
+        # asyncpg takes the libpq sslmode values as "ssl"
+        query = dict(url.query)
+        query['ssl'] = query.pop('sslmode')
+        url = url.set(query=query)
+    return url
+
+class AsyncReadApp:
+    """ASGI application for the Flask app
+
+    GET requests for the endpoints in app.routes.async_reads are handled on
+    the event loop: their queries are awaited on an async engine, so a
+    single process serves many slow or concurrent reads without a thread
+    each. They still run inside a Flask request context with the app's own
+    before/after request hooks, JWT checks, error handlers and response
+    compression, and return the same responses as the Flask views. With
+    REPLICA_DATABASE_URI set they read from an async engine on the replica
+    under the same rules as db.session (see app.middleware.read_replica).
+
+    Every other request (writes, exports, auth) is passed to the WSGI app
+    on a pool of ASYNC_WSGI_THREADS threads, as a threaded server would.
+    """
+    def __init__(self, flask_app):
+        from app.routes.async_reads import ASYNC_ROUTES
+
+        config = flask_app.config
+        self.flask_app = flask_app
+        self.wsgi_app = flask_app.wsgi_app
+        self.handlers = ASYNC_ROUTES if config['ASYNC_READS'] else {}
+        self.urls = Map([Rule(rule, endpoint=rule, methods=['GET']) for rule in self.handlers])
+        engine_options = config.get('ASYNC_ENGINE_OPTIONS', config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+        self.engine = create_async_engine(
+            config['ASYNC_DATABASE_URI'] or async_database_uri(config['SQLALCHEMY_DATABASE_URI']),
+            **engine_options
+        )
+        flask_app.extensions['pool_stats']['async'] = PoolStats(self.engine.sync_engine)
+        self.replica_engine = None
+        if config['REPLICA_DATABASE_URI']:
+            self.replica_engine = create_async_engine(
+                config['ASYNC_REPLICA_DATABASE_URI'] or async_database_uri(config['REPLICA_DATABASE_URI']),
+                **engine_options
+            )
+            flask_app.extensions['pool_stats']['async_replica'] = PoolStats(self.replica_engine.sync_engine)
+        self.threads = ThreadPoolExecutor(config['ASYNC_WSGI_THREADS'], thread_name_prefix='wsgi')
+        self.fix_environ = None
+        if config['TRUSTED_PROXY_COUNT']:
+            # The same client address rewrite as the ProxyFix around the WSGI app; it edits the environ in place
+            hops = config['TRUSTED_PROXY_COUNT']
+            self.fix_environ = ProxyFix(lambda environ, start_response: None, x_for=hops, x_proto=hops)
+
+        def send_response(environ, start_response):
+            return environ['revobank.response'](environ, start_response)
+        self.send_response = send_response
+        if config['COMPRESS_RESPONSES']:
+            self.send_response = CompressionMiddleware(
+                send_response,
+                min_size=config['COMPRESS_MIN_SIZE'],
+                gzip_level=config['COMPRESS_GZIP_LEVEL'],
+                brotli_quality=config['COMPRESS_BROTLI_QUALITY']
+            )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError(f"Unsupported ASGI scope type {scope['type']!r}")
+
+        environ = _environ(scope, await _read_body(receive))
+        handler = view_args = None
+        if scope['method'] == 'GET' and self.handlers:
+            try:
+                rule, view_args = self.urls.bind_to_environ(environ).match()
+                handler = self.handlers[rule]
+            except HTTPException:
+                # No async handler (or a redirect): the Flask app decides
+                pass
+
+        if handler is None:
+            await self._call_wsgi(environ, send)
+        else:
+            if self.fix_environ is not None:
+                self.fix_environ(environ, None)
+            response = await self._dispatch(environ, handler, view_args)
+            await self._send(environ, response, send)
+
+    async def _dispatch(self, environ, handler, view_args):
+        """Flask's full_dispatch_request around an async handler
+
+        The request gets a context of its own. Its synchronous parts
+        (request hooks, token check, error handlers, teardown) can wait on
+        the database, so they run in that context on the thread pool; only
+        the handler runs on the event loop, where a slow query in one of
+        them cannot hold up other requests.
+        """
+        app = self.flask_app
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        request_context = app.request_context(environ)
+        engine = self.engine
+
+        def in_thread(function, *args):
+            return loop.run_in_executor(self.threads, context.run, function, *args)
+
+        def preprocess():
+            nonlocal engine
+            rv = app.preprocess_request()
+            if rv is None:
+                verify_jwt_in_request()
+                # Needs the token, and may read the shared recent-writes file
+                if self.replica_engine is not None and reads_from_replica():
+                    engine = self.replica_engine
+            return rv
+
+        await in_thread(request_context.push)
+        try:
+            try:
+                try:
+                    rv = await in_thread(preprocess)
+                    if rv is None:
+                        rv = await loop.create_task(self._handle(engine, handler, view_args), context=context)
+                except Exception as e:
+                    rv = await in_thread(app.handle_user_exception, e)
+                return await in_thread(app.finalize_request, rv)
+            except Exception as e:
+                return await in_thread(app.handle_exception, e)
+        finally:
+            await in_thread(request_context.pop)
+
+    async def _handle(self, engine, handler, view_args):
+        async with engine.connect() as connection:
+            return await handler(connection, **view_args)
+
+    async def _send(self, environ, response, send):
+        environ['revobank.response'] = response
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started.update(status=status, headers=headers)
+
+        # The body is already in memory, compressing it does not block for long
+        body = self.send_response(environ, start_response)
+        try:
+            chunks = [chunk for chunk in body if chunk]
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+        await send(_start_message(started['status'], started['headers']))
+        await send({'type': 'http.response.body', 'body': b''.join(chunks), 'more_body': False})
+
+    async def _call_wsgi(self, environ, send):
+        """Run the WSGI app on the thread pool, streaming its body back to the client"""
+        loop = asyncio.get_running_loop()
+
+        def send_now(message):
+            # Waits for the client to take the message, so slow readers apply back-pressure
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        def run():
+            pending = {}
+
+            def start_response(status, headers, exc_info=None):
+                pending['start'] = _start_message(status, headers)
+                return write
+
+            def write(data):
+                if data:
+                    send_body(data, more_body=True)
+
+            def send_body(data, more_body):
+                if 'start' in pending:
+                    send_now(pending.pop('start'))
+                send_now({'type': 'http.response.body', 'body': data, 'more_body': more_body})
+
+            body = self.wsgi_app(environ, start_response)
+            try:
+                for chunk in body:
+                    write(chunk)
+            finally:
+                if hasattr(body, 'close'):
+                    body.close()
+            send_body(b'', more_body=False)
+
+        await loop.run_in_executor(self.threads, run)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.engine.dispose()
+                if self.replica_engine is not None:
+                    await self.replica_engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+def create_asgi_app(config_name=None):
+    """Application factory for ASGI servers: uvicorn --factory app.asgi:create_asgi_app"""
+    from app import create_app
+    return AsyncReadApp(create_app(config_name))
+
+async def _read_body(receive):
+    body = bytearray()
+    while True:
+        message = await receive()
+        if message['type'] != 'http.request':
+            break
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            break
+    return bytes(body)
+
+def _environ(scope, body):
+    """WSGI environ (PEP 3333) for an ASGI http scope"""
+    script_name = scope.get('root_path', '')
+    path = scope['path']
+    if script_name and path.startswith(script_name):
+        path = path[len(script_name):]
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': script_name.encode().decode('latin1'),
+        'PATH_INFO': path.encode().decode('latin1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        # The whole body has been read, so it can be used without a Content-Length
+        'wsgi.input_terminated': True,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin1').upper().replace('-', '_')
+        key = name if name in ('CONTENT_TYPE', 'CONTENT_LENGTH') else f'HTTP_{name}'
+        value = value.decode('latin1')
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+def _start_message(status, headers):
+    return {
+        'type': 'http.response.start',
+        'status': int(status.split(' ', 1)[0]),
+        'headers': [(name.lower().encode('latin1'), value.encode('latin1')) for name, value in headers],
+    }
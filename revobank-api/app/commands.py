@@ -0,0 +1,55 @@
+# Flask CLI commands (run with `flask <command>`)
+import click
+from flask.cli import with_appcontext
+from app.services.balances import write_checkpoints
+from app.services.idempotency import prune_idempotency_keys
+from app.services.revocation import prune_revocations
+from app.services.rollups import rebuild_rollups
+from app.services.user_import import read_users, import_users
+
+@click.command('checkpoint-balances')
+@click.option('--min-postings', type=int, default=None,
+              help='New transactions that make an account due before the next day boundary.')
+@with_appcontext
+def checkpoint_balances_command(min_postings):
+    """Write balance checkpoints for accounts that are due one"""
+    written = write_checkpoints(min_postings=min_postings)
+    click.echo(f"Wrote {written} balance checkpoints")
+
+@click.command('rebuild-rollups')
+@click.option('--account-id', type=int, default=None, help='Only rebuild this account.')
+@with_appcontext
+def rebuild_rollups_command(account_id):
+    """Recompute monthly transaction rollups from the transactions table"""
+    written = rebuild_rollups(account_id=account_id)
+    click.echo(f"Wrote {written} rollup rows")
+
+@click.command('prune-revoked-tokens')
+@with_appcontext
+def prune_revoked_tokens_command():
+    """Delete token revocations whose tokens have expired"""
+    deleted = prune_revocations()
+    click.echo(f"Deleted {deleted} expired token revocations")
+
+@click.command('prune-idempotency-keys')
+@with_appcontext
+def prune_idempotency_keys_command():
+    """Delete Idempotency-Key records past their replay window"""
+    deleted = prune_idempotency_keys()
+    click.echo(f"Deleted {deleted} expired idempotency keys")
+
+@click.command('import-users')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'ndjson']), default=None,
+              help='Input format; guessed from the file extension by default.')
+@click.option('--batch-size', type=int, default=1000, help='Users per INSERT and commit.')
+@click.option('--workers', type=int, default=None, help='Password hashing processes (default: all CPUs).')
+@with_appcontext
+def import_users_command(path, file_format, batch_size, workers):
+    """Bulk-import users (username, email, password) from CSV or NDJSON"""
+    file_format = file_format or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+    with open(path, newline='', encoding='utf-8') as stream:
+        imported, duplicates, rejected = import_users(read_users(stream, file_format), batch_size, workers)
+    for line_number, reason in rejected:
+        click.echo(f"Line {line_number}: {reason}", err=True)
+    click.echo(f"Imported {imported} users, skipped {duplicates} existing, rejected {len(rejected)} invalid")
@@ -0,0 +1,129 @@
+# Structured access log: one JSON line per request, written off the request thread
+import atexit
+import json
+import logging
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from flask import g, request
+from flask_jwt_extended import get_jwt_identity
+
+logger = logging.getLogger('revobank.access')
+
+# Incoming X-Request-ID values are kept if they look like an id
+REQUEST_ID_PATTERN = re.compile(r'[A-Za-z0-9._:-]{1,128}')
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records when the queue is full instead of blocking"""
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: its time and the `fields` passed as extra"""
+    def format(self, record):
+        created = datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds')
+        fields = getattr(record, 'fields', None)
+        if fields is None:
+            fields = {'logger': record.name, 'level': record.levelname, 'message': record.getMessage()}
+        return json.dumps({'time': created, **fields}, default=str)
+
+def parse_sampling(value):
+    """'accounts.get_all_accounts=0.1;...' -> {endpoint: share of successful requests logged}"""
+    sampling = {}
+    for item in filter(None, (part.strip() for part in value.split(';'))):
+        endpoint, _, rate = item.partition('=')
+        rate = float(rate)
+        if not 0 <= rate <= 1:
+            raise ValueError(f"Sample rate for {endpoint!r} must be between 0 and 1")
+        sampling[endpoint.strip()] = rate
+    return sampling
+
+def init_access_log(app):
+    """Log method, path, status, duration, user and request id of every request
+
+    Records are put on a queue and written to stdout by a listener thread;
+    when ACCESS_LOG_QUEUE_SIZE records are waiting, new ones are dropped
+    rather than slowing requests down. Successful requests to endpoints in
+    ACCESS_LOG_SAMPLING are logged at the given rate, errors always.
+
+    Every response carries X-Request-ID: the client's own if it sent a
+    usable one, otherwise a new one.
+    """
+    if not app.config['ACCESS_LOG_ENABLED']:
+        return
+    attach_queue_handler(logger, app.config['ACCESS_LOG_QUEUE_SIZE'])
+    logger.setLevel(logging.INFO)
+    app.extensions['access_log_sampling'] = parse_sampling(app.config['ACCESS_LOG_SAMPLING'])
+
+    @app.before_request
+    def start_access_log():
+        g.access_log_started = time.perf_counter()
+        request_id = request.headers.get('X-Request-ID', '')
+        g.request_id = request_id if REQUEST_ID_PATTERN.fullmatch(request_id) else uuid.uuid4().hex
+
+    @app.after_request
+    def write_access_log(response):
+        started = g.get('access_log_started')
+        if started is None:
+            return response
+        response.headers['X-Request-ID'] = g.request_id
+        rate = 1.0
+        if response.status_code < 400:
+            rate = app.extensions['access_log_sampling'].get(request.endpoint, 1.0)
+        if rate < 1.0 and random.random() >= rate:
+            return response
+
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round((time.perf_counter() - started) * 1000, 2),
+            'user_id': _user_id(),
+            'request_id': g.request_id,
+        }
+        if rate < 1.0:
+            # Each logged request stands for 1 / sample_rate requests
+            record['sample_rate'] = rate
+        logger.info('access', extra={'fields': record})
+        return response
+
+_handler = None
+
+def attach_queue_handler(target, queue_size):
+    """Write the logger's records to stdout as JSON lines, off the calling thread
+
+    Every logger attached shares one queue and writer thread per process;
+    the first caller's queue_size applies.
+    """
+    global _handler
+    if _handler is None:
+        log_queue = queue.Queue(queue_size)
+        _handler = DroppingQueueHandler(log_queue)
+        output = logging.StreamHandler(sys.stdout)
+        output.setFormatter(JsonFormatter())
+        listener = QueueListener(log_queue, output)
+        listener.start()
+        atexit.register(listener.stop)
+    if _handler not in target.handlers:
+        target.addHandler(_handler)
+        target.propagate = False
+
+def _user_id():
+    try:
+        identity = get_jwt_identity()
+    except RuntimeError:
+        # No token was checked for this request
+        return None
+    return int(identity) if identity is not None else None
@@ -0,0 +1,179 @@
+# Response compression negotiated from Accept-Encoding
+import zlib
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header, parse_options_header
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is used without it
+    brotli = None
+
+# Content types worth compressing; everything else passes through untouched
+COMPRESSIBLE_TYPES = {
+    'application/json', 'application/x-ndjson', 'application/javascript',
+    'application/xml', 'image/svg+xml',
+}
+
+# Statuses that have no body or a partial one
+SKIP_STATUSES = {204, 206, 304}
+
+class CompressionMiddleware:
+    """Compress response bodies with brotli or gzip, chunk by chunk
+
+    The encoding is chosen from the request's Accept-Encoding, preferring
+    brotli when the module is installed. Bodies smaller than min_size, non
+    text content types, already encoded responses and responses marked
+    Cache-Control: no-transform are sent as they are.
+
+    Streamed responses are never buffered whole: at most min_size bytes are
+    held while deciding, then every chunk from the application is
+    compressed and flushed as it arrives. Compressible responses always get
+    Vary: Accept-Encoding, whether or not this request was compressed.
+    """
+    def __init__(self, app, min_size=1024, gzip_level=6, brotli_quality=4):
+        self.app = app
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def __call__(self, environ, start_response):
+        encoding = self._negotiate(environ)
+        state = {}
+
+        def capture_start_response(status, headers, exc_info=None):
+            if exc_info is not None and state.get('started'):
+                raise exc_info[1].with_traceback(exc_info[2])
+            state['status'], state['headers'] = status, headers
+            return state.setdefault('written', []).append
+
+        body = self.app(environ, capture_start_response)
+        return self._respond(environ, body, encoding, state, start_response)
+
+    def _respond(self, environ, body, encoding, state, start_response):
+        chunks = iter(body)
+        try:
+            # Headers are only known once the application has produced its first chunk
+            buffered = [next(chunks, b'')]
+            buffered[:0] = state.pop('written', [])
+            headers = Headers(state['headers'])
+            status_code = int(state['status'].split(' ', 1)[0])
+
+            if status_code == 304:
+                # Same Vary as the full response would have had
+                _add_vary(headers)
+            if not self._compressible(environ, status_code, headers):
+                state['started'] = True
+                start_response(state['status'], headers.to_wsgi_list())
+                yield from buffered
+                yield from chunks
+                return
+
+            _add_vary(headers)
+            finished = False
+            if encoding is not None:
+                # Read ahead until the body is known to be big enough to be worth it
+                length = headers.get('Content-Length', type=int)
+                size = sum(len(chunk) for chunk in buffered)
+                finished = length is not None and size >= length
+                while not finished and size < self.min_size:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        finished = True
+                    else:
+                        buffered.append(chunk)
+                        size += len(chunk)
+
+            if encoding is None or (finished and size < self.min_size):
+                state['started'] = True
+                start_response(state['status'], headers.to_wsgi_list())
+                yield from buffered
+                yield from chunks
+                return
+
+            compressor = self._compressor(encoding)
+            headers['Content-Encoding'] = encoding
+            _weaken_etag(headers)
+
+            if finished:
+                # The whole body is in hand, so the compressed length is known
+                data = compressor.compress(b''.join(buffered)) + compressor.finish()
+                headers['Content-Length'] = str(len(data))
+                state['started'] = True
+                start_response(state['status'], headers.to_wsgi_list())
+                yield data
+                return
+
+            headers.pop('Content-Length', None)
+            state['started'] = True
+            start_response(state['status'], headers.to_wsgi_list())
+            data = compressor.compress(b''.join(buffered)) + compressor.flush()
+            if data:
+                yield data
+            for chunk in chunks:
+                # Flushing per chunk lets the client read a stream as it is produced
+                data = compressor.compress(chunk) + compressor.flush()
+                if data:
+                    yield data
+            yield compressor.finish()
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+
+    def _negotiate(self, environ):
+        """The supported encoding with the client's highest q, br on a tie"""
+        accepted = parse_accept_header(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        encodings = ('br', 'gzip') if brotli is not None else ('gzip',)
+        encoding = max(encodings, key=lambda name: accepted[name])
+        return encoding if accepted[encoding] else None
+
+    def _compressible(self, environ, status_code, headers):
+        if environ.get('REQUEST_METHOD') == 'HEAD' or status_code in SKIP_STATUSES or status_code < 200:
+            return False
+        if 'Content-Encoding' in headers or 'no-transform' in headers.get('Cache-Control', ''):
+            return False
+        mimetype = parse_options_header(headers.get('Content-Type', ''))[0]
+        return mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES or mimetype.endswith('+json')
+
+    def _compressor(self, encoding):
+        if encoding == 'br':
+            return _BrotliCompressor(self.brotli_quality)
+        return _GzipCompressor(self.gzip_level)
+
+class _GzipCompressor:
+    def __init__(self, level):
+        # wbits 31: zlib stream with a gzip header and trailer
+        self._zlib = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._zlib.compress(data)
+
+    def flush(self):
+        return self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._zlib.flush(zlib.Z_FINISH)
+
+class _BrotliCompressor:
+    def __init__(self, quality):
+        self._brotli = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._brotli.process(data)
+
+    def flush(self):
+        return self._brotli.flush()
+
+    def finish(self):
+        return self._brotli.finish()
+
+def _add_vary(headers):
+    vary = [value.strip() for value in headers.get('Vary', '').split(',') if value.strip()]
+    if '*' not in vary and 'accept-encoding' not in {value.lower() for value in vary}:
+        vary.append('Accept-Encoding')
+        headers['Vary'] = ', '.join(vary)
+
+def _weaken_etag(headers):
+    # The encoded body is a different representation, so a strong ETag no longer applies
+    etag = headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        headers['ETag'] = f'W/{etag}'
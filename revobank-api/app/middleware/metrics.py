@@ -0,0 +1,184 @@
+# Request metrics per endpoint in Prometheus text format
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from flask import g, request
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Upper bounds in seconds, as in the Prometheus client defaults
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# name -> (metric, help, buckets)
+HISTOGRAMS = {
+    'latency': ('revobank_http_request_duration_seconds', "Time to handle a request, until the response headers",
+                LATENCY_BUCKETS),
+    'db_time': ('revobank_http_request_db_seconds', "Time spent executing SQL statements per request",
+                DB_TIME_BUCKETS),
+}
+
+class Metrics:
+    """Request counts and latency histograms of this process
+
+    Recording takes a lock and a few dict updates. With a directory, a
+    daemon thread of the process also writes its totals to
+    <directory>/metrics-<pid>-<token>.json every flush_interval seconds when
+    they changed (and at exit), so requests never wait on the disk, and
+    render() adds up the files of every worker. Files of workers that have exited are kept,
+    and the random token keeps a new worker that reuses a PID from
+    overwriting one, so counters never go backwards; empty the directory
+    when deploying.
+    """
+    def __init__(self, directory=None, flush_interval=1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._pid = self._path = self._flusher_pid = None
+        self._lock = threading.Lock()
+        self._observations = 0
+        self.requests = {}
+        self.histograms = {name: {} for name in HISTOGRAMS}
+
+    def observe(self, endpoint, method, status, duration, db_time):
+        key = (endpoint, method)
+        with self._lock:
+            request_key = (endpoint, method, status)
+            self.requests[request_key] = self.requests.get(request_key, 0) + 1
+            _observe(self.histograms['latency'], key, LATENCY_BUCKETS, duration)
+            _observe(self.histograms['db_time'], key, DB_TIME_BUCKETS, db_time)
+            self._observations += 1
+            # Threads do not survive a fork, so each worker starts its own
+            if self.directory is not None and self._flusher_pid != os.getpid():
+                self._flusher_pid = os.getpid()
+                threading.Thread(target=self._flush_periodically, name='metrics-flush', daemon=True).start()
+
+    def state(self):
+        with self._lock:
+            return {
+                'requests': [[*key, count] for key, count in self.requests.items()],
+                **{name: [[*key, values[:]] for key, values in histogram.items()]
+                   for name, histogram in self.histograms.items()},
+            }
+
+    @property
+    def path(self):
+        """This process's file; a fork (gunicorn --preload) gets a new one"""
+        if self.directory is None:
+            return None
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._path = os.path.join(self.directory, f'metrics-{self._pid}-{uuid.uuid4().hex[:12]}.json')
+        return self._path
+
+    def _flush_periodically(self):
+        flushed = 0
+        while True:
+            time.sleep(self.flush_interval)
+            if self._observations != flushed:
+                flushed = self._observations
+                self.flush()
+
+    def flush(self):
+        """Write this process's totals; the snapshot is taken under the lock, the file outside it"""
+        if self.path is None:
+            return
+        temporary = f'{self.path}.{threading.get_ident()}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(self.state(), f)
+        os.replace(temporary, self.path)
+
+    def render(self):
+        """All processes' metrics in the Prometheus text exposition format"""
+        states = [self.state()]
+        if self.directory is not None:
+            for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+                if path != self.path:
+                    try:
+                        with open(path) as f:
+                            states.append(json.load(f))
+                    except (OSError, ValueError):
+                        # Removed or being replaced; its totals show up on the next scrape
+                        continue
+
+        requests, histograms = {}, {name: {} for name in HISTOGRAMS}
+        for state in states:
+            for *key, count in state['requests']:
+                requests[tuple(key)] = requests.get(tuple(key), 0) + count
+            for name, histogram in histograms.items():
+                for *key, values in state[name]:
+                    total = histogram.setdefault(tuple(key), [0] * len(values))
+                    histogram[tuple(key)] = [a + b for a, b in zip(total, values)]
+
+        lines = [
+            '# HELP revobank_http_requests_total Requests handled, by endpoint, method and status',
+            '# TYPE revobank_http_requests_total counter',
+        ]
+        for (endpoint, method, status), count in sorted(requests.items()):
+            labels = _labels(endpoint=endpoint, method=method, status=status)
+            lines.append(f'revobank_http_requests_total{labels} {count}')
+        for name, (metric, description, buckets) in HISTOGRAMS.items():
+            lines += [f'# HELP {metric} {description}', f'# TYPE {metric} histogram']
+            for (endpoint, method), values in sorted(histograms[name].items()):
+                cumulative = 0
+                for bound, count in zip((*buckets, '+Inf'), values[:-1]):
+                    cumulative += count
+                    labels = _labels(endpoint=endpoint, method=method, le=str(bound))
+                    lines.append(f'{metric}_bucket{labels} {cumulative}')
+                labels = _labels(endpoint=endpoint, method=method)
+                lines.append(f'{metric}_sum{labels} {values[-1]}')
+                lines.append(f'{metric}_count{labels} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+def init_metrics(app):
+    """Record every request in app.extensions['metrics']
+
+    Call before other extensions register request hooks, so their time is
+    included. Streamed responses are timed until their headers are ready.
+
+    METRICS_ENABLED: Record and serve /metrics
+    METRICS_DIR: Directory shared by the gunicorn workers of a host, to
+        report their sum; without it each worker reports its own numbers
+    """
+    if not app.config['METRICS_ENABLED']:
+        return
+    directory = app.config['METRICS_DIR']
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    metrics = app.extensions['metrics'] = Metrics(directory)
+    if directory:
+        atexit.register(metrics.flush)
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.get('request_started')
+        if started is not None:
+            metrics.observe(
+                # Unmatched URLs share one label so random paths do not create series
+                request.endpoint or 'unmatched', request.method, str(response.status_code),
+                # SQL time is added up by app.middleware.sql_profiler
+                time.perf_counter() - started, g.get('db_time', 0.0)
+            )
+        return response
+
+def _observe(histogram, key, buckets, value):
+    values = histogram.get(key)
+    if values is None:
+        # One count per bucket, then +Inf, then the sum
+        values = histogram[key] = [0] * (len(buckets) + 1) + [0.0]
+    values[bisect_left(buckets, value)] += 1
+    values[-1] += value
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
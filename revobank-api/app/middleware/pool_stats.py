@@ -0,0 +1,108 @@
+# Connection pool statistics per worker process, for sizing pools against max_connections
+import threading
+import time
+from collections import deque
+from sqlalchemy import event, exc
+
+# Checkout waits kept for the percentiles
+WAIT_SAMPLES = 1024
+
+class PoolStats:
+    """Counters and checkout latency for one engine's connection pool
+
+    Pool events count connections opened, checked out and invalidated. They
+    have no hook for when a checkout starts, so the pool's connect() is
+    wrapped to time how long callers wait for a connection, including
+    opening a new one and pool timeouts. The wrapper is re-applied when the
+    engine is disposed and gets a new pool.
+    """
+    def __init__(self, engine):
+        self.engine = engine
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+        self.checkouts = self.connects = self.invalidations = self.soft_invalidations = 0
+        self.timeouts = self.peak_checked_out = 0
+        self.max_wait = 0.0
+
+        event.listen(engine, 'connect', self._on_connect)
+        event.listen(engine, 'checkout', self._on_checkout)
+        event.listen(engine, 'invalidate', self._on_invalidate)
+        event.listen(engine, 'soft_invalidate', self._on_soft_invalidate)
+        event.listen(engine, 'engine_disposed', lambda engine: self._time_checkouts(engine.pool))
+        self._time_checkouts(engine.pool)
+
+    def snapshot(self):
+        pool = self.engine.pool
+        with self._lock:
+            waits = sorted(self._waits)
+            stats = {
+                'pool_class': type(pool).__name__,
+                'checkouts': self.checkouts,
+                'connects': self.connects,
+                'invalidations': self.invalidations,
+                'soft_invalidations': self.soft_invalidations,
+                'timeouts': self.timeouts,
+                'peak_checked_out': self.peak_checked_out,
+                'checkout_wait_ms': {
+                    'p50': _percentile(waits, 0.50),
+                    'p95': _percentile(waits, 0.95),
+                    'p99': _percentile(waits, 0.99),
+                    'max': round(self.max_wait * 1000, 3),
+                },
+            }
+        # QueuePool only; SQLite's static and per-thread pools have no size
+        for name in ('size', 'checkedout', 'checkedin', 'overflow'):
+            if hasattr(pool, name):
+                stats[name] = getattr(pool, name)()
+        if hasattr(pool, '_max_overflow'):
+            stats['max_overflow'] = pool._max_overflow
+        return stats
+
+    def _time_checkouts(self, pool):
+        connect = pool.connect
+
+        def timed_connect():
+            started = time.perf_counter()
+            try:
+                return connect()
+            except exc.TimeoutError:
+                with self._lock:
+                    self.timeouts += 1
+                raise
+            finally:
+                waited = time.perf_counter() - started
+                with self._lock:
+                    self._waits.append(waited)
+                    self.max_wait = max(self.max_wait, waited)
+        pool.connect = timed_connect
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        checked_out = getattr(self.engine.pool, 'checkedout', lambda: 0)()
+        with self._lock:
+            self.checkouts += 1
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+    def _on_soft_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.soft_invalidations += 1
+
+def init_pool_stats(app, db):
+    """Collect statistics for the app's engines in app.extensions['pool_stats']"""
+    with app.app_context():
+        engines = db.engines
+    app.extensions['pool_stats'] = {
+        'default' if key is None else key: PoolStats(engine) for key, engine in engines.items()
+    }
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    return round(values[min(len(values) - 1, int(len(values) * fraction))] * 1000, 3)
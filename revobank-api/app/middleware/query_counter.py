@@ -0,0 +1,56 @@
+# Per-request query and lazy load limits to catch N+1 regressions in development and tests
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+class QueryLimitExceeded(Exception):
+    """Raised in 'raise' mode when a request runs more queries than allowed"""
+
+def init_query_counter(app):
+    """Count SQL statements and lazy loads per request and flag heavy requests
+
+    QUERY_COUNT_MODE: None (off), 'warn' (log a warning) or 'raise'
+    QUERY_COUNT_LIMIT: Statements allowed per request
+    LAZY_LOAD_LIMIT: Relationship lazy loads allowed per request
+
+    Statements are counted by app.middleware.sql_profiler (g.sql_queries),
+    which must be initialised first.
+    """
+    if not app.config.get('QUERY_COUNT_MODE'):
+        return
+    _install_listeners()
+
+    @app.before_request
+    def start_lazy_load_count():
+        g.lazy_load_count = 0
+
+    @app.after_request
+    def check_query_count(response):
+        queries = g.get('sql_queries', 0)
+        lazy_loads = g.get('lazy_load_count', 0)
+        if queries <= app.config['QUERY_COUNT_LIMIT'] and lazy_loads <= app.config['LAZY_LOAD_LIMIT']:
+            return response
+
+        message = (
+            f"{request.method} {request.path} ran {queries} queries and {lazy_loads} lazy loads "
+            f"(limits {app.config['QUERY_COUNT_LIMIT']} and {app.config['LAZY_LOAD_LIMIT']})"
+        )
+        if app.config['QUERY_COUNT_MODE'] == 'raise':
+            raise QueryLimitExceeded(message)
+        app.logger.warning(message)
+        return response
+
+_listeners_installed = False
+
+def _install_listeners():
+    global _listeners_installed
+    if _listeners_installed:
+        return
+    _listeners_installed = True
+
+    @event.listens_for(Session, 'do_orm_execute')
+    def count_lazy_load(orm_execute_state):
+        if not (has_request_context() and 'lazy_load_count' in g):
+            return
+        if orm_execute_state.is_select and orm_execute_state.lazy_loaded_from is not None:
+            g.lazy_load_count += 1
@@ -0,0 +1,192 @@
+# Token bucket rate limiting per user (or client IP) and blueprint
+import math
+import os
+import sqlite3
+import threading
+import time
+from flask import current_app, request
+from flask_jwt_extended import decode_token
+from werkzeug.exceptions import TooManyRequests
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+def parse_limit(limit):
+    """'10/minute' -> (capacity, tokens per second)"""
+    try:
+        count, period = limit.strip().split('/')
+        capacity, seconds = int(count), PERIODS[period.strip()]
+    except (ValueError, KeyError):
+        raise ValueError(f"Invalid rate limit {limit!r}, expected e.g. '10/minute'")
+    return capacity, capacity / seconds
+
+def parse_limits(limits):
+    """'auth=10/minute;transactions=120/minute' (or a dict) -> {blueprint: (capacity, rate)}"""
+    if isinstance(limits, str):
+        limits = dict(item.split('=', 1) for item in limits.split(';') if item.strip())
+    return {blueprint.strip(): parse_limit(limit) for blueprint, limit in limits.items()}
+
+class MemoryBackend:
+    """Buckets in a dict, shared by the threads of one worker process"""
+    # Takes between sweeps of full buckets, which behave like missing ones
+    SWEEP_INTERVAL = 1000
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._takes = 0
+
+    def take(self, key, capacity, rate):
+        """Take one token; returns 0 if allowed, else seconds until one is available"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            tokens = capacity if bucket is None else min(capacity, bucket[0] + (now - bucket[1]) * rate)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            if not wait:
+                tokens -= 1
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+            self._takes += 1
+            if self._takes % self.SWEEP_INTERVAL == 0:
+                for full in [k for k, v in self._buckets.items() if v[2] <= now]:
+                    del self._buckets[full]
+            return wait
+
+class SQLiteFile:
+    """A SQLite file shared by every worker on the host, one connection per thread
+
+    WAL mode keeps readers and the writer from blocking each other, and
+    commits are not fsynced: the files only hold short-lived state that may
+    be lost in a crash.
+    """
+    def __init__(self, path, schema):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute(schema)
+        conn.close()
+
+    def connection(self):
+        # One connection per thread, reopened in forked workers
+        if getattr(self._local, 'pid', None) != os.getpid():
+            self._local.conn = self._connect()
+            self._local.pid = os.getpid()
+        return self._local.conn
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=OFF')
+        return conn
+
+class SQLiteBackend(SQLiteFile):
+    """Buckets in a SQLite file, shared by every worker on the host
+
+    Each take is one short write transaction; a lost bucket after a crash
+    just means a fresh allowance.
+    """
+    # Takes between sweeps of full buckets
+    SWEEP_INTERVAL = 1000
+
+    def __init__(self, path):
+        super().__init__(
+            path,
+            'CREATE TABLE IF NOT EXISTS rate_limit_buckets '
+            '(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, full_at REAL NOT NULL)'
+        )
+        self._takes = 0
+
+    def take(self, key, capacity, rate):
+        conn = self.connection()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?', (key,)).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + max(0.0, now - row[1]) * rate)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            if not wait:
+                tokens -= 1
+            conn.execute(
+                'INSERT INTO rate_limit_buckets (key, tokens, updated, full_at) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated, '
+                'full_at = excluded.full_at',
+                (key, tokens, now, now + (capacity - tokens) / rate)
+            )
+            self._takes += 1
+            if self._takes % self.SWEEP_INTERVAL == 0:
+                conn.execute('DELETE FROM rate_limit_buckets WHERE full_at <= ?', (now,))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return wait
+
+def create_backend(storage):
+    """'memory' or 'sqlite:///path/to/file.db'"""
+    if storage == 'memory':
+        return MemoryBackend()
+    if storage.startswith('sqlite:///'):
+        return SQLiteBackend(storage[len('sqlite:///'):])
+    raise ValueError(f"Unknown RATE_LIMIT_STORAGE {storage!r}")
+
+class RateLimiter:
+    """Per-blueprint limits checked against a backend
+
+    A backend is any object with take(key, capacity, rate) returning 0 when
+    the request may proceed, or the seconds to wait for the next token.
+    """
+    def __init__(self, backend, limits, default=None):
+        self.backend = backend
+        self.limits = parse_limits(limits)
+        self.default = parse_limit(default) if default else None
+
+    def check(self, blueprint, client):
+        limit = self.limits.get(blueprint, self.default)
+        if limit is None:
+            return
+        wait = self.backend.take(f'{blueprint}:{client}', *limit)
+        if wait:
+            raise TooManyRequests("Rate limit exceeded, retry later", retry_after=math.ceil(wait))
+
+def init_rate_limiter(app):
+    """Throttle each client per blueprint with token buckets
+
+    RATE_LIMIT_ENABLED: Turn limiting on or off
+    RATE_LIMIT_STORAGE: 'memory' (per worker) or 'sqlite:///path' (shared)
+    RATE_LIMITS: Per-blueprint limits, 'auth=10/minute;transactions=120/minute'
+    RATE_LIMIT_DEFAULT: Limit for other blueprints; routes outside blueprints are exempt
+    RATE_LIMIT_BY_ADDRESS: Blueprints limited per client address even with
+        a token, so their requests skip decoding it
+
+    Client addresses come from TRUSTED_PROXY_COUNT (see create_app); without
+    it every client behind a proxy shares the proxy's bucket.
+    """
+    app.extensions['rate_limiter'] = RateLimiter(
+        create_backend(app.config['RATE_LIMIT_STORAGE']),
+        app.config['RATE_LIMITS'],
+        app.config['RATE_LIMIT_DEFAULT']
+    )
+
+    @app.before_request
+    def check_rate_limit():
+        if not app.config['RATE_LIMIT_ENABLED'] or request.blueprint is None:
+            return
+        by_address = request.blueprint in app.config['RATE_LIMIT_BY_ADDRESS']
+        app.extensions['rate_limiter'].check(request.blueprint, _client(by_address))
+
+def _client(by_address):
+    if by_address:
+        return f'ip:{request.remote_addr}'
+    # Authenticated clients are limited per user, everyone else per address.
+    # The token's signature is checked but not its expiry or revocation, which
+    # @jwt_required() does once for the view; a missing or invalid token is
+    # left for it to reject.
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme == 'Bearer' and token:
+        try:
+            claims = decode_token(token, allow_expired=True)
+        except Exception:
+            claims = {}
+        identity = claims.get(current_app.config['JWT_IDENTITY_CLAIM'])
+        if identity is not None:
+            return f'user:{identity}'
+    return f'ip:{request.remote_addr}'
@@ -0,0 +1,169 @@
+# Read replica routing for GET requests, with a read-your-writes window
+import threading
+import time
+from contextlib import contextmanager
+from flask import current_app, g, has_request_context, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import create_engine
+from flask_sqlalchemy.session import Session
+from app.middleware.pool_stats import PoolStats
+from app.middleware.rate_limit import SQLiteFile
+
+# Set on responses to requests that wrote; while it lasts the client reads from the primary.
+# Clients without a cookie jar can echo the header instead.
+READ_PRIMARY_COOKIE = 'revobank_read_primary_until'
+READ_PRIMARY_HEADER = 'X-Read-Primary-Until'
+
+SAFE_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+class RoutingSession(Session):
+    """db.session that sends a request's plain SELECTs to the replica when allowed
+
+    Everything else goes to the primary: flushes, INSERT/UPDATE/DELETE,
+    SELECT ... FOR UPDATE and text() statements. Once the session has
+    written, the rest of the request reads from the primary as well, so it
+    sees its own changes.
+    """
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._reads_from_replica(clause):
+            return current_app.extensions['read_replica']
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _reads_from_replica(self, clause):
+        if self._flushing or (clause is not None and not _plain_select(clause)):
+            # Writes go to the primary, and so does everything after them
+            self.info['wrote'] = True
+            return False
+        return clause is not None and not self.info.get('wrote') and reads_from_replica()
+
+class RecentWrites:
+    """Until when each user reads from the primary after a write
+
+    Kept in the worker's memory, or with 'sqlite:///path' in a file shared
+    by every worker on the host.
+    """
+    # Writes between sweeps of expired entries from memory
+    SWEEP_INTERVAL = 1000
+
+    def __init__(self, storage):
+        self._memory, self._lock, self._writes = {}, threading.Lock(), 0
+        self._file = None
+        if storage.startswith('sqlite:///'):
+            self._file = SQLiteFile(
+                storage[len('sqlite:///'):],
+                'CREATE TABLE IF NOT EXISTS read_primary_until (user_id INTEGER PRIMARY KEY, until REAL NOT NULL)'
+            )
+        elif storage != 'memory':
+            raise ValueError(f"Unknown REPLICA_WRITES_STORAGE {storage!r}")
+
+    def remember(self, user_id, until):
+        if self._file is not None:
+            self._file.connection().execute(
+                'INSERT INTO read_primary_until (user_id, until) VALUES (?, ?) '
+                'ON CONFLICT(user_id) DO UPDATE SET until = max(until, excluded.until)',
+                (user_id, until)
+            )
+            return
+        with self._lock:
+            self._memory[user_id] = max(until, self._memory.get(user_id, 0))
+            self._writes += 1
+            if self._writes % self.SWEEP_INTERVAL == 0:
+                now = time.time()
+                for expired in [k for k, v in self._memory.items() if v <= now]:
+                    del self._memory[expired]
+
+    def until(self, user_id):
+        if self._file is not None:
+            row = self._file.connection().execute(
+                'SELECT until FROM read_primary_until WHERE user_id = ?', (user_id,)
+            ).fetchone()
+            return row[0] if row else 0
+        return self._memory.get(user_id, 0)
+
+def init_read_replica(app):
+    """Serve GET requests of REPLICA_BLUEPRINTS from REPLICA_DATABASE_URI, if set
+
+    The replica engine gets the same SQLALCHEMY_ENGINE_OPTIONS as the primary.
+    REPLICA_BLUEPRINTS: Blueprints whose GET requests may read from the replica
+    REPLICA_READ_YOUR_WRITES: Seconds after a request that wrote to the
+        database during which the same user reads from the primary. The
+        user is recognised by token (through REPLICA_WRITES_STORAGE, per
+        worker or per host), and by the cookie or header the response
+        carries, which also works across hosts.
+    """
+    if not app.config['REPLICA_DATABASE_URI']:
+        return
+    engine = create_engine(app.config['REPLICA_DATABASE_URI'], **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    app.extensions['read_replica'] = engine
+    app.extensions['recent_writes'] = RecentWrites(app.config['REPLICA_WRITES_STORAGE'])
+    app.extensions['pool_stats']['replica'] = PoolStats(engine)
+    blueprints = app.config['REPLICA_BLUEPRINTS']
+    window = app.config['REPLICA_READ_YOUR_WRITES']
+
+    @app.before_request
+    def route_reads_to_replica():
+        if request.method in SAFE_METHODS and request.blueprint in blueprints and not _read_primary(request):
+            g.read_replica = True
+
+    @app.after_request
+    def remember_write(response):
+        session = app.extensions['sqlalchemy'].session
+        if (request.method not in SAFE_METHODS and response.status_code < 400 and window > 0
+                and session.info.get('wrote')):
+            until = int(time.time() + window)
+            user_id = _user_id()
+            if user_id is not None:
+                app.extensions['recent_writes'].remember(user_id, until)
+            response.headers[READ_PRIMARY_HEADER] = str(until)
+            response.set_cookie(
+                READ_PRIMARY_COOKIE, str(until),
+                max_age=window, httponly=True, samesite='Strict', secure=request.is_secure
+            )
+        return response
+
+def reads_from_replica():
+    """Whether the current request may read from the replica
+
+    True for GET requests of REPLICA_BLUEPRINTS, unless the client or the
+    token's user wrote within the read-your-writes window.
+    """
+    return has_request_context() and g.get('read_replica', False) and not _recent_writer()
+
+@contextmanager
+def on_primary():
+    """Read from the primary inside the block, e.g. for data a replica may not have yet"""
+    routed = has_request_context() and g.pop('read_replica', False)
+    try:
+        yield
+    finally:
+        if routed:
+            g.read_replica = True
+
+def _plain_select(clause):
+    return getattr(clause, 'is_select', False) and getattr(clause, '_for_update_arg', None) is None
+
+def _read_primary(request):
+    for value in (request.cookies.get(READ_PRIMARY_COOKIE), request.headers.get(READ_PRIMARY_HEADER)):
+        try:
+            if value and int(value) > time.time():
+                return True
+        except ValueError:
+            pass
+    return False
+
+def _recent_writer():
+    """Whether the request's user wrote within the window; checked once the token is verified"""
+    if 'recent_writer' not in g:
+        user_id = _user_id()
+        if user_id is None:
+            return False
+        g.recent_writer = current_app.extensions['recent_writes'].until(user_id) > time.time()
+    return g.recent_writer
+
+def _user_id():
+    try:
+        identity = get_jwt_identity()
+    except RuntimeError:
+        # The token has not been checked (yet)
+        return None
+    return int(identity) if identity is not None else None
@@ -0,0 +1,132 @@
+# Per-request SQL timing, Server-Timing header and slow-query log
+import json
+import logging
+import time
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.middleware.access_log import attach_queue_handler
+
+logger = logging.getLogger('revobank.sql')
+
+# Dialect -> prefix that shows a statement's plan without running it
+EXPLAIN_PREFIXES = {
+    'postgresql': 'EXPLAIN ',
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+}
+
+def init_sql_profiler(app):
+    """Count SQL statements and their time per request (g.sql_queries, g.db_time)
+
+    SQL_PROFILING: Add a Server-Timing header with the request's SQL time and
+        statement count next to its total time
+    SLOW_QUERY_MS: Log statements that take longer (0 turns the log off);
+        records go through the access log's queue, see attach_queue_handler
+    SLOW_QUERY_EXPLAIN_MS: Add the query plan of slow SELECTs that take
+        longer than this (0 turns it off)
+
+    g.sql_queries is also what app.middleware.query_counter checks.
+    """
+    _install_listeners()
+    if app.config['SLOW_QUERY_MS']:
+        attach_queue_handler(logger, app.config['ACCESS_LOG_QUEUE_SIZE'])
+
+    @app.before_request
+    def start_sql_profile():
+        g.sql_profile_started = time.perf_counter()
+        g.sql_queries = 0
+        g.db_time = 0.0
+
+    @app.after_request
+    def add_server_timing(response):
+        if app.config['SQL_PROFILING'] and 'sql_profile_started' in g:
+            total = (time.perf_counter() - g.sql_profile_started) * 1000
+            response.headers.add(
+                'Server-Timing', f'db;desc="{g.sql_queries} queries";dur={g.db_time * 1000:.2f}, app;dur={total:.2f}'
+            )
+        return response
+
+_listeners_installed = False
+
+def _install_listeners():
+    global _listeners_installed
+    if _listeners_installed:
+        return
+    _listeners_installed = True
+
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('statement_started', []).append(time.perf_counter())
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def stop_statement_timer(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('statement_started')
+        if not started:
+            return
+        duration = time.perf_counter() - started.pop()
+        if has_request_context() and 'db_time' in g:
+            g.sql_queries += 1
+            g.db_time += duration
+        if has_app_context():
+            slow_ms = current_app.config['SLOW_QUERY_MS']
+            if slow_ms and duration * 1000 >= slow_ms:
+                _log_slow_query(conn, statement, parameters, executemany, duration)
+
+    @event.listens_for(Engine, 'handle_error')
+    def discard_statement_timer(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get('statement_started'):
+            connection.info['statement_started'].pop()
+
+def _log_slow_query(conn, statement, parameters, executemany, duration):
+    record = {
+        'event': 'slow_query',
+        'duration_ms': round(duration * 1000, 2),
+        'statement': statement,
+        # Types only: values may be personal data
+        'parameters': parameter_shape(parameters),
+        'endpoint': request.endpoint if has_request_context() else None,
+        'request_id': g.get('request_id') if has_request_context() else None,
+    }
+    explain_ms = current_app.config['SLOW_QUERY_EXPLAIN_MS']
+    if explain_ms and duration * 1000 >= explain_ms and not executemany:
+        record['plan'] = _explain(conn, statement, parameters)
+    logger.warning('Slow query', extra={'fields': record})
+
+def parameter_shape(parameters):
+    """Structure and value types of statement parameters, without the values"""
+    if isinstance(parameters, (list, tuple)) and parameters and isinstance(parameters[0], (dict, list, tuple)):
+        # executemany
+        return f'{len(parameters)} x {json.dumps(parameter_shape(parameters[0]))}'
+    if isinstance(parameters, dict):
+        return {name: type(value).__name__ for name, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+def _explain(conn, statement, parameters):
+    """Plan of a SELECT on the same connection, or None for other statements"""
+    prefix = EXPLAIN_PREFIXES.get(conn.dialect.name)
+    if prefix is None or not statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return None
+    # A raw cursor, so the EXPLAIN itself is not timed, counted or logged
+    cursor = conn.connection.cursor()
+    postgresql = conn.dialect.name == 'postgresql'
+    try:
+        if postgresql:
+            # Keeps a failed EXPLAIN from aborting the caller's transaction
+            cursor.execute('SAVEPOINT slow_query_explain')
+        try:
+            cursor.execute(prefix + statement, parameters)
+            plan = [' '.join(str(column) for column in row) for row in cursor.fetchall()]
+        except Exception:
+            if postgresql:
+                cursor.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+            raise
+        if postgresql:
+            cursor.execute('RELEASE SAVEPOINT slow_query_explain')
+        return plan
+    except Exception as e:
+        return f'EXPLAIN failed: {e}'
+    finally:
+        cursor.close()
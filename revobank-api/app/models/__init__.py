@@ -4,5 +4,10 @@ from .transaction import Transaction
 from .budget import Budget
 from .transaction_category import TransactionCategory
 from .bill import Bill
+from .idempotency_key import IdempotencyKey
+from .balance_checkpoint import BalanceCheckpoint
+from .transaction_rollup import TransactionRollup
+from .collection_version import CollectionVersion
+from .token_revocation import TokenRevocation
 
-__all__ = ['User', 'Account', 'Transaction', 'Budget', 'TransactionCategory', 'Bill']
+__all__ = ['User', 'Account', 'Transaction', 'Budget', 'TransactionCategory', 'Bill', 'IdempotencyKey', 'BalanceCheckpoint', 'TransactionRollup', 'CollectionVersion', 'TokenRevocation']
@@ -1,4 +1,5 @@
 from app import db
+from app.serialization import serializer_for
 from sqlalchemy import CheckConstraint
 from datetime import datetime
 
@@ -26,14 +27,10 @@ class Account(db.Model):
             raise ValueError("Cannot deactivate account with non-zero balance")
         self.status = 'deactivated'
     
+    # Keys of serialize(), in order
+    SERIALIZED_FIELDS = (
+        'id', 'user_id', 'account_type', 'account_number', 'balance', 'created_at', 'updated_at', 'status',
+    )
+
     def serialize(self):
-        return {
-            'id': self.id,
-            'user_id': self.user_id,
-            'account_type': self.account_type,
-            'account_number': self.account_number,
-            'balance': str(self.balance),  
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'status': self.status,
-        }
\ No newline at end of file
+        return serializer_for(Account)(self)
@@ -0,0 +1,24 @@
+from app import db
+
+class BalanceCheckpoint(db.Model):
+    """Snapshot of an account balance covering every transaction up to as_of"""
+    __tablename__ = 'balance_checkpoints'
+
+    id = db.Column(db.Integer, primary_key=True)
+    account_id = db.Column(db.Integer, db.ForeignKey('accounts.id', ondelete='CASCADE'), nullable=False)
+    as_of = db.Column(db.DateTime, nullable=False)
+    balance = db.Column(db.Numeric(10, 2), nullable=False)
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
+
+    __table_args__ = (
+        db.UniqueConstraint('account_id', 'as_of', name='uq_balance_checkpoints_account_as_of'),
+    )
+
+    def serialize(self):
+        return {
+            'id': self.id,
+            'account_id': self.account_id,
+            'as_of': self.as_of.isoformat(),
+            'balance': str(self.balance),
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
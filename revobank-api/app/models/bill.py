@@ -1,4 +1,5 @@
 from app import db
+from app.serialization import serializer_for
 from datetime import datetime
 
 class Bill(db.Model):
@@ -13,18 +14,16 @@ class Bill(db.Model):
     created_at = db.Column(db.DateTime, server_default=db.func.now())
     updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now())
 
-    # Relationships
-    user = db.relationship('User', backref=db.backref('bills', lazy=True))
-    account = db.relationship('Account', backref=db.backref('bills', lazy=True))
+    # Relationships (rows are removed by ON DELETE CASCADE, not loaded and deleted one by one)
+    user = db.relationship('User', backref=db.backref('bills', lazy='raise_on_sql', passive_deletes=True),
+                           lazy='raise_on_sql')
+    account = db.relationship('Account', backref=db.backref('bills', lazy='raise_on_sql', passive_deletes=True),
+                              lazy='raise_on_sql')
+
+    # Keys of serialize(), in order
+    SERIALIZED_FIELDS = (
+        'id', 'user_id', 'account_id', 'biller_name', 'due_date', 'amount', 'created_at', 'updated_at',
+    )
 
     def serialize(self):
-        return {
-            'id': self.id,
-            'user_id': self.user_id,
-            'account_id': self.account_id,
-            'biller_name': self.biller_name,
-            'due_date': self.due_date.isoformat(),
-            'amount': str(self.amount),
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
+        return serializer_for(Bill)(self)
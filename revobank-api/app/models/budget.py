@@ -1,4 +1,5 @@
 from app import db
+from app.serialization import serializer_for
 from datetime import datetime
 
 class Budget(db.Model):
@@ -14,17 +15,14 @@ class Budget(db.Model):
     created_at = db.Column(db.DateTime, server_default=db.func.now())
     updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now())
 
-    # Relationship with User
-    user = db.relationship('User', backref=db.backref('budgets', lazy=True))
+    # Relationship with User (rows are removed by ON DELETE CASCADE)
+    user = db.relationship('User', backref=db.backref('budgets', lazy='raise_on_sql', passive_deletes=True),
+                           lazy='raise_on_sql')
+
+    # Keys of serialize(), in order
+    SERIALIZED_FIELDS = (
+        'id', 'user_id', 'name', 'amount', 'start_date', 'end_date', 'created_at', 'updated_at',
+    )
 
     def serialize(self):
-        return {
-            'id': self.id,
-            'user_id': self.user_id,
-            'name': self.name,
-            'amount': str(self.amount),
-            'start_date': self.start_date.isoformat(),
-            'end_date': self.end_date.isoformat(),
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
+        return serializer_for(Budget)(self)
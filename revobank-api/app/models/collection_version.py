@@ -0,0 +1,20 @@
+from app import db
+
+class CollectionVersion(db.Model):
+    """Change counter for a collection served with ETag validators
+
+    Bumped by app.services.conditional right after every committed write
+    to the collection. scope_id is the owning user's id, or 0 for
+    collections shared by all users.
+    """
+    __tablename__ = 'collection_versions'
+
+    id = db.Column(db.Integer, primary_key=True)
+    collection = db.Column(db.String(50), nullable=False)
+    scope_id = db.Column(db.Integer, nullable=False)
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('collection', 'scope_id', name='uq_collection_versions_key'),
+    )
@@ -0,0 +1,24 @@
+from datetime import datetime, timezone
+from app import db
+
+class TokenRevocation(db.Model):
+    """A revoked access token, or all of a user's tokens issued up to revoked_at
+
+    Rows with a jti revoke that token (logout). Rows without one revoke every
+    token of the user issued at or before revoked_at (logout everywhere).
+    Rows can be deleted once expires_at has passed, since the tokens they
+    cover have expired too.
+    """
+    __tablename__ = 'token_revocations'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    jti = db.Column(db.String(36), unique=True, nullable=True)
+    revoked_at = db.Column(db.DateTime, nullable=False,
+                           default=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_token_revocations_revoked_at', 'revoked_at'),
+        db.Index('ix_token_revocations_user_revoked_at', 'user_id', 'revoked_at'),
+    )
@@ -1,4 +1,5 @@
 from app import db
+from app.serialization import serializer_for
 from sqlalchemy import CheckConstraint, ForeignKey
 from datetime import datetime, timezone
 from app.models.account import Account
@@ -13,22 +14,25 @@ class Transaction(db.Model):
         to_account_id = db.Column(db.Integer, ForeignKey('accounts.id', ondelete='CASCADE'), nullable=True)
         category_id = db.Column(db.Integer, db.ForeignKey('transaction_categories.id', ondelete='SET NULL'), nullable=True)
         description = db.Column(db.String(255), nullable=True)
-        created_at = db.Column(db.DateTime, server_default=db.func.now())
-        from_account = db.relationship('Account', foreign_keys=[from_account_id])
-        to_account = db.relationship('Account', foreign_keys=[to_account_id])
+        # Set client-side as well so keyset cursors compare against the exact stored value
+        created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None),
+                               server_default=db.func.now())
+        # Load with joinedload() where needed instead of one lazy SELECT per access
+        from_account = db.relationship('Account', foreign_keys=[from_account_id], lazy='raise_on_sql')
+        to_account = db.relationship('Account', foreign_keys=[to_account_id], lazy='raise_on_sql')
 
         __table_args__ = (
             CheckConstraint('amount > 0', name='positive_amount'),
+            # History is read per account, newest first
+            db.Index('ix_transactions_from_account_created_at', 'from_account_id', 'created_at'),
+            db.Index('ix_transactions_to_account_created_at', 'to_account_id', 'created_at'),
+        )
+
+        # Keys of serialize(), in order
+        SERIALIZED_FIELDS = (
+            'id', 'type', 'amount', 'from_account_id', 'to_account_id', 'category_id', 'description',
+                'created_at',
         )
 
         def serialize(self):
-            return {
-                'id': self.id,
-                'type': self.type,
-                'amount': str(self.amount),  
-                'from_account_id': self.from_account_id,
-                'to_account_id': self.to_account_id,
-                'category_id': self.category_id,
-                'description': self.description,
-                'created_at': self.created_at.isoformat() if self.created_at else None,
-            }
+            return serializer_for(Transaction)(self)
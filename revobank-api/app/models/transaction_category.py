@@ -1,4 +1,5 @@
 from app import db
+from app.serialization import serializer_for
 from datetime import datetime
 
 class TransactionCategory(db.Model):
@@ -9,12 +10,14 @@ class TransactionCategory(db.Model):
     name = db.Column(db.String(255), nullable=False, unique=True)
     created_at = db.Column(db.DateTime, server_default=db.func.now())
     updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now())
-    transactions = db.relationship('Transaction', backref='category', lazy=True)
+    # A category can have any number of transactions, never load them implicitly
+    transactions = db.relationship('Transaction', backref=db.backref('category', lazy='raise_on_sql'),
+                                   lazy='raise_on_sql', passive_deletes=True)
+
+    # Keys of serialize(), in order
+    SERIALIZED_FIELDS = (
+        'id', 'name', 'created_at', 'updated_at',
+    )
 
     def serialize(self):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
+        return serializer_for(TransactionCategory)(self)
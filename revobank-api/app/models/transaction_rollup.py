@@ -0,0 +1,23 @@
+from app import db
+
+class TransactionRollup(db.Model):
+    """Running monthly totals per account, category and transaction type
+
+    Kept up to date by app.services.rollups in the same unit of work as each
+    posting. category_id is 0 for uncategorized transactions so the key can
+    be enforced by a unique constraint.
+    """
+    __tablename__ = 'transaction_rollups'
+
+    id = db.Column(db.Integer, primary_key=True)
+    account_id = db.Column(db.Integer, db.ForeignKey('accounts.id', ondelete='CASCADE'), nullable=False)
+    month = db.Column(db.Date, nullable=False)  # first day of the month
+    category_id = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    type = db.Column(db.String(50), nullable=False)
+    amount_in = db.Column(db.Numeric(14, 2), nullable=False, default=0, server_default='0')
+    amount_out = db.Column(db.Numeric(14, 2), nullable=False, default=0, server_default='0')
+    transaction_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    __table_args__ = (
+        db.UniqueConstraint('account_id', 'month', 'category_id', 'type', name='uq_transaction_rollups_key'),
+    )
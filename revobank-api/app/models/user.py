@@ -1,5 +1,5 @@
 from app import db  
-from werkzeug.security import generate_password_hash, check_password_hash  
+from app.services.passwords import hash_password, verify_password, needs_rehash, validate_password
 
 class User(db.Model):  
     __tablename__ = "users"  
@@ -9,16 +9,26 @@ class User(db.Model):
     password_hash = db.Column(db.String(255), nullable=False)  
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())  
     updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())  
-    accounts = db.relationship('Account', backref='user', cascade='all, delete')
+    # Relationships never load implicitly; query or eager-load them explicitly
+    accounts = db.relationship('Account', backref=db.backref('user', lazy='raise_on_sql'),
+                               cascade='all, delete', lazy='raise_on_sql')
     
     def set_password(self, password):  
-        if len(password) < 8:
-            raise ValueError("Password must be at least 8 characters long")
-        if not any(c.isupper() for c in password):
-            raise ValueError("Password must contain at least one uppercase letter")
-        if not any(c in '!@#$%^&*()' for c in password):
-            raise ValueError("Password must contain at least one special character")
-        self.password_hash = generate_password_hash(password)
+        validate_password(password)
+        self.password_hash = hash_password(password)
         
     def check_password(self, password):  
-        return check_password_hash(self.password_hash, password)
\ No newline at end of file
+        return verify_password(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        """True if the stored hash uses outdated parameters"""
+        return needs_rehash(self.password_hash)
+
+def duplicate_field(error):
+    """'username' or 'email' for an IntegrityError from their unique constraints, else None"""
+    # PostgreSQL names the constraint (users_email_key), SQLite the column (users.email)
+    constraint = getattr(getattr(error.orig, 'diag', None), 'constraint_name', None) or str(error.orig)
+    for field in ('username', 'email'):
+        if field in constraint:
+            return field
+    return None
@@ -2,9 +2,14 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.account import Account
+from app.services.balances import balance_as_of
+from app.services.conditional import conditional
+from app.serialization import model_columns, serialize_tuples
 from app import db
 from werkzeug.exceptions import BadRequest, NotFound, Forbidden
+from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timezone
 
 # Initialize Blueprint for account routes
 accounts_bp = Blueprint('accounts', __name__, url_prefix='/api/accounts')
@@ -14,6 +19,7 @@ ALLOWED_TYPES = {'savings', 'checking', 'investment'}
 
 @accounts_bp.route('', methods=['GET'])
 @jwt_required()
+@conditional('accounts')
 def get_all_accounts():
     """Retrieve all accounts for authenticated user
     
@@ -21,8 +27,10 @@ def get_all_accounts():
     Response: List of user's accounts in JSON format
     """
     current_user_id = int(get_jwt_identity())
-    accounts = Account.query.filter_by(user_id=current_user_id).all()
-    return jsonify([acc.serialize() for acc in accounts]), 200
+    accounts = db.session.execute(
+        select(*model_columns(Account)).where(Account.user_id == current_user_id)
+    ).all()
+    return jsonify(serialize_tuples(Account, accounts)), 200
 
 @accounts_bp.route('/<int:account_id>', methods=['GET'])
 @jwt_required()
@@ -43,6 +51,38 @@ def get_single_account(account_id):
         raise Forbidden("You don't have access to this account")
     return jsonify(account.serialize()), 200
 
+@accounts_bp.route('/<int:account_id>/balance', methods=['GET'])
+@jwt_required()
+def get_account_balance(account_id):
+    """Retrieve the balance of an account, optionally at a past point in time
+
+    Query params:
+        as_of: ISO 8601 timestamp; defaults to the current balance
+
+    Security: Requires ownership of the account
+    Response: account_id, as_of and balance
+    """
+    current_user_id = int(get_jwt_identity())
+    account = db.session.get(Account, account_id)
+    if account is None:
+        raise NotFound("Account not found")
+    if account.user_id != current_user_id:
+        raise Forbidden("You don't have access to this account")
+
+    if 'as_of' not in request.args:
+        return jsonify({'account_id': account.id, 'as_of': None, 'balance': str(account.balance)}), 200
+
+    try:
+        as_of = datetime.fromisoformat(request.args['as_of'])
+    except ValueError:
+        raise BadRequest("as_of must be an ISO 8601 timestamp")
+    # Timestamps are stored as naive UTC
+    if as_of.tzinfo is not None:
+        as_of = as_of.astimezone(timezone.utc).replace(tzinfo=None)
+
+    balance = balance_as_of(account, as_of)
+    return jsonify({'account_id': account.id, 'as_of': as_of.isoformat(), 'balance': str(balance)}), 200
+
 @accounts_bp.route('', methods=['POST'])
 @jwt_required()
 def create_account():
@@ -0,0 +1,104 @@
+# Async versions of the read-heavy GET endpoints, served by app.asgi.AsyncReadApp
+#
+# Each handler answers exactly like the Flask view of the same name, but
+# awaits its queries on an async engine connection instead of blocking a
+# worker thread on db.session.
+from functools import wraps
+from flask import jsonify, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+from werkzeug.exceptions import NotFound, Forbidden
+from app.models.account import Account
+from app.models.bill import Bill
+from app.models.budget import Budget
+from app.models.transaction import Transaction
+from app.models.transaction_category import TransactionCategory
+from app.routes.transactions import history_page_query, history_page
+from app.services.conditional import collection_scope, version_query, validators, not_modified, add_validators
+from app.serialization import model_columns, serialize_tuples
+
+# URL rule -> handler(connection, **view_args)
+ASYNC_ROUTES = {}
+
+def async_route(rule):
+    def decorator(handler):
+        ASYNC_ROUTES[rule] = handler
+        return handler
+    return decorator
+
+def async_conditional(collection):
+    """app.services.conditional.conditional for async handlers"""
+    def decorator(handler):
+        @wraps(handler)
+        async def wrapper(connection, *args, **kwargs):
+            scope_id = collection_scope(collection)
+            version_row = (await connection.execute(version_query(collection, scope_id))).first()
+            etag, last_modified = validators(collection, scope_id, version_row)
+            response = not_modified(etag, last_modified)
+            if response is None:
+                response = jsonify(await handler(connection, *args, **kwargs))
+            return add_validators(response, etag, last_modified)
+        return wrapper
+    return decorator
+
+@async_route('/api/accounts')
+@async_conditional('accounts')
+async def get_all_accounts(connection):
+    result = await connection.execute(
+        select(*model_columns(Account)).where(Account.user_id == int(get_jwt_identity()))
+    )
+    return serialize_tuples(Account, result.all())
+
+@async_route('/api/accounts/<int:account_id>')
+async def get_single_account(connection, account_id):
+    result = await connection.execute(select(*model_columns(Account)).where(Account.id == account_id))
+    account = result.first()
+    if account is None:
+        raise NotFound("Account not found")
+    if account.user_id != int(get_jwt_identity()):
+        raise Forbidden("You don't have access to this account")
+    return jsonify(serialize_tuples(Account, [account])[0]), 200
+
+@async_route('/api/transactions')
+async def get_all_transactions(connection):
+    query, limit = history_page_query(int(get_jwt_identity()), request.args)
+    result = await connection.execute(query)
+    return jsonify(history_page(result.all(), limit)), 200
+
+@async_route('/api/transactions/<int:transaction_id>')
+async def get_transaction(connection, transaction_id):
+    # Owners of both accounts come back with the row for the access check
+    from_account, to_account = aliased(Account), aliased(Account)
+    result = await connection.execute(
+        select(*model_columns(Transaction), from_account.user_id, to_account.user_id)
+        .outerjoin(from_account, Transaction.from_account_id == from_account.id)
+        .outerjoin(to_account, Transaction.to_account_id == to_account.id)
+        .where(Transaction.id == transaction_id)
+    )
+    row = result.first()
+    if row is None:
+        raise NotFound("Transaction not found")
+    if int(get_jwt_identity()) not in row[-2:]:
+        raise Forbidden("You don't have access to this transaction")
+    return jsonify(serialize_tuples(Transaction, [row])[0]), 200
+
+@async_route('/api/transactions/categories')
+@async_conditional('categories')
+async def get_transaction_categories(connection):
+    result = await connection.execute(select(*model_columns(TransactionCategory)))
+    return serialize_tuples(TransactionCategory, result.all())
+
+@async_route('/api/bills')
+@async_conditional('bills')
+async def get_bills(connection):
+    result = await connection.execute(select(*model_columns(Bill)).where(Bill.user_id == int(get_jwt_identity())))
+    return serialize_tuples(Bill, result.all())
+
+@async_route('/api/budgets')
+@async_conditional('budgets')
+async def get_budgets(connection):
+    result = await connection.execute(
+        select(*model_columns(Budget)).where(Budget.user_id == int(get_jwt_identity()))
+    )
+    return serialize_tuples(Budget, result.all())
@@ -1,10 +1,14 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models.user import User
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from app.models.user import User, duplicate_field
 from app.services.auth import generate_token
+from app.services.passwords import hash_password
+from app.services.revocation import revoke_token, revoke_all_tokens
 from app.models.account import Account
 from app import db
-from werkzeug.exceptions import BadRequest, NotFound
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+from werkzeug.exceptions import BadRequest, NotFound, ServiceUnavailable
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
@@ -24,19 +28,25 @@ def register():
     if not all(field in data for field in required_fields):
         raise BadRequest("Missing required fields")
 
-    if User.query.filter_by(username=data['username']).first():
-        return jsonify({"error": "Username already exists"}), 409
-    if User.query.filter_by(email=data['email']).first():
-        return jsonify({"error": "Email already exists"}), 409
+    # One INSERT; the unique constraints catch duplicates, including concurrent signups.
+    # It runs before the password is checked and hashed, so a duplicate gets 409 without
+    # paying for a hash; the hash replaces the placeholder in the same transaction.
+    new_user = User(username=data['username'], email=data['email'], password_hash='')
+    db.session.add(new_user)
+    try:
+        db.session.flush()
+    except IntegrityError as e:
+        db.session.rollback()
+        field = duplicate_field(e)
+        if field is None:
+            raise
+        return jsonify({"error": f"{field.capitalize()} already exists"}), 409
 
-    new_user = User(username=data['username'], email=data['email'])
-    
     try:
         new_user.set_password(data['password'])
     except ValueError as e:
+        db.session.rollback()
         return jsonify({"error": str(e)}), 400
-        
-    db.session.add(new_user)
     db.session.commit()
     return jsonify({"message": "User created successfully"}), 201
 
@@ -88,16 +98,39 @@ def login():
     
     if not user or not user.check_password(data['password']):
         return jsonify({"error": "Invalid credentials"}), 401
+
+    if user.password_needs_rehash():
+        # Hash parameters changed since this password was set; upgrade it while we have it
+        try:
+            user.password_hash = hash_password(data['password'])
+            db.session.commit()
+        except ServiceUnavailable:
+            pass  # Busy, the next login will try again
     
     access_token = generate_token(user.id)
     return jsonify(access_token=access_token), 200
 
+@auth_bp.route('/logout', methods=['POST'])
+@jwt_required()
+def logout():
+    """Revoke the access token used for this request"""
+    revoke_token(get_jwt())
+    return jsonify({"message": "Logged out successfully"}), 200
+
+@auth_bp.route('/logout/all', methods=['POST'])
+@jwt_required()
+def logout_all():
+    """Revoke every access token issued to the authenticated user so far"""
+    revoke_all_tokens(int(get_jwt_identity()))
+    return jsonify({"message": "All sessions logged out"}), 200
+
 @auth_bp.route('/users/me', methods=['DELETE'])
 @jwt_required()
 def delete_current_user():
     """Delete authenticated user's account if all accounts are deactivated"""
     current_user_id = get_jwt_identity()
-    user = db.session.get(User, current_user_id)
+    # Accounts are deleted by cascade, load them up front
+    user = db.session.get(User, current_user_id, options=[selectinload(User.accounts)])
     if user is None:
         raise NotFound("User not found")
     
@@ -2,14 +2,19 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.bill import Bill
 from app.models.account import Account
+from app.services.idempotency import idempotent, commit
+from app.services.conditional import conditional
+from app.serialization import model_columns, serialize_tuples
 from app import db
 from werkzeug.exceptions import BadRequest, NotFound, Forbidden
 from decimal import Decimal
+from sqlalchemy import select
 
 bills_bp = Blueprint('bills', __name__)
 
 @bills_bp.route('', methods=['POST'])
 @jwt_required()
+@idempotent
 def create_bill():
     """Schedule a bill payment for a specific biller."""
     current_user_id = int(get_jwt_identity())
@@ -35,16 +40,19 @@ def create_bill():
         amount=amount
     )
     db.session.add(new_bill)
-    db.session.commit()
+    commit()
     return jsonify(new_bill.serialize()), 201
 
 @bills_bp.route('', methods=['GET'])
 @jwt_required()
+@conditional('bills')
 def get_bills():
     """Retrieve all scheduled bill payments."""
     current_user_id = int(get_jwt_identity())
-    bills = Bill.query.filter_by(user_id=current_user_id).all()
-    return jsonify([bill.serialize() for bill in bills]), 200
+    bills = db.session.execute(
+        select(*model_columns(Bill)).where(Bill.user_id == current_user_id)
+    ).all()
+    return jsonify(serialize_tuples(Bill, bills)), 200
 
 @bills_bp.route('/<int:bill_id>', methods=['PUT'])
 @jwt_required()
@@ -1,8 +1,12 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.budget import Budget
+from app.services.budgets import budget_statuses
+from app.services.conditional import conditional
+from app.serialization import model_columns, serialize_tuples
 from app import db
 from werkzeug.exceptions import BadRequest, NotFound, Forbidden
+from sqlalchemy import select
 
 budgets_bp = Blueprint('budgets', __name__)
 
@@ -32,11 +36,34 @@ def create_budget():
 
 @budgets_bp.route('', methods=['GET'])
 @jwt_required()
+@conditional('budgets')
 def get_budgets():
     """Retrieve all budgets created by the user."""
     current_user_id = int(get_jwt_identity())
+    budgets = db.session.execute(
+        select(*model_columns(Budget)).where(Budget.user_id == current_user_id)
+    ).all()
+    return jsonify(serialize_tuples(Budget, budgets)), 200
+
+@budgets_bp.route('/status', methods=['GET'])
+@jwt_required()
+def get_budgets_status():
+    """Report spent, remaining and percent used for all of the user's budgets."""
+    current_user_id = int(get_jwt_identity())
     budgets = Budget.query.filter_by(user_id=current_user_id).all()
-    return jsonify([b.serialize() for b in budgets]), 200
+    return jsonify(budget_statuses(current_user_id, budgets)), 200
+
+@budgets_bp.route('/<int:budget_id>/status', methods=['GET'])
+@jwt_required()
+def get_budget_status(budget_id):
+    """Report spent, remaining and percent used for a single budget."""
+    current_user_id = int(get_jwt_identity())
+    budget = db.session.get(Budget, budget_id)
+    if not budget:
+        raise NotFound("Budget not found")
+    if budget.user_id != current_user_id:
+        raise Forbidden("Access denied")
+    return jsonify(budget_statuses(current_user_id, [budget])[0]), 200
 
 @budgets_bp.route('/<int:budget_id>', methods=['PUT'])
 @jwt_required()
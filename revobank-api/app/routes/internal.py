@@ -0,0 +1,36 @@
+# internal.py - Operational endpoints, only answered for INTERNAL_ALLOWED_IPS
+import os
+from flask import Blueprint, current_app, jsonify, request
+from werkzeug.exceptions import NotFound
+from app.middleware.metrics import CONTENT_TYPE
+
+internal_bp = Blueprint('internal', __name__)
+
+# Served at /metrics, where Prometheus looks by default
+metrics_bp = Blueprint('metrics', __name__)
+
+@internal_bp.before_request
+@metrics_bp.before_request
+def internal_only():
+    # Look like a missing page to everyone else
+    if request.remote_addr not in current_app.config['INTERNAL_ALLOWED_IPS']:
+        raise NotFound()
+
+@internal_bp.route('/pool', methods=['GET'])
+def get_pool_stats():
+    """Connection pool statistics of the worker process that answers
+
+    Response: {"pid": int, "engines": {name: stats}}; gunicorn spreads
+    requests over workers, so poll a few times to see each of them.
+    """
+    return jsonify({
+        'pid': os.getpid(),
+        'engines': {name: stats.snapshot() for name, stats in current_app.extensions['pool_stats'].items()}
+    }), 200
+
+@metrics_bp.route('', methods=['GET'])
+def get_metrics():
+    """Request counts, latency and database time per endpoint, for Prometheus"""
+    if 'metrics' not in current_app.extensions:
+        raise NotFound("Metrics are disabled")
+    return current_app.response_class(current_app.extensions['metrics'].render(), content_type=CONTENT_TYPE)
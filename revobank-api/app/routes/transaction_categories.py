@@ -1,12 +1,15 @@
 from flask import Blueprint, jsonify
 from flask_jwt_extended import jwt_required
 from app.models.transaction_category import TransactionCategory
+from app.services.conditional import conditional
+from app.serialization import serialize_rows
 
 transaction_categories_bp = Blueprint('transaction_categories', __name__)
 
 @transaction_categories_bp.route('', methods=['GET'])
 @jwt_required()
+@conditional('categories')
 def get_transaction_categories():
     """Retrieve a list of transaction categories for budgeting purposes."""
     categories = TransactionCategory.query.all()
-    return jsonify([cat.serialize() for cat in categories]), 200
+    return jsonify(serialize_rows(TransactionCategory, categories)), 200
@@ -1,51 +1,249 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.account import Account
 from app.models.transaction import Transaction
+from app.models.transaction_rollup import TransactionRollup
+from app.services.idempotency import idempotent
+from app.services.rollups import record_transactions
+from app.serialization import field_names, model_columns, serializer_for, serialize_tuples
+from app.services.pagination import encode_cursor, decode_cursor, parse_limit
+from app.services.ledger import ACCOUNT_ID_FIELDS, parse_transaction, check_accounts, check_funds, apply_balances, post_transaction
 from app import db
-from werkzeug.exceptions import NotFound, Forbidden, BadRequest
+from sqlalchemy import select, union_all, or_, tuple_, func
+from sqlalchemy.orm import joinedload
+from werkzeug.exceptions import HTTPException, NotFound, Forbidden, BadRequest
 from datetime import datetime
 from decimal import Decimal
-from decimal import InvalidOperation
+import csv
+import io
+import json
 
 transactions_bp = Blueprint('transactions', __name__, url_prefix='/api/transactions')
 
+# Rows fetched per round trip and written per chunk when exporting
+EXPORT_BATCH_SIZE = 1000
+
+# Export format -> (mimetype, row encoder)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', lambda row, fields: _csv_line([row[field] for field in fields])),
+    'ndjson': ('application/x-ndjson', lambda row, fields: json.dumps(row) + '\n'),
+}
+
+# group_by name -> (response key, rollup column)
+SUMMARY_GROUPS = {
+    'month': ('month', TransactionRollup.month),
+    'category': ('category_id', TransactionRollup.category_id),
+    'type': ('type', TransactionRollup.type),
+    'account': ('account_id', TransactionRollup.account_id),
+}
+
+CENTS = Decimal('0.01')
+
+# atomic: all-or-nothing, best_effort: commit whatever succeeds
+BATCH_MODES = ['atomic', 'best_effort']
+
 @transactions_bp.route('', methods=['GET'])
 @jwt_required()
 def get_all_transactions():
-    current_user_id = int(get_jwt_identity())
-    args = request.args
+    """List the user's transactions, newest first, one page at a time
+
+    Query params:
+        account_id, start_date, end_date: Optional filters
+        limit: Page size (capped at TRANSACTIONS_MAX_PAGE_SIZE)
+        cursor: next_cursor from the previous page
+
+    Response: {"transactions": [...], "next_cursor": str | null}
+    """
+    query, limit = history_page_query(int(get_jwt_identity()), request.args)
+    return jsonify(history_page(db.session.execute(query).all(), limit)), 200
 
-    # Base query to find transactions where user owns either account
-    query = Transaction.query.join(Account, (
-        (Account.id == Transaction.from_account_id) | 
-        (Account.id == Transaction.to_account_id)
-    )).filter(Account.user_id == current_user_id)
+def history_page_query(current_user_id, args):
+    """Select for one page of transaction history, and the page size
+
+    One row more than the page size is selected, so history_page() knows
+    whether another page exists.
+    """
+    limit = parse_limit(
+        args,
+        current_app.config['TRANSACTIONS_PAGE_SIZE'],
+        current_app.config['TRANSACTIONS_MAX_PAGE_SIZE']
+    )
+
+    # Seek past the last row of the previous page instead of using OFFSET
+    keyset = decode_cursor(args['cursor']) if 'cursor' in args else None
+    return _history_query(current_user_id, args, keyset).limit(limit + 1), limit
+
+def history_page(transactions, limit):
+    """Response body for rows selected with history_page_query()"""
+    next_cursor = None
+    if len(transactions) > limit:
+        transactions = transactions[:limit]
+        last = transactions[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+
+    return {
+        'transactions': serialize_tuples(Transaction, transactions),
+        'next_cursor': next_cursor
+    }
+
+def _history_query(current_user_id, args, keyset=None):
+    """Build the filtered transaction-history select for a user, newest first
+
+    Selects only the columns of Transaction.serialize (see model_columns), so
+    rows can be serialized without building ORM objects.
+
+    Outgoing and incoming transactions are selected in two branches so each
+    one can seek the (account, created_at) indexes, then merged with UNION ALL.
+    Transfers between two of the user's own accounts only come from the
+    outgoing branch, so nothing is returned twice.
+    """
+    user_accounts = select(Account.id).where(Account.user_id == current_user_id).scalar_subquery()
+
+    outgoing = select(Transaction).where(Transaction.from_account_id.in_(user_accounts))
+    incoming = select(Transaction).where(
+        Transaction.to_account_id.in_(user_accounts),
+        or_(
+            Transaction.from_account_id.is_(None),
+            Transaction.from_account_id.not_in(user_accounts)
+        )
+    )
 
-    # Apply filters if provided
+    # Apply filters to both branches so they are pushed down to the index seek
+    filters = []
     if 'account_id' in args:
         account_id = int(args['account_id'])
-        query = query.filter(
+        filters.append(
             (Transaction.from_account_id == account_id) | 
             (Transaction.to_account_id == account_id)
         )
     
     if 'start_date' in args:
         start_date = datetime.fromisoformat(args['start_date'])
-        query = query.filter(Transaction.created_at >= start_date)
+        filters.append(Transaction.created_at >= start_date)
     
     if 'end_date' in args:
         end_date = datetime.fromisoformat(args['end_date'])
-        query = query.filter(Transaction.created_at <= end_date)
+        filters.append(Transaction.created_at <= end_date)
+
+    if keyset is not None:
+        filters.append(tuple_(Transaction.created_at, Transaction.id) < tuple_(*keyset))
+
+    history = union_all(outgoing.where(*filters), incoming.where(*filters)).subquery()
+    return select(*model_columns(Transaction, history)).order_by(history.c.created_at.desc(), history.c.id.desc())
+
+@transactions_bp.route('/export', methods=['GET'])
+@jwt_required()
+def export_transactions():
+    """Stream the user's full transaction history as CSV or NDJSON
+
+    Query params:
+        format: csv (default) or ndjson
+        account_id, start_date, end_date: Same filters as the list endpoint
+
+    Rows are read from a server-side cursor and written out in chunks, so
+    memory use does not grow with the size of the history.
+    """
+    current_user_id = int(get_jwt_identity())
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        raise BadRequest(f"Invalid export format. Allowed: {sorted(EXPORT_FORMATS)}")
+
+    query = _history_query(current_user_id, request.args)
+    # Column order follows Transaction.serialize so downstream parsers stay stable
+    fields = field_names(Transaction)
+    serialize = serializer_for(Transaction, tuples=True)
+    mimetype, encode_row = EXPORT_FORMATS[export_format]
+
+    def generate():
+        if export_format == 'csv':
+            yield _csv_line(fields)
+        chunk = []
+        rows = db.session.execute(query, execution_options={'yield_per': EXPORT_BATCH_SIZE})
+        for row in rows:
+            chunk.append(encode_row(serialize(row), fields))
+            if len(chunk) >= EXPORT_BATCH_SIZE:
+                yield ''.join(chunk)
+                chunk = []
+        if chunk:
+            yield ''.join(chunk)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=transactions.{export_format}'}
+    )
+
+def _csv_line(values):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
+
+@transactions_bp.route('/summary', methods=['GET'])
+@jwt_required()
+def get_transaction_summary():
+    """Summarize the user's transactions from the monthly rollup table
+
+    Query params:
+        group_by: Comma-separated subset of month, category, type, account
+                  (default: month,category)
+        account_id: Limit to one account
+        start_date, end_date: Limit to the months containing these dates
+
+    Cost depends on the number of months and categories, not transactions.
+    Response: List of groups with amount_in, amount_out and transaction_count
+    """
+    current_user_id = int(get_jwt_identity())
+    args = request.args
+    group_by = [name.strip() for name in args.get('group_by', 'month,category').split(',') if name.strip()]
+    if not group_by or any(name not in SUMMARY_GROUPS for name in group_by):
+        raise BadRequest(f"Invalid group_by. Allowed: {list(SUMMARY_GROUPS)}")
+
+    columns = [SUMMARY_GROUPS[name][1] for name in group_by]
+    query = db.session.query(
+        *columns,
+        func.sum(TransactionRollup.amount_in),
+        func.sum(TransactionRollup.amount_out),
+        func.sum(TransactionRollup.transaction_count)
+    ).join(Account, Account.id == TransactionRollup.account_id).filter(Account.user_id == current_user_id)
+
+    if 'account_id' in args:
+        query = query.filter(TransactionRollup.account_id == int(args['account_id']))
+    if 'start_date' in args:
+        start_date = datetime.fromisoformat(args['start_date'])
+        query = query.filter(TransactionRollup.month >= start_date.date().replace(day=1))
+    if 'end_date' in args:
+        end_date = datetime.fromisoformat(args['end_date'])
+        query = query.filter(TransactionRollup.month <= end_date.date().replace(day=1))
+
+    summary = []
+    for row in query.group_by(*columns).order_by(*columns):
+        group = {}
+        for name, value in zip(group_by, row):
+            key = SUMMARY_GROUPS[name][0]
+            if name == 'month':
+                value = value.strftime('%Y-%m')
+            elif name == 'category':
+                value = value or None
+            group[key] = value
+        amount_in, amount_out, count = row[len(group_by):]
+        group.update({
+            'amount_in': str(Decimal(amount_in).quantize(CENTS)),
+            'amount_out': str(Decimal(amount_out).quantize(CENTS)),
+            'transaction_count': count
+        })
+        summary.append(group)
 
-    transactions = query.all()
-    return jsonify([t.serialize() for t in transactions]), 200
+    return jsonify(summary), 200
 
 @transactions_bp.route('/<int:transaction_id>', methods=['GET'])
 @jwt_required()
 def get_transaction(transaction_id):
     current_user_id = int(get_jwt_identity())
-    transaction = db.session.get(Transaction, transaction_id)
+    # Fetch both accounts in the same query for the ownership check
+    transaction = db.session.get(Transaction, transaction_id, options=[
+        joinedload(Transaction.from_account),
+        joinedload(Transaction.to_account)
+    ])
     if transaction is None:
         raise NotFound("Transaction not found")
 
@@ -63,89 +261,128 @@ def get_transaction(transaction_id):
 
 @transactions_bp.route('', methods=['POST'])
 @jwt_required()
+@idempotent
 def create_transaction():
     current_user_id = int(get_jwt_identity())
     data = request.get_json()
+    transaction_type, amount = parse_transaction(data)
 
-    # Validate required fields
-    required = ['type', 'amount']
-    if not all(field in data for field in required):
-        raise BadRequest("Missing required fields")
-
-    # Validate transaction type
-    if data['type'] not in ['deposit', 'withdrawal', 'transfer']:
-        raise BadRequest("Invalid transaction type")
+    # Load and validate accounts
+    from_account = None
+    to_account = None
+    if 'from_account_id' in data:
+        from_account = db.session.get(Account, data['from_account_id'])
+    if 'to_account_id' in data:
+        to_account = db.session.get(Account, data['to_account_id'])
+    check_accounts(data, from_account, to_account, current_user_id)
 
-    # Convert and validate amount
+    # Check funds and update balances in the database, not on the loaded rows
     try:
-        amount = Decimal(data['amount'])
-    except InvalidOperation:
-        raise BadRequest("Invalid amount format")
+        transaction = post_transaction(
+            transaction_type,
+            amount,
+            from_account_id=data.get('from_account_id'),
+            to_account_id=data.get('to_account_id'),
+            description=data.get('description'),
+            category_id=data.get('category_id')
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise BadRequest(f"Transaction failed: {str(e)}")
     
-    if amount <= 0:
-        raise BadRequest("Amount must be positive")
-
-    # Validate accounts based on type
-    from_account = None
-    to_account = None
+    return jsonify(transaction.serialize()), 201
 
+@transactions_bp.route('/batch', methods=['POST'])
+@jwt_required()
+def create_transactions_batch():
+    """Post many transactions in one request and one commit
 
-    if data['type'] == 'transfer':
-        if not data.get('from_account_id') or not data.get('to_account_id'):
-            raise BadRequest("Both from_account_id and to_account_id required for transfers")
-    elif data['type'] == 'withdrawal':
-        if not data.get('from_account_id'):
-            raise BadRequest("from_account_id required for withdrawals")
-    elif data['type'] == 'deposit':
-        if not data.get('to_account_id'):
-            raise BadRequest("to_account_id required for deposits")
+    Body: JSON array of transaction payloads (same shape as POST /api/transactions)
+    Query params:
+        mode: atomic (default) - commit nothing if any item fails
+              best_effort - commit the items that succeed
 
-    # Load and validate accounts
-    if 'from_account_id' in data:
-        from_account = db.session.get(Account, data['from_account_id'])
-        if from_account is None:
-            raise NotFound("Source account not found")
-        if from_account.user_id != current_user_id:
-            raise Forbidden("You don't own the source account")
+    Response: {"mode", "committed", "results": [{"index", "status", ...}]}
+        201 when every item was committed, 207 for a partial best_effort
+        batch, 400 when an atomic batch was rejected
+    """
+    current_user_id = int(get_jwt_identity())
+    items = request.get_json()
+    mode = request.args.get('mode', 'atomic')
+    if mode not in BATCH_MODES:
+        raise BadRequest(f"Invalid batch mode. Allowed: {BATCH_MODES}")
+    if not isinstance(items, list) or not items:
+        raise BadRequest("Request body must be a non-empty array of transactions")
+    if len(items) > current_app.config['TRANSACTIONS_BATCH_MAX_SIZE']:
+        raise BadRequest(f"Batch exceeds {current_app.config['TRANSACTIONS_BATCH_MAX_SIZE']} transactions")
 
-    if 'to_account_id' in data:
-        to_account = db.session.get(Account, data['to_account_id'])
-        if to_account is None:
-            raise NotFound("Destination account not found")
-        # Allow transfers to other users' accounts but deposits must be to your own account
-        if data['type'] != 'transfer' and to_account.user_id != current_user_id:
-            raise Forbidden("Invalid destination account")
+    results = [None] * len(items)
 
-    # Check sufficient funds for withdrawals or transfers
-    if data['type'] in ['withdrawal', 'transfer']:
-        if from_account.balance < Decimal(data['amount']):
-            raise BadRequest("Insufficient funds")
+    # Validate every payload before touching the database
+    parsed = {}
+    for index, data in enumerate(items):
+        try:
+            parsed[index] = parse_transaction(data)
+        except HTTPException as e:
+            results[index] = _batch_error(index, e)
 
-    # Convert amount from string to Decimal for arithmetic
-    amount = Decimal(data['amount'])
+    # Load every referenced account in a single query; parse_transaction made the ids ints
+    account_ids = set()
+    for index in parsed:
+        for key in ACCOUNT_ID_FIELDS:
+            if items[index].get(key) is not None:
+                account_ids.add(items[index][key])
+    # and lock them in id order so concurrent postings cannot overwrite the balances
+    accounts = {}
+    if account_ids:
+        accounts = {
+            a.id: a for a in
+            Account.query.filter(Account.id.in_(account_ids)).order_by(Account.id).with_for_update()
+        }
 
-    # Create transaction and update balances
-    try:
-        transaction = Transaction(
-            type=data['type'],
+    # Apply balance changes in memory, in request order
+    transactions = {}
+    for index, (transaction_type, amount) in parsed.items():
+        data = items[index]
+        from_account = accounts.get(data.get('from_account_id'))
+        to_account = accounts.get(data.get('to_account_id'))
+        try:
+            check_accounts(data, from_account, to_account, current_user_id)
+            check_funds(transaction_type, amount, from_account)
+        except HTTPException as e:
+            results[index] = _batch_error(index, e)
+            continue
+        apply_balances(transaction_type, amount, from_account, to_account)
+        transactions[index] = Transaction(
+            type=transaction_type,
             amount=amount,
             from_account_id=data.get('from_account_id'),
             to_account_id=data.get('to_account_id'),
+            category_id=data.get('category_id'),
             description=data.get('description')
         )
-        db.session.add(transaction)
 
-        if data['type'] == 'deposit':
-            to_account.balance += amount
-        elif data['type'] == 'withdrawal':
-            from_account.balance -= amount
-        elif data['type'] == 'transfer':
-            from_account.balance -= amount
-            to_account.balance += amount
+    failed = len(transactions) < len(items)
+    if not transactions or (failed and mode == 'atomic'):
+        db.session.rollback()
+        for index in transactions:
+            results[index] = {'index': index, 'status': 424, 'error': "Not committed: another item in the batch failed"}
+        return jsonify({'mode': mode, 'committed': False, 'results': results}), 400
 
+    try:
+        db.session.add_all(transactions.values())
+        # Flush to get ids, then serialize before commit expires the rows
+        db.session.flush()
+        record_transactions(transactions.values())
+        for index, transaction in transactions.items():
+            results[index] = {'index': index, 'status': 201, 'transaction': transaction.serialize()}
         db.session.commit()
     except Exception as e:
         db.session.rollback()
         raise BadRequest(f"Transaction failed: {str(e)}")
-    
-    return jsonify(transaction.serialize()), 201
\ No newline at end of file
+
+    return jsonify({'mode': mode, 'committed': True, 'results': results}), 207 if failed else 201
+
+def _batch_error(index, error):
+    return {'index': index, 'status': error.code, 'error': error.description}
@@ -0,0 +1,136 @@
+# Fast JSON encoding for API responses
+import re
+from decimal import Decimal
+from operator import attrgetter, methodcaller
+from flask import current_app
+from sqlalchemy import Date, DateTime, Numeric
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional speedup, the stdlib encoder is used without it
+    orjson = None
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson
+
+    Output matches Flask's default provider for the values this API returns:
+    keys are sorted, Decimal is written as a string, date/datetime as ISO
+    8601 (Flask's default would use an HTTP date for datetime) and non-ASCII
+    text as \\uXXXX escapes.
+    """
+    ensure_ascii = True
+    sort_keys = True
+    mimetype = 'application/json'
+
+    def dumps(self, obj, **kwargs):
+        return self.dump_bytes(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def dump_bytes(self, obj):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if self._app.debug:
+            option |= orjson.OPT_INDENT_2
+        data = orjson.dumps(obj, default=_default, option=option)
+        if self.ensure_ascii and not data.isascii():
+            # orjson always writes UTF-8; only text outside ASCII needs the second pass
+            data = _NON_ASCII.sub(_escape, data.decode()).encode()
+        return data
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dump_bytes(obj) + b'\n', mimetype=self.mimetype)
+
+def init_json(app):
+    """Use the orjson provider when it is installed and FAST_JSON is on"""
+    if orjson is not None and app.config['FAST_JSON']:
+        app.json = OrjsonProvider(app)
+
+_NON_ASCII = re.compile(r'[^\x00-\x7f]')
+
+def _escape(match):
+    """The stdlib encoder's escape for a non-ASCII character, as a surrogate pair above U+FFFF"""
+    code = ord(match.group())
+    if code < 0x10000:
+        return f'\\u{code:04x}'
+    code -= 0x10000
+    return f'\\u{0xd800 | code >> 10:04x}\\u{0xdc00 | code & 0x3ff:04x}'
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+_serializers = {}
+
+def serializer_for(model, native_dates=False, tuples=False):
+    """Return a function producing the model's serialize() dict
+
+    The keys are the model's SERIALIZED_FIELDS, in order. Numeric columns
+    are written with str(), dates with isoformat() and datetimes with
+    isoformat() or None, following the column types. By default the
+    function reads attributes of a model instance; with tuples it reads a
+    row selected with model_columns(). With native_dates, dates are left for
+    the encoder to format (orjson does this in C with the same output).
+    The function is built once per model and options.
+    """
+    key = (model, native_dates, tuples)
+    if key not in _serializers:
+        _serializers[key] = _build(model, native_dates, tuples)
+    return _serializers[key]
+
+def _build(model, native_dates, tuples):
+    names = field_names(model)
+    # A model_columns() row already holds the values in order
+    values = None if tuples else attrgetter(*names)
+    converted = []
+    for name in names:
+        column_type = model.__table__.c[name].type
+        if isinstance(column_type, Numeric):
+            converted.append((name, str))
+        elif native_dates:
+            continue
+        elif isinstance(column_type, DateTime):
+            converted.append((name, _isoformat_or_none))
+        elif isinstance(column_type, Date):
+            converted.append((name, _isoformat))
+
+    def serialize(obj):
+        data = dict(zip(names, obj if values is None else values(obj)))
+        for name, convert in converted:
+            data[name] = convert(data[name])
+        return data
+    return serialize
+
+_isoformat = methodcaller('isoformat')
+
+def _isoformat_or_none(value):
+    return value.isoformat() if value is not None else None
+
+def field_names(model):
+    """Keys of the model's serialize() output, in order"""
+    return list(model.SERIALIZED_FIELDS)
+
+def model_columns(model, source=None):
+    """Columns backing serialize(), in order, for a Core select()
+
+    Selecting these instead of the entity skips ORM instances, the identity
+    map and change tracking for read-only lists. source can be a subquery
+    with the same column names as the model's table.
+    """
+    columns = (source if source is not None else model.__table__).c
+    return [columns[name] for name in field_names(model)]
+
+def serialize_rows(model, rows):
+    """Serialize model instances for jsonify() with the app's JSON provider"""
+    serialize = serializer_for(model, native_dates=isinstance(current_app.json, OrjsonProvider))
+    return [serialize(row) for row in rows]
+
+def serialize_tuples(model, rows):
+    """Serialize rows selected with model_columns() for jsonify()"""
+    serialize = serializer_for(model, native_dates=isinstance(current_app.json, OrjsonProvider), tuples=True)
+    return [serialize(row) for row in rows]
@@ -2,5 +2,8 @@
 from datetime import timedelta
 from flask_jwt_extended import create_access_token
 
+# Lifetime of access tokens, also how long a revocation has to be kept
+TOKEN_LIFETIME = timedelta(hours=3)
+
 def generate_token(user_id):
-    return create_access_token(identity=str(user_id),expires_delta=timedelta(hours=3))
\ No newline at end of file
+    return create_access_token(identity=str(user_id),expires_delta=TOKEN_LIFETIME)
@@ -0,0 +1,167 @@
+# Point-in-time balances backed by periodic checkpoints
+from datetime import datetime, time, timedelta, timezone
+from decimal import Decimal
+from flask import current_app
+from sqlalchemy import case, select, func, union_all
+from app import db
+from app.models.account import Account
+from app.models.balance_checkpoint import BalanceCheckpoint
+from app.models.transaction import Transaction
+
+CENTS = Decimal('0.01')
+
+def balance_as_of(account, as_of):
+    """Balance of the account after every transaction up to and including as_of
+
+    Starts from the nearest checkpoint and only replays the transactions
+    between it and as_of, so the cost depends on recent activity rather than
+    on the age of the account.
+    """
+    before = BalanceCheckpoint.query.filter(
+        BalanceCheckpoint.account_id == account.id,
+        BalanceCheckpoint.as_of <= as_of
+    ).order_by(BalanceCheckpoint.as_of.desc()).first()
+    if before is not None:
+        return _quantize(before.balance + _net_change(account.id, before.as_of, as_of))
+
+    after = BalanceCheckpoint.query.filter(
+        BalanceCheckpoint.account_id == account.id,
+        BalanceCheckpoint.as_of > as_of
+    ).order_by(BalanceCheckpoint.as_of).first()
+    if after is not None:
+        return _quantize(after.balance - _net_change(account.id, as_of, after.as_of))
+
+    # No checkpoints yet, walk back from the live balance
+    return _quantize(_live_balance_at(account.id, as_of))
+
+def write_checkpoints(now=None, min_postings=None):
+    """Write a checkpoint for every account that is due one
+
+    An account is due at each day boundary (UTC midnight) if it had activity
+    since its last checkpoint, and in between once it has min_postings new
+    transactions. Transactions newer than BALANCE_CHECKPOINT_GRACE seconds
+    are left out so late commits cannot land behind a checkpoint.
+
+    Returns the number of checkpoints written.
+    """
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    if min_postings is None:
+        min_postings = current_app.config['BALANCE_CHECKPOINT_INTERVAL']
+    horizon = now - timedelta(seconds=current_app.config['BALANCE_CHECKPOINT_GRACE'])
+    midnight = datetime.combine(horizon.date(), time.min)
+    checkpoints = []
+
+    # Accounts without checkpoints start at the last midnight, walked back from the live balance
+    fresh = select(Account.id.label('account_id')).where(
+        ~select(BalanceCheckpoint.id).where(BalanceCheckpoint.account_id == Account.id).exists()
+    ).subquery()
+    later = _postings(fresh, midnight)
+    later_net = select(later.c.account_id, func.sum(later.c.amount).label('net')).group_by(later.c.account_id).subquery()
+    # Balance and later activity in one statement so they match
+    for account_id, balance, net in db.session.execute(
+        select(Account.id, Account.balance, func.coalesce(later_net.c.net, 0))
+        .join(fresh, fresh.c.account_id == Account.id)
+        .outerjoin(later_net, later_net.c.account_id == Account.id)
+    ):
+        checkpoints.append((account_id, midnight, balance - Decimal(net)))
+
+    # The others from their latest checkpoint, with activity up to midnight and up to the horizon
+    latest = _latest_checkpoints()
+    due = select(latest).where(latest.c.as_of < horizon).subquery()
+    postings = _postings(due, due.c.as_of, horizon)
+    by_midnight = postings.c.created_at <= midnight
+    activity = {
+        account_id: totals for account_id, *totals in db.session.execute(
+            select(
+                postings.c.account_id,
+                func.coalesce(func.sum(case((by_midnight, postings.c.amount), else_=0)), 0),
+                func.count(case((by_midnight, 1))),
+                func.coalesce(func.sum(postings.c.amount), 0),
+                func.count()
+            ).group_by(postings.c.account_id)
+        )
+    }
+    for account_id, as_of, balance in db.session.execute(select(due)):
+        net_by_midnight, postings_by_midnight, net, posting_count = activity.get(account_id, (0, 0, 0, 0))
+        if as_of < midnight and postings_by_midnight:
+            checkpoints.append((account_id, midnight, balance + Decimal(net_by_midnight)))
+        elif posting_count >= min_postings:
+            checkpoints.append((account_id, horizon, balance + Decimal(net)))
+
+    db.session.add_all(
+        BalanceCheckpoint(account_id=account_id, as_of=as_of, balance=_quantize(balance))
+        for account_id, as_of, balance in checkpoints
+    )
+    db.session.commit()
+    return len(checkpoints)
+
+def _latest_checkpoints():
+    """Subquery with each account's newest checkpoint: account_id, as_of, balance"""
+    newest = select(
+        BalanceCheckpoint.account_id, func.max(BalanceCheckpoint.as_of).label('as_of')
+    ).group_by(BalanceCheckpoint.account_id).subquery()
+    return select(BalanceCheckpoint.account_id, BalanceCheckpoint.as_of, BalanceCheckpoint.balance).join(
+        newest, (BalanceCheckpoint.account_id == newest.c.account_id) & (BalanceCheckpoint.as_of == newest.c.as_of)
+    ).subquery()
+
+def _postings(accounts, after, until=None):
+    """Transactions of the accounts in (after, until], incoming positive and outgoing negative
+
+    accounts is a subquery with an account_id column; after is a value or
+    one of its columns. Each side joins on its own account column so it can
+    use the (account, created_at) indexes.
+    """
+    def side(column, amount):
+        query = select(accounts.c.account_id, amount.label('amount'), Transaction.created_at).select_from(
+            Transaction
+        ).join(accounts, column == accounts.c.account_id).where(Transaction.created_at > after)
+        if until is not None:
+            query = query.where(Transaction.created_at <= until)
+        return query
+
+    return union_all(
+        side(Transaction.to_account_id, Transaction.amount),
+        side(Transaction.from_account_id, -Transaction.amount)
+    ).subquery()
+
+def _totals(account_id, after=None, until=None):
+    """Sum and count of incoming and outgoing amounts in (after, until]
+
+    Each side filters on its own account column so it can use the
+    (account, created_at) indexes.
+    """
+    def side(column, aggregate):
+        query = select(aggregate).where(column == account_id)
+        if after is not None:
+            query = query.where(Transaction.created_at > after)
+        if until is not None:
+            query = query.where(Transaction.created_at <= until)
+        return query.scalar_subquery()
+
+    total = func.coalesce(func.sum(Transaction.amount), 0)
+    return (
+        side(Transaction.to_account_id, total),
+        side(Transaction.from_account_id, total),
+        side(Transaction.to_account_id, func.count()),
+        side(Transaction.from_account_id, func.count())
+    )
+
+def _activity(account_id, after, until):
+    incoming, outgoing, incoming_count, outgoing_count = db.session.execute(
+        select(*_totals(account_id, after, until))
+    ).one()
+    return Decimal(incoming) - Decimal(outgoing), incoming_count + outgoing_count
+
+def _net_change(account_id, after, until):
+    return _activity(account_id, after, until)[0]
+
+def _live_balance_at(account_id, as_of):
+    # Read the balance and later activity in one statement so they match
+    incoming, outgoing = _totals(account_id, after=as_of)[:2]
+    balance, incoming, outgoing = db.session.execute(
+        select(Account.balance, incoming, outgoing).where(Account.id == account_id)
+    ).one()
+    return balance - Decimal(incoming) + Decimal(outgoing)
+
+def _quantize(amount):
+    return Decimal(amount).quantize(CENTS)
@@ -0,0 +1,79 @@
+# Budget utilization from indexed range aggregates
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from itertools import accumulate
+from sqlalchemy import select, func, or_
+from app import db
+from app.models.account import Account
+from app.models.transaction import Transaction
+
+CENTS = Decimal('0.01')
+
+def budget_statuses(user_id, budgets):
+    """Spent, remaining and percent used for each of a user's budgets
+
+    Spending is money leaving the user's accounts: withdrawals, and
+    transfers to accounts the user does not own. It is summed per day in
+    the database over the span of all the budgets, then each budget adds
+    up its own days, so any number of budgets costs a single query.
+    """
+    if not budgets:
+        return []
+
+    days, totals = _daily_spending(
+        user_id,
+        min(budget.start_date for budget in budgets),
+        max(budget.end_date for budget in budgets)
+    )
+    # Prefix sums so each budget's range is two lookups
+    running = [Decimal('0')] + list(accumulate(totals))
+
+    statuses = []
+    for budget in budgets:
+        first = bisect_left(days, budget.start_date)
+        last = bisect_right(days, budget.end_date)
+        spent = (running[last] - running[first]).quantize(CENTS)
+        amount = Decimal(budget.amount)
+        statuses.append({
+            'budget_id': budget.id,
+            'name': budget.name,
+            'amount': str(amount.quantize(CENTS)),
+            'start_date': budget.start_date.isoformat(),
+            'end_date': budget.end_date.isoformat(),
+            'spent': str(spent),
+            'remaining': str((amount - spent).quantize(CENTS)),
+            'percent_used': float(round(spent / amount * 100, 2)) if amount else None
+        })
+    return statuses
+
+def _daily_spending(user_id, start_date, end_date):
+    """Sorted days and the amount spent on each, between two dates inclusive"""
+    user_accounts = select(Account.id).where(Account.user_id == user_id).scalar_subquery()
+    day = func.date(Transaction.created_at)
+    rows = db.session.execute(
+        select(day, func.sum(Transaction.amount))
+        .where(
+            Transaction.from_account_id.in_(user_accounts),
+            Transaction.type.in_(['withdrawal', 'transfer']),
+            or_(
+                Transaction.to_account_id.is_(None),
+                Transaction.to_account_id.not_in(user_accounts)
+            ),
+            # Plain range on created_at so the (from_account_id, created_at) index applies
+            Transaction.created_at >= datetime.combine(start_date, time.min),
+            Transaction.created_at < datetime.combine(end_date + timedelta(days=1), time.min)
+        )
+        .group_by(day)
+        .order_by(day)
+    ).all()
+
+    days = [_as_date(row[0]) for row in rows]
+    totals = [Decimal(row[1]) for row in rows]
+    return days, totals
+
+def _as_date(value):
+    # SQLite returns date() as text
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    return value
@@ -0,0 +1,203 @@
+# ETag / Last-Modified validators for polled collections
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+from flask import request, make_response, current_app
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from werkzeug.http import is_resource_modified
+from app import db
+from app.models.account import Account
+from app.models.bill import Bill
+from app.models.budget import Budget
+from app.models.collection_version import CollectionVersion
+from app.models.transaction_category import TransactionCategory
+from app.models.user import User
+
+# Models whose writes change a collection response, and the collection they belong to
+TRACKED_MODELS = {
+    Account: 'accounts',
+    Bill: 'bills',
+    Budget: 'budgets',
+    TransactionCategory: 'categories',
+}
+
+# Collections shared by every user, versioned under scope 0
+SHARED_COLLECTIONS = {'categories'}
+
+# session.info key of the collections written in the session's current transaction
+PENDING_VERSIONS = 'pending_collection_versions'
+
+# Last-Modified has one second resolution, so it is only sent once the
+# collection has been unchanged for this long (RFC 9110 section 8.8.2.2)
+LAST_MODIFIED_SETTLE = timedelta(seconds=1)
+
+def conditional(collection):
+    """Answer 304 Not Modified when the client's copy of the collection is current
+
+    The collection's version is read before the view runs; if the request's
+    If-None-Match (or If-Modified-Since) still matches, the view is skipped
+    and no rows are loaded or serialized. Otherwise the view's 200 response
+    gets ETag and Last-Modified headers.
+
+    Must be applied inside @jwt_required(), since versions are scoped per user.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            scope_id = collection_scope(collection)
+            etag, last_modified = validators(
+                collection, scope_id, db.session.execute(version_query(collection, scope_id)).first()
+            )
+            response = not_modified(etag, last_modified)
+            if response is None:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            return add_validators(response, etag, last_modified)
+        return wrapper
+    return decorator
+
+def collection_scope(collection):
+    """Scope id of the collection for the current request's user"""
+    return 0 if collection in SHARED_COLLECTIONS else int(get_jwt_identity())
+
+def version_query(collection, scope_id):
+    """Select the version row; no row means version 0"""
+    return select(CollectionVersion.version, CollectionVersion.updated_at).where(
+        CollectionVersion.collection == collection, CollectionVersion.scope_id == scope_id
+    )
+
+def validators(collection, scope_id, version_row):
+    """ETag and Last-Modified (None while the collection is settling) for a version row"""
+    version, updated_at = version_row if version_row else (0, None)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    last_modified = updated_at if updated_at and updated_at <= now - LAST_MODIFIED_SETTLE else None
+    return f'{collection}-{scope_id}-{version}', last_modified
+
+def not_modified(etag, last_modified):
+    """A 304 response if the request's validators match, else None"""
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return None
+    return add_validators(current_app.response_class(status=304), etag, last_modified)
+
+def add_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # Per-user data: clients may keep it but must revalidate, shared caches must not
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.vary.add('Authorization')
+    return response
+
+def bump_versions(keys, connection=None):
+    """Increment the version of each (collection, scope_id) in keys
+
+    Writes go through mark_changed() instead, which bumps after they commit.
+    """
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    rows = [
+        {'collection': collection, 'scope_id': scope_id, 'version': 1, 'updated_at': now}
+        for collection, scope_id in sorted(keys)
+    ]
+    if not rows:
+        return
+    if connection is None:
+        execute, dialect = db.session.execute, db.session.get_bind().dialect.name
+    else:
+        execute, dialect = connection.execute, connection.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        stmt = insert(CollectionVersion).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['collection', 'scope_id'],
+            set_={'version': CollectionVersion.version + 1, 'updated_at': stmt.excluded.updated_at}
+        )
+        execute(stmt)
+        return
+
+    # Other databases: update in place, insert the keys that did not exist yet
+    for row in rows:
+        updated = execute(
+            update(CollectionVersion)
+            .where(CollectionVersion.collection == row['collection'],
+                   CollectionVersion.scope_id == row['scope_id'])
+            .values(version=CollectionVersion.version + 1, updated_at=row['updated_at'])
+            .execution_options(synchronize_session=False)
+        )
+        if updated.rowcount == 0:
+            execute(CollectionVersion.__table__.insert(), [row])
+
+def mark_changed(session, keys):
+    """Bump the versions of keys once the session's transaction commits
+
+    The bump runs in its own short transaction after the commit, so
+    concurrent writes to one user's collection do not queue on the version
+    row for the length of theirs, and a rolled back write invalidates
+    nothing. A reader in between gets the new rows with the old ETag, and
+    a 200 again on its next poll.
+    """
+    session.info.setdefault(PENDING_VERSIONS, set()).update(keys)
+
+def touch_accounts(account_ids):
+    """Bump the accounts collection of each owner after a bulk balance UPDATE
+
+    Statements issued with update() bypass the flush, so the session hook
+    below does not see them.
+    """
+    owners = db.session.scalars(
+        select(Account.user_id).where(Account.id.in_(set(account_ids))).distinct()
+    ).all()
+    mark_changed(db.session, {('accounts', user_id) for user_id in owners})
+
+_listeners_installed = False
+
+def track_collection_versions():
+    """Bump collection versions whenever the ORM commits a tracked model"""
+    global _listeners_installed
+    if _listeners_installed:
+        return
+    _listeners_installed = True
+
+    @event.listens_for(Session, 'after_flush')
+    def bump_flushed_collections(session, flush_context):
+        keys = set()
+        for obj in session.new:
+            keys |= _collection_keys(obj)
+        for obj in session.deleted:
+            keys |= _collection_keys(obj, deleted=True)
+        for obj in session.dirty:
+            if session.is_modified(obj, include_collections=False):
+                keys |= _collection_keys(obj)
+        if keys:
+            mark_changed(session, keys)
+
+    @event.listens_for(Session, 'after_commit')
+    def bump_committed_collections(session):
+        keys = session.info.pop(PENDING_VERSIONS, None)
+        if keys:
+            with db.engine.begin() as connection:
+                bump_versions(keys, connection=connection)
+
+    @event.listens_for(Session, 'after_soft_rollback')
+    def forget_rolled_back_collections(session, previous_transaction):
+        # A rolled back savepoint keeps the outer transaction's keys: bumping too much only costs a 200
+        if previous_transaction.parent is None:
+            session.info.pop(PENDING_VERSIONS, None)
+
+def _collection_keys(obj, deleted=False):
+    if isinstance(obj, User):
+        if not deleted:
+            return set()
+        # Bills and budgets are removed by ON DELETE CASCADE without a flush
+        return {(collection, obj.id) for collection in ('accounts', 'bills', 'budgets')}
+    collection = TRACKED_MODELS.get(type(obj))
+    if collection is None:
+        return set()
+    if collection in SHARED_COLLECTIONS:
+        return {(collection, 0)}
+    # A changed owner invalidates both the old and the new owner's collection
+    owners = {obj.user_id, *inspect(obj).attrs.user_id.history.deleted}
+    return {(collection, user_id) for user_id in owners if user_id is not None}
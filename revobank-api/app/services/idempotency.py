@@ -0,0 +1,175 @@
+# Idempotency-Key handling for retried POST requests
+import hashlib
+import time
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+from flask import g, request, current_app, make_response
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from werkzeug.exceptions import Conflict, HTTPException, UnprocessableEntity
+from app import db
+from app.models.idempotency_key import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+# Seconds between checks while waiting for an in-flight duplicate
+POLL_INTERVAL = 0.05
+
+def idempotent(view):
+    """Replay the stored response when a request repeats an Idempotency-Key
+
+    The first request with a key claims it and runs the view; its response
+    is stored for IDEMPOTENCY_KEY_TTL seconds. A repeat returns the stored
+    response without running the view. A duplicate that arrives while the
+    first is still running waits for it to finish. A claim is a lease of
+    IDEMPOTENCY_LOCK_TIMEOUT seconds: if its request never finishes (the
+    worker was killed), a retry after the lease takes the key over. Requests
+    without the header are not affected.
+
+    The view's writes and the stored response are committed together: views
+    call commit() below instead of db.session.commit(), which only flushes
+    under this decorator. A worker killed before that commit leaves neither,
+    so the retry runs the view again. 4xx responses are stored like any
+    other; 5xx responses and unhandled errors roll back and release the key.
+
+    Must be applied inside @jwt_required(), since keys are scoped per user.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > 255:
+            raise UnprocessableEntity(f"{IDEMPOTENCY_HEADER} must be at most 255 characters")
+
+        user_id = int(get_jwt_identity())
+        request_hash = hashlib.sha256(
+            request.method.encode() + request.path.encode() + request.get_data()
+        ).hexdigest()
+
+        record = _claim_or_wait(user_id, key, request_hash)
+        if record.response_status is not None:
+            response = current_app.response_class(
+                record.response_body,
+                status=record.response_status,
+                mimetype='application/json'
+            )
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+
+        g.idempotency_key_id = record.id
+        try:
+            response = make_response(view(*args, **kwargs))
+        except HTTPException as e:
+            if e.code >= 500:
+                _release(record.id)
+                raise
+            # Client errors are answered the same way on every retry
+            db.session.rollback()
+            response = make_response(current_app.handle_user_exception(e))
+        except Exception:
+            # Failed requests release the key so the client can retry
+            _release(record.id)
+            raise
+        finally:
+            g.pop('idempotency_key_id', None)
+
+        if response.status_code >= 500:
+            _release(record.id)
+            return response
+
+        record = db.session.get(IdempotencyKey, record.id)
+        record.response_status = response.status_code
+        record.response_body = response.get_data(as_text=True)
+        record.locked_until = None
+        db.session.commit()
+        return response
+
+    return wrapper
+
+def commit():
+    """Commit the current view's writes, or leave them to @idempotent
+
+    Under @idempotent the writes are only flushed; the decorator commits
+    them in one transaction with the stored response.
+    """
+    if g.get('idempotency_key_id') is None:
+        db.session.commit()
+    else:
+        db.session.flush()
+
+def _claim_or_wait(user_id, key, request_hash):
+    """Claim the key, or return the existing record once it has a response"""
+    deadline = time.monotonic() + current_app.config['IDEMPOTENCY_WAIT_TIMEOUT']
+    while True:
+        now = _utcnow()
+        record = IdempotencyKey(
+            user_id=user_id,
+            key=key,
+            request_hash=request_hash,
+            locked_until=_lease_end(now),
+            expires_at=now + timedelta(seconds=current_app.config['IDEMPOTENCY_KEY_TTL'])
+        )
+        db.session.add(record)
+        try:
+            db.session.commit()
+            return record
+        except IntegrityError:
+            db.session.rollback()
+
+        existing = IdempotencyKey.query.filter_by(user_id=user_id, key=key).first()
+        if existing is None:
+            continue
+        if existing.expires_at <= now:
+            db.session.delete(existing)
+            db.session.commit()
+            continue
+        if existing.request_hash != request_hash:
+            raise UnprocessableEntity(f"{IDEMPOTENCY_HEADER} was already used for a different request")
+        if existing.response_status is not None:
+            return existing
+        if existing.locked_until is None or existing.locked_until <= now:
+            # The claiming request died; take the key over unless another retry just did
+            if _take_over(existing, now):
+                return existing
+            continue
+        if time.monotonic() >= deadline:
+            raise Conflict(f"A request with this {IDEMPOTENCY_HEADER} is still in progress")
+
+        # End the read transaction so the next check sees the other request's commit
+        db.session.rollback()
+        time.sleep(POLL_INTERVAL)
+
+def _take_over(record, now):
+    taken = db.session.execute(
+        update(IdempotencyKey)
+        .where(
+            IdempotencyKey.id == record.id,
+            IdempotencyKey.response_status.is_(None),
+            # Unchanged lease: nobody else took the key over in the meantime
+            IdempotencyKey.locked_until.is_(None) if record.locked_until is None
+            else IdempotencyKey.locked_until == record.locked_until
+        )
+        .values(locked_until=_lease_end(now))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return taken == 1
+
+def _lease_end(now):
+    return now + timedelta(seconds=current_app.config['IDEMPOTENCY_LOCK_TIMEOUT'])
+
+def _release(record_id):
+    db.session.rollback()
+    IdempotencyKey.query.filter_by(id=record_id).delete()
+    db.session.commit()
+
+def prune_idempotency_keys():
+    """Delete keys past their replay window; returns the number deleted"""
+    deleted = db.session.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at <= _utcnow()))
+    db.session.commit()
+    return deleted.rowcount
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
@@ -0,0 +1,181 @@
+# Transaction validation and balance posting helpers
+import random
+import time
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import select, update
+from sqlalchemy.exc import DBAPIError
+from werkzeug.exceptions import BadRequest, NotFound, Forbidden
+from app import db
+from app.models.account import Account
+from app.models.transaction import Transaction
+from app.services.conditional import touch_accounts
+from app.services.idempotency import commit
+from app.services.rollups import record_transactions
+
+TRANSACTION_TYPES = ['deposit', 'withdrawal', 'transfer']
+
+ACCOUNT_ID_FIELDS = ['from_account_id', 'to_account_id']
+
+# Attempts made by post_transaction before giving up on deadlocks
+POSTING_ATTEMPTS = 3
+
+# PostgreSQL serialization_failure and deadlock_detected
+RETRYABLE_PGCODES = {'40001', '40P01'}
+
+def parse_transaction(data):
+    """Validate a transaction payload and return its type and Decimal amount
+
+    Account ids sent as strings are converted to ints in the payload, so
+    lookups and new rows use the same values.
+
+    Raises BadRequest for missing fields, unknown types, bad amounts and
+    missing or malformed account ids for the given type.
+    """
+    # Validate required fields
+    required = ['type', 'amount']
+    if not isinstance(data, dict) or not all(field in data for field in required):
+        raise BadRequest("Missing required fields")
+
+    # Validate transaction type
+    if data['type'] not in TRANSACTION_TYPES:
+        raise BadRequest("Invalid transaction type")
+
+    # Convert and validate amount
+    try:
+        amount = Decimal(data['amount'])
+    except (InvalidOperation, TypeError, ValueError):
+        raise BadRequest("Invalid amount format")
+
+    if amount <= 0:
+        raise BadRequest("Amount must be positive")
+
+    for key in ACCOUNT_ID_FIELDS:
+        if data.get(key) is not None:
+            try:
+                data[key] = int(data[key])
+            except (TypeError, ValueError):
+                raise BadRequest(f"Invalid {key}")
+
+    # Validate accounts based on type
+    if data['type'] == 'transfer':
+        if not data.get('from_account_id') or not data.get('to_account_id'):
+            raise BadRequest("Both from_account_id and to_account_id required for transfers")
+    elif data['type'] == 'withdrawal':
+        if not data.get('from_account_id'):
+            raise BadRequest("from_account_id required for withdrawals")
+    elif data['type'] == 'deposit':
+        if not data.get('to_account_id'):
+            raise BadRequest("to_account_id required for deposits")
+
+    return data['type'], amount
+
+def check_accounts(data, from_account, to_account, current_user_id):
+    """Check that the referenced accounts exist and may be used by the user"""
+    if 'from_account_id' in data:
+        if from_account is None:
+            raise NotFound("Source account not found")
+        if from_account.user_id != current_user_id:
+            raise Forbidden("You don't own the source account")
+
+    if 'to_account_id' in data:
+        if to_account is None:
+            raise NotFound("Destination account not found")
+        # Allow transfers to other users' accounts but deposits must be to your own account
+        if data['type'] != 'transfer' and to_account.user_id != current_user_id:
+            raise Forbidden("Invalid destination account")
+
+def check_funds(transaction_type, amount, from_account):
+    """Reject withdrawals and transfers larger than the source balance"""
+    if transaction_type in ['withdrawal', 'transfer']:
+        if from_account.balance < amount:
+            raise BadRequest("Insufficient funds")
+
+def apply_balances(transaction_type, amount, from_account, to_account):
+    """Move amount between the loaded accounts"""
+    if transaction_type == 'deposit':
+        to_account.balance += amount
+    elif transaction_type == 'withdrawal':
+        from_account.balance -= amount
+    elif transaction_type == 'transfer':
+        from_account.balance -= amount
+        to_account.balance += amount
+
+def post_transaction(transaction_type, amount, from_account_id=None, to_account_id=None, description=None,
+                     category_id=None):
+    """Record a transaction and move its amount with conditional in-database updates
+
+    The source is debited with UPDATE ... WHERE balance >= amount, so funds are
+    checked and taken in one statement and concurrent postings cannot lose
+    updates. Transfers first lock both accounts in id order to avoid deadlocks
+    with a transfer going the other way; deadlocks and serialization failures
+    that still happen are retried.
+
+    Commits on success, or under @idempotent leaves the commit to the
+    decorator so the stored response lands with the posting. Raises BadRequest("Insufficient funds") if the debit
+    does not match.
+    """
+    for attempt in range(POSTING_ATTEMPTS):
+        try:
+            transaction = _post_once(
+                transaction_type, amount, from_account_id, to_account_id, description, category_id
+            )
+            commit()
+            return transaction
+        except DBAPIError as e:
+            db.session.rollback()
+            if not is_retryable(e) or attempt == POSTING_ATTEMPTS - 1:
+                raise
+            # Back off with jitter so the competing transaction can finish
+            time.sleep(random.uniform(0, 0.05 * 2 ** attempt))
+        except Exception:
+            db.session.rollback()
+            raise
+
+def is_retryable(error):
+    """True for deadlocks, serialization failures and SQLite lock timeouts"""
+    orig = getattr(error, 'orig', None)
+    if getattr(orig, 'pgcode', None) in RETRYABLE_PGCODES:
+        return True
+    return 'database is locked' in str(orig)
+
+def _post_once(transaction_type, amount, from_account_id, to_account_id, description, category_id):
+    if transaction_type == 'transfer':
+        # Take row locks in a fixed order before writing
+        db.session.execute(
+            select(Account.id)
+            .where(Account.id.in_({from_account_id, to_account_id}))
+            .order_by(Account.id)
+            .with_for_update()
+        )
+
+    if transaction_type in ['withdrawal', 'transfer']:
+        debited = db.session.execute(
+            update(Account)
+            .where(Account.id == from_account_id, Account.balance >= amount)
+            .values(balance=Account.balance - amount)
+            .execution_options(synchronize_session=False)
+        )
+        if debited.rowcount == 0:
+            raise BadRequest("Insufficient funds")
+
+    if transaction_type in ['deposit', 'transfer']:
+        db.session.execute(
+            update(Account)
+            .where(Account.id == to_account_id)
+            .values(balance=Account.balance + amount)
+            .execution_options(synchronize_session=False)
+        )
+
+    transaction = Transaction(
+        type=transaction_type,
+        amount=amount,
+        from_account_id=from_account_id,
+        to_account_id=to_account_id,
+        category_id=category_id,
+        description=description
+    )
+    db.session.add(transaction)
+    db.session.flush()
+    record_transactions([transaction])
+    touch_accounts({from_account_id, to_account_id} - {None})
+    return transaction
@@ -0,0 +1,31 @@
+# Keyset (cursor) pagination helpers
+import base64
+import json
+from datetime import datetime
+from werkzeug.exceptions import BadRequest
+
+def encode_cursor(created_at, row_id):
+    """Build an opaque cursor pointing just after the given (created_at, id) key"""
+    payload = json.dumps([created_at.isoformat(), row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Turn a cursor from encode_cursor back into a (created_at, id) key"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise BadRequest("Invalid cursor")
+
+def parse_limit(args, default, maximum):
+    """Read the page size from query args, clamped to the server maximum"""
+    if 'limit' not in args:
+        return default
+    try:
+        limit = int(args['limit'])
+    except ValueError:
+        raise BadRequest("limit must be an integer")
+    if limit <= 0:
+        raise BadRequest("limit must be positive")
+    return min(limit, maximum)
@@ -0,0 +1,107 @@
+# Password hashing in a process pool, away from the request workers
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app, has_app_context
+from werkzeug.exceptions import ServiceUnavailable
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, generate_password_hash, check_password_hash
+
+SALT_LENGTH = 16
+
+# Used outside an application context, e.g. from a Python shell
+DEFAULTS = {
+    'PASSWORD_HASH_METHOD': 'scrypt:32768:8:1',
+    'PASSWORD_HASH_WORKERS': 0,
+    'PASSWORD_HASH_QUEUE': 8,
+    'PASSWORD_HASH_TIMEOUT': 10,
+}
+
+def validate_password(password):
+    """Raise ValueError if the password does not meet the password policy"""
+    if len(password) < 8:
+        raise ValueError("Password must be at least 8 characters long")
+    if not any(c.isupper() for c in password):
+        raise ValueError("Password must contain at least one uppercase letter")
+    if not any(c in '!@#$%^&*()' for c in password):
+        raise ValueError("Password must contain at least one special character")
+
+def hash_password(password):
+    """Hash with the configured method and parameters"""
+    return _run(generate_password_hash, password, hash_method(), SALT_LENGTH)
+
+def verify_password(password_hash, password):
+    return _run(check_password_hash, password_hash, password)
+
+def needs_rehash(password_hash):
+    """True if the hash was made with another method or other parameters"""
+    return password_hash.split('$', 1)[0] != hash_method()
+
+def hash_method():
+    """PASSWORD_HASH_METHOD with werkzeug's defaults filled in, as stored in hashes"""
+    method, *params = _setting('PASSWORD_HASH_METHOD').split(':')
+    if method == 'scrypt':
+        n, r, p = params + ['32768', '8', '1'][len(params):]
+        return f'scrypt:{n}:{r}:{p}'
+    if method == 'pbkdf2':
+        name, iterations = params + ['sha256', str(DEFAULT_PBKDF2_ITERATIONS)][len(params):]
+        return f'pbkdf2:{name}:{iterations}'
+    raise ValueError(f"Unsupported PASSWORD_HASH_METHOD {method!r}")
+
+def _setting(name):
+    return current_app.config[name] if has_app_context() else DEFAULTS[name]
+
+def _run(function, *args):
+    """Call function in the pool, or inline when PASSWORD_HASH_WORKERS is 0
+
+    At most PASSWORD_HASH_QUEUE calls per worker process may be running or
+    waiting; beyond that, and when a call takes longer than
+    PASSWORD_HASH_TIMEOUT seconds, the request fails fast with a 503 instead
+    of tying up the worker.
+    """
+    workers = _setting('PASSWORD_HASH_WORKERS')
+    if not workers:
+        return function(*args)
+
+    pool, slots = _pool(workers, _setting('PASSWORD_HASH_QUEUE'))
+    if not slots.acquire(blocking=False):
+        raise ServiceUnavailable("Too many password checks in progress, please retry", retry_after=1)
+    try:
+        future = pool.submit(function, *args)
+    except BrokenProcessPool:
+        slots.release()
+        _reset_pool(pool)
+        raise ServiceUnavailable("Password service unavailable, please retry", retry_after=1)
+    # The slot stays taken until the pool is really done with the call
+    future.add_done_callback(lambda _: slots.release())
+
+    try:
+        return future.result(timeout=_setting('PASSWORD_HASH_TIMEOUT'))
+    except FutureTimeout:
+        future.cancel()
+        raise ServiceUnavailable("Password check timed out, please retry", retry_after=1)
+    except BrokenProcessPool:
+        _reset_pool(pool)
+        raise ServiceUnavailable("Password service unavailable, please retry", retry_after=1)
+
+_state = {}
+_state_lock = threading.Lock()
+
+def _pool(workers, queue):
+    # One pool per process; gunicorn workers forked from a preloaded app get their own
+    with _state_lock:
+        if _state.get('pid') != os.getpid():
+            _state.update(
+                pid=os.getpid(),
+                # spawn: forking a threaded worker could copy held locks into the children
+                pool=ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')),
+                slots=threading.BoundedSemaphore(queue)
+            )
+        return _state['pool'], _state['slots']
+
+def _reset_pool(pool):
+    with _state_lock:
+        if _state.get('pool') is pool:
+            _state.clear()
+    pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,191 @@
+# Access token revocation with an in-memory Bloom filter in front of the store
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from sqlalchemy import select, delete, func
+from sqlalchemy.exc import IntegrityError
+from app import db, jwt
+from app.middleware.read_replica import on_primary
+from app.models.token_revocation import TokenRevocation
+from app.services.auth import TOKEN_LIFETIME
+
+# Seconds between full rebuilds, which drop expired revocations from memory
+REBUILD_INTERVAL = 3600
+
+# Incremental refreshes re-read this far back, so rows committed late by a
+# slow transaction are still picked up
+REFRESH_OVERLAP = timedelta(seconds=60)
+
+class BloomFilter:
+    """Set membership in about 10 bits per key at a 1% false positive rate
+
+    Never answers False for a key that was added; answers True for a key
+    that was not added with probability error_rate while holding up to
+    capacity keys.
+    """
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(64, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def _positions(self, key):
+        # Double hashing: k positions from the two halves of one digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        step = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * step) % self.size for i in range(self.hashes)]
+
+class TokenBlocklist:
+    """Answers "is this token revoked?" without a database query in the common case
+
+    Revoked jtis are kept in a Bloom filter, and per-user "revoke everything
+    up to" cutoffs in a dict. A token that misses both is accepted straight
+    away; a hit is confirmed against the token_revocations table, so false
+    positives cost one indexed lookup and never reject a valid token.
+
+    The filter is refreshed from the table every refresh_interval seconds
+    (only rows newer than the last refresh are read) and rebuilt from the
+    unexpired rows every REBUILD_INTERVAL seconds, or sooner once it holds
+    more than its capacity. Revocations made by this process apply
+    immediately, others within refresh_interval.
+    """
+    def __init__(self, capacity=100000, error_rate=0.01, refresh_interval=5):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._filter = None
+        self._cutoffs = {}
+        self._since = None
+        self._refreshed_at = self._built_at = 0.0
+
+    def is_revoked(self, user_id, jti, issued_at):
+        # A lagging replica could still accept a token revoked moments ago
+        with on_primary():
+            self._refresh()
+            cutoff = self._cutoffs.get(user_id)
+            if cutoff is not None and issued_at <= cutoff and _revoked_all_since(user_id, issued_at):
+                return True
+            return jti in self._filter and _revoked_jti(jti)
+
+    def add(self, user_id, jti, revoked_at):
+        """Apply a committed revocation in this process"""
+        self._refresh()
+        self._apply(self._filter, self._cutoffs, user_id, jti, revoked_at)
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._filter is not None and now - self._refreshed_at < self.refresh_interval:
+            return
+        with self._lock:
+            if self._filter is not None and now - self._refreshed_at < self.refresh_interval:
+                return
+            started = _utcnow()
+            if (self._filter is None or now - self._built_at >= REBUILD_INTERVAL
+                    or self._filter.count > self._filter.capacity):
+                live = db.session.scalar(
+                    select(func.count()).select_from(TokenRevocation).where(TokenRevocation.expires_at > started)
+                )
+                # Room to grow before the next rebuild
+                token_filter = BloomFilter(max(self.capacity, live * 2), self.error_rate)
+                cutoffs = {}
+                self._load(token_filter, cutoffs, started)
+                self._filter, self._cutoffs = token_filter, cutoffs
+                self._built_at = now
+            else:
+                self._load(self._filter, self._cutoffs, started, since=self._since)
+            self._since = started - REFRESH_OVERLAP
+            self._refreshed_at = now
+
+    def _load(self, token_filter, cutoffs, now, since=None):
+        query = select(TokenRevocation.user_id, TokenRevocation.jti, TokenRevocation.revoked_at).where(
+            TokenRevocation.expires_at > now
+        )
+        if since is not None:
+            query = query.where(TokenRevocation.revoked_at >= since)
+        for user_id, jti, revoked_at in db.session.execute(query, execution_options={'yield_per': 10000}):
+            self._apply(token_filter, cutoffs, user_id, jti, revoked_at)
+
+    def _apply(self, token_filter, cutoffs, user_id, jti, revoked_at):
+        if jti is not None:
+            token_filter.add(jti)
+        else:
+            cutoff = math.floor(revoked_at.replace(tzinfo=timezone.utc).timestamp())
+            cutoffs[user_id] = max(cutoff, cutoffs.get(user_id, cutoff))
+
+def init_token_blocklist(app):
+    """Reject revoked tokens in every @jwt_required() view
+
+    TOKEN_BLOCKLIST_CAPACITY: Revoked tokens the filter is sized for
+    TOKEN_BLOCKLIST_ERROR_RATE: Share of valid tokens that need a database check
+    TOKEN_BLOCKLIST_REFRESH: Seconds before revocations from other workers apply
+    """
+    app.extensions['token_blocklist'] = TokenBlocklist(
+        capacity=app.config['TOKEN_BLOCKLIST_CAPACITY'],
+        error_rate=app.config['TOKEN_BLOCKLIST_ERROR_RATE'],
+        refresh_interval=app.config['TOKEN_BLOCKLIST_REFRESH']
+    )
+
+    @jwt.token_in_blocklist_loader
+    def check_token_revoked(jwt_header, jwt_payload):
+        return current_app.extensions['token_blocklist'].is_revoked(
+            int(jwt_payload[current_app.config['JWT_IDENTITY_CLAIM']]),
+            jwt_payload['jti'],
+            jwt_payload['iat']
+        )
+
+def revoke_token(jwt_payload):
+    """Revoke one access token (logout)"""
+    user_id = int(jwt_payload[current_app.config['JWT_IDENTITY_CLAIM']])
+    expires_at = datetime.fromtimestamp(jwt_payload['exp'], timezone.utc).replace(tzinfo=None)
+    _record(user_id, jwt_payload['jti'], _utcnow(), expires_at)
+
+def revoke_all_tokens(user_id):
+    """Revoke every access token issued to the user so far (logout everywhere)"""
+    now = _utcnow()
+    _record(user_id, None, now, now + TOKEN_LIFETIME)
+
+def prune_revocations():
+    """Delete revocations whose tokens have expired; returns the number deleted"""
+    deleted = db.session.execute(delete(TokenRevocation).where(TokenRevocation.expires_at <= _utcnow()))
+    db.session.commit()
+    return deleted.rowcount
+
+def _record(user_id, jti, revoked_at, expires_at):
+    db.session.add(TokenRevocation(user_id=user_id, jti=jti, revoked_at=revoked_at, expires_at=expires_at))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Revoked concurrently by another request, which is just as good
+        db.session.rollback()
+        return
+    current_app.extensions['token_blocklist'].add(user_id, jti, revoked_at)
+
+def _revoked_jti(jti):
+    return db.session.scalar(select(TokenRevocation.id).where(TokenRevocation.jti == jti)) is not None
+
+def _revoked_all_since(user_id, issued_at):
+    issued = datetime.fromtimestamp(issued_at, timezone.utc).replace(tzinfo=None)
+    return db.session.scalar(
+        select(TokenRevocation.id).where(
+            TokenRevocation.user_id == user_id,
+            TokenRevocation.jti.is_(None),
+            TokenRevocation.revoked_at >= issued
+        ).limit(1)
+    ) is not None
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
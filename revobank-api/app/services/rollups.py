@@ -0,0 +1,133 @@
+# Incrementally maintained monthly totals per account, category and type
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+from app.models.transaction import Transaction
+from app.models.transaction_rollup import TransactionRollup
+
+KEY_COLUMNS = ['account_id', 'month', 'category_id', 'type']
+
+# Rows written per INSERT when rebuilding
+REBUILD_CHUNK_SIZE = 1000
+
+def record_transactions(transactions):
+    """Add flushed transactions to their monthly rollup rows
+
+    Runs inside the caller's database transaction so the rollups commit or
+    roll back together with the postings.
+    """
+    deltas = defaultdict(lambda: [Decimal('0'), Decimal('0'), 0])
+    for transaction in transactions:
+        month = transaction.created_at.date().replace(day=1)
+        category_id = transaction.category_id or 0
+        if transaction.to_account_id is not None:
+            totals = deltas[(transaction.to_account_id, month, category_id, transaction.type)]
+            totals[0] += transaction.amount
+            totals[2] += 1
+        if transaction.from_account_id is not None:
+            totals = deltas[(transaction.from_account_id, month, category_id, transaction.type)]
+            totals[1] += transaction.amount
+            # A transfer between the same account is still one transaction
+            if transaction.from_account_id != transaction.to_account_id:
+                totals[2] += 1
+
+    # Sorted so concurrent postings lock rollup rows in the same order
+    rows = [
+        dict(zip(KEY_COLUMNS, key), amount_in=amount_in, amount_out=amount_out, transaction_count=count)
+        for key, (amount_in, amount_out, count) in sorted(deltas.items())
+    ]
+    if rows:
+        _upsert(rows)
+
+def rebuild_rollups(account_id=None):
+    """Recompute rollups from the transactions table, for backfill or repair
+
+    Aggregation happens in the database, one GROUP BY per direction; only
+    the grouped rows come back to Python. Returns the number of rollup rows
+    written.
+    """
+    cleared = delete(TransactionRollup)
+    if account_id is not None:
+        cleared = cleared.where(TransactionRollup.account_id == account_id)
+    db.session.execute(cleared)
+
+    month = _month_expression(Transaction.created_at)
+    category_id = func.coalesce(Transaction.category_id, 0)
+    totals = defaultdict(lambda: [Decimal('0'), Decimal('0'), 0])
+    for column, side in ((Transaction.to_account_id, 0), (Transaction.from_account_id, 1)):
+        query = select(
+            column, month, category_id, Transaction.type,
+            func.sum(Transaction.amount), func.count()
+        ).where(column.is_not(None)).group_by(column, month, category_id, Transaction.type)
+        if account_id is not None:
+            query = query.where(column == account_id)
+        for row_account_id, row_month, row_category_id, row_type, amount, count in db.session.execute(query):
+            entry = totals[(row_account_id, _as_month(row_month), row_category_id, row_type)]
+            entry[side] += Decimal(amount)
+            entry[2] += count
+
+    # Same-account transfers were counted once per direction
+    same_account = select(
+        Transaction.from_account_id, month, category_id, Transaction.type, func.count()
+    ).where(Transaction.from_account_id == Transaction.to_account_id).group_by(
+        Transaction.from_account_id, month, category_id, Transaction.type
+    )
+    if account_id is not None:
+        same_account = same_account.where(Transaction.from_account_id == account_id)
+    for row_account_id, row_month, row_category_id, row_type, count in db.session.execute(same_account):
+        totals[(row_account_id, _as_month(row_month), row_category_id, row_type)][2] -= count
+
+    rows = [
+        dict(zip(KEY_COLUMNS, key), amount_in=amount_in, amount_out=amount_out, transaction_count=count)
+        for key, (amount_in, amount_out, count) in totals.items()
+    ]
+    for start in range(0, len(rows), REBUILD_CHUNK_SIZE):
+        db.session.execute(TransactionRollup.__table__.insert(), rows[start:start + REBUILD_CHUNK_SIZE])
+    db.session.commit()
+    return len(rows)
+
+def _upsert(rows):
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        stmt = insert(TransactionRollup).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=KEY_COLUMNS,
+            set_={
+                'amount_in': TransactionRollup.amount_in + stmt.excluded.amount_in,
+                'amount_out': TransactionRollup.amount_out + stmt.excluded.amount_out,
+                'transaction_count': TransactionRollup.transaction_count + stmt.excluded.transaction_count,
+            }
+        )
+        db.session.execute(stmt)
+        return
+
+    # Other databases: update in place, insert the keys that did not exist yet
+    for row in rows:
+        updated = db.session.execute(
+            update(TransactionRollup)
+            .where(*(getattr(TransactionRollup, column) == row[column] for column in KEY_COLUMNS))
+            .values(
+                amount_in=TransactionRollup.amount_in + row['amount_in'],
+                amount_out=TransactionRollup.amount_out + row['amount_out'],
+                transaction_count=TransactionRollup.transaction_count + row['transaction_count']
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if updated.rowcount == 0:
+            db.session.execute(TransactionRollup.__table__.insert(), [row])
+
+def _month_expression(column):
+    if db.session.get_bind().dialect.name == 'sqlite':
+        return func.date(column, 'start of month')
+    return func.date_trunc('month', column)
+
+def _as_month(value):
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    if isinstance(value, datetime):
+        return value.date()
+    return value
@@ -0,0 +1,101 @@
+# Bulk user import for onboarding migrations
+import csv
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice, repeat
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from werkzeug.security import generate_password_hash
+from app import db
+from app.models.user import User
+from app.services.passwords import SALT_LENGTH, hash_method, validate_password
+
+REQUIRED_FIELDS = ('username', 'email', 'password')
+
+def read_users(stream, file_format):
+    """Yield (line number, record) from a CSV file with a header row or from NDJSON"""
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+    else:
+        for line_number, line in enumerate(stream, start=1):
+            if line.strip():
+                try:
+                    yield line_number, json.loads(line)
+                except ValueError:
+                    yield line_number, None
+
+def import_users(records, batch_size=1000, workers=None):
+    """Insert users from (line number, record) pairs
+
+    Passwords are checked against the password policy and hashed across
+    `workers` processes (all CPUs by default), then each batch is written
+    with one multi-row INSERT and committed. Users whose username or email
+    already exists are skipped, not updated.
+
+    Returns (imported, duplicates, rejected) where rejected lists
+    (line number, reason) for records that failed validation.
+    """
+    imported = duplicates = 0
+    rejected = []
+    method = hash_method()
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        records = iter(records)
+        while batch := list(islice(records, batch_size)):
+            valid = []
+            for line_number, record in batch:
+                reason = _invalid(record)
+                if reason:
+                    rejected.append((line_number, reason))
+                else:
+                    valid.append(record)
+            if not valid:
+                continue
+
+            hashes = pool.map(
+                generate_password_hash, (record['password'] for record in valid),
+                repeat(method), repeat(SALT_LENGTH), chunksize=max(1, len(valid) // (4 * workers))
+            )
+            rows = [
+                {'username': record['username'], 'email': record['email'], 'password_hash': password_hash}
+                for record, password_hash in zip(valid, hashes)
+            ]
+            inserted = _insert(rows)
+            db.session.commit()
+            imported += inserted
+            duplicates += len(rows) - inserted
+    return imported, duplicates, rejected
+
+def _invalid(record):
+    if not isinstance(record, dict):
+        return "Not a JSON object"
+    missing = [field for field in REQUIRED_FIELDS if not record.get(field)]
+    if missing:
+        return f"Missing {', '.join(missing)}"
+    try:
+        validate_password(record['password'])
+    except ValueError as e:
+        return str(e)
+    return None
+
+def _insert(rows):
+    """Insert rows skipping existing usernames and emails; returns the number inserted"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        return db.session.execute(insert(User).values(rows).on_conflict_do_nothing()).rowcount
+
+    # Other databases: one row at a time inside savepoints
+    inserted = 0
+    for row in rows:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(User.__table__.insert(), [row])
+            inserted += 1
+        except IntegrityError:
+            pass
+    return inserted
@@ -0,0 +1,311 @@
+"""Endpoint throughput and latency under concurrent clients, with regression checks
+
+Seeds a database with users, accounts, transactions, bills and budgets,
+then drives each scenario through the full Flask app (request hooks, JWT,
+JSON, compression) from concurrent client threads, or against a running
+server with --url. Reports requests per second and p50/p95/p99 latency.
+
+Run from revobank-api/:
+    python -m benchmarks.bench_endpoints                    # small scale, SQLite file
+    python -m benchmarks.bench_endpoints --scale full --database postgresql://...
+    python -m benchmarks.bench_endpoints --save-baseline    # store the numbers of this run
+    python -m benchmarks.bench_endpoints --check            # exit 1 if a hot scenario regressed
+
+The seeded database is reused while every table has the expected number
+of rows, so an interrupted seed is redone; pass --reseed to start over. Baselines are only comparable on the machine
+and database they were recorded on, so record them where --check runs.
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+from sqlalchemy import func, select
+from werkzeug.security import generate_password_hash
+from app import create_app, db
+from app.models import Account, Bill, Budget, Transaction, TransactionCategory, User
+from app.services.auth import generate_token
+from app.services.passwords import SALT_LENGTH, hash_method
+
+SCALES = {
+    'tiny': {'users': 20, 'accounts': 60, 'transactions': 2_000},
+    'small': {'users': 1_000, 'accounts': 5_000, 'transactions': 200_000},
+    'full': {'users': 10_000, 'accounts': 50_000, 'transactions': 5_000_000},
+}
+BILLS_PER_USER = 5
+BUDGETS_PER_USER = 3
+CATEGORIES = ['Groceries', 'Rent', 'Utilities', 'Transport', 'Dining', 'Salary', 'Entertainment', 'Health']
+PASSWORD = 'BenchPass123!'
+SEED_BATCH = 10_000
+SEED = 20250101
+
+# Users the clients act as, picked at random per request
+SAMPLE_USERS = 200
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), 'baselines.json')
+
+# name -> request for a user: (method, path, JSON body)
+SCENARIOS = {
+    'auth.login': lambda user: ('POST', '/api/auth/login', {'email': user.email, 'password': PASSWORD}),
+    'accounts.list': lambda user: ('GET', '/api/accounts', None),
+    'transactions.list': lambda user: ('GET', '/api/transactions?limit=50', None),
+    'transactions.create': lambda user: ('POST', '/api/transactions', {
+        'type': 'deposit', 'amount': '1.00', 'to_account_id': user.account_ids[0]
+    }),
+    'bills.list': lambda user: ('GET', '/api/bills', None),
+    'budgets.list': lambda user: ('GET', '/api/budgets', None),
+}
+
+def seed(scale, reseed=False):
+    """Fill the app's database for the scale unless it already is; returns the number of users"""
+    counts = SCALES[scale]
+    db.create_all()
+    if not reseed and _seeded(counts):
+        return counts['users']
+
+    db.drop_all()
+    db.create_all()
+    rng = random.Random(SEED)
+    users, accounts = counts['users'], counts['accounts']
+    # One hash for everyone: hashing thousands of passwords would dominate seeding
+    password_hash = generate_password_hash(PASSWORD, hash_method(), SALT_LENGTH)
+
+    _insert(TransactionCategory, ({'name': name} for name in CATEGORIES))
+    _insert(User, ({
+        'username': f'bench{i}', 'email': f'bench{i}@example.com', 'password_hash': password_hash
+    } for i in range(1, users + 1)))
+    # Account a belongs to user ((a - 1) % users) + 1, see _sample_users()
+    _insert(Account, ({
+        'user_id': (a - 1) % users + 1, 'account_type': ('savings', 'checking', 'investment')[a % 3],
+        'account_number': f'ACC-{a:08d}', 'balance': Decimal('100000.00')
+    } for a in range(1, accounts + 1)))
+
+    now = datetime.utcnow().replace(microsecond=0)
+
+    def transaction(i):
+        kind = rng.choices(('transfer', 'deposit', 'withdrawal'), (4, 3, 3))[0]
+        return {
+            'type': kind,
+            'amount': Decimal(rng.randint(100, 50_000)) / 100,
+            'from_account_id': rng.randint(1, accounts) if kind != 'deposit' else None,
+            'to_account_id': rng.randint(1, accounts) if kind != 'withdrawal' else None,
+            'category_id': rng.choice([None, *range(1, len(CATEGORIES) + 1)]),
+            'description': f'Bench payment {i}',
+            'created_at': now - timedelta(seconds=rng.randint(0, 730 * 86400)),
+        }
+    _insert(Transaction, (transaction(i) for i in range(counts['transactions'])))
+
+    today = date.today()
+    _insert(Bill, ({
+        'user_id': u, 'account_id': u, 'biller_name': f'Biller {b}',
+        'due_date': today + timedelta(days=rng.randint(1, 60)), 'amount': Decimal(rng.randint(1_000, 30_000)) / 100
+    } for u in range(1, users + 1) for b in range(BILLS_PER_USER)))
+    _insert(Budget, ({
+        'user_id': u, 'name': CATEGORIES[b], 'amount': Decimal(rng.randint(100, 2_000)),
+        'start_date': today.replace(day=1), 'end_date': today.replace(day=1) + timedelta(days=30)
+    } for u in range(1, users + 1) for b in range(BUDGETS_PER_USER)))
+    return users
+
+def run_scenario(make_client, users, name, requests, clients):
+    """Send requests for one scenario from concurrent clients; returns its statistics"""
+    counter = itertools.count()
+
+    def client_loop(index):
+        client = make_client()
+        rng = random.Random(index)
+        latencies, errors = [], 0
+        while next(counter) < requests:
+            user = rng.choice(users)
+            method, path, body = SCENARIOS[name](user)
+            started = time.perf_counter()
+            status = client.request(method, path, user.token, body)
+            latencies.append(time.perf_counter() - started)
+            errors += status >= 400
+        return latencies, errors
+
+    with ThreadPoolExecutor(clients) as pool:
+        started = time.perf_counter()
+        results = list(pool.map(client_loop, range(clients)))
+        elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for client_latencies, _ in results for latency in client_latencies)
+    return {
+        'requests': len(latencies),
+        'errors': sum(errors for _, errors in results),
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': _percentile(latencies, 0.50),
+        'p95_ms': _percentile(latencies, 0.95),
+        'p99_ms': _percentile(latencies, 0.99),
+    }
+
+def run(database, scale='small', clients=8, requests=500, scenarios=None, url=None, reseed=False, config=None):
+    """Seed, then run each scenario after a short warm-up; returns {scenario: statistics}"""
+    app = create_app(None, {
+        'SQLALCHEMY_DATABASE_URI': database,
+        # Measure the endpoints, not the limiter or log output
+        'RATE_LIMIT_ENABLED': False,
+        'ACCESS_LOG_ENABLED': False,
+        'SLOW_QUERY_MS': 0,
+        **(config or {}),
+    })
+    with app.app_context():
+        user_count = seed(scale, reseed)
+        users = _sample_users(user_count, SCALES[scale]['accounts'])
+        db.session.remove()
+
+    if url is None:
+        make_client = lambda: AppClient(app)
+    else:
+        make_client = lambda: HttpClient(url)
+
+    results = {}
+    for name in scenarios or SCENARIOS:
+        run_scenario(make_client, users, name, clients * 5, clients)
+        results[name] = run_scenario(make_client, users, name, requests, clients)
+    return results
+
+def compare(results, baselines):
+    """Messages for hot scenarios that got slower or failed requests"""
+    problems = []
+    default_threshold = baselines.get('threshold_pct', 20)
+    for name in baselines.get('hot', []):
+        result, baseline = results.get(name), baselines.get('scenarios', {}).get(name)
+        if result is None:
+            continue
+        if result['errors']:
+            problems.append(f"{name}: {result['errors']} of {result['requests']} requests failed")
+        if baseline is None:
+            continue
+        threshold = baseline.get('threshold_pct', default_threshold)
+        if result['p95_ms'] > baseline['p95_ms'] * (1 + threshold / 100):
+            problems.append(
+                f"{name}: p95 {result['p95_ms']} ms vs baseline {baseline['p95_ms']} ms (+{threshold}% allowed)"
+            )
+        if result['rps'] < baseline['rps'] * (1 - threshold / 100):
+            problems.append(f"{name}: {result['rps']} req/s vs baseline {baseline['rps']} (-{threshold}% allowed)")
+    return problems
+
+def save_baseline(results, baselines, meta):
+    """Store the results as the new baseline, keeping per-scenario thresholds"""
+    scenarios = baselines.setdefault('scenarios', {})
+    for name, result in results.items():
+        scenario = scenarios.setdefault(name, {})
+        scenario.update(p95_ms=result['p95_ms'], rps=result['rps'])
+    baselines['recorded'] = meta
+    return baselines
+
+class AppClient:
+    """In-process client: the whole WSGI app, without a server or sockets"""
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, token, body):
+        response = self.client.open(path, method=method, json=body, headers={'Authorization': f'Bearer {token}'})
+        response.close()
+        return response.status_code
+
+class HttpClient:
+    """Keep-alive HTTP client for a running server"""
+    def __init__(self, url):
+        parts = urlsplit(url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.connection = connection_class(parts.hostname, parts.port)
+        self.prefix = parts.path.rstrip('/')
+
+    def request(self, method, path, token, body):
+        headers = {'Authorization': f'Bearer {token}'}
+        if body is not None:
+            headers['Content-Type'] = 'application/json'
+            body = json.dumps(body)
+        self.connection.request(method, self.prefix + path, body=body, headers=headers)
+        response = self.connection.getresponse()
+        response.read()
+        return response.status
+
+def _sample_users(user_count, account_count):
+    rng = random.Random(SEED)
+    return [
+        SimpleNamespace(
+            email=f'bench{user_id}@example.com',
+            account_ids=list(range(user_id, account_count + 1, user_count)),
+            token=generate_token(user_id),
+        )
+        for user_id in rng.sample(range(1, user_count + 1), min(SAMPLE_USERS, user_count))
+    ]
+
+def _seeded(counts):
+    # Every table, since an interrupted seed leaves the later ones short
+    expected = {
+        TransactionCategory: len(CATEGORIES),
+        User: counts['users'],
+        Account: counts['accounts'],
+        Transaction: counts['transactions'],
+        Bill: counts['users'] * BILLS_PER_USER,
+        Budget: counts['users'] * BUDGETS_PER_USER,
+    }
+    return all(db.session.scalar(select(func.count()).select_from(model)) == rows for model, rows in expected.items())
+
+def _insert(model, rows):
+    rows = iter(rows)
+    while batch := list(itertools.islice(rows, SEED_BATCH)):
+        db.session.execute(model.__table__.insert(), batch)
+        db.session.commit()
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return round(sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))] * 1000, 2)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--scale', choices=SCALES, default='small')
+    parser.add_argument('--database', help='Database URL (default: a SQLite file in the temp directory)')
+    parser.add_argument('--url', help='Benchmark a running server instead of the in-process app')
+    parser.add_argument('--clients', type=int, default=8, help='Concurrent clients')
+    parser.add_argument('--requests', type=int, default=500, help='Requests per scenario')
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS, help='Only run these scenarios')
+    parser.add_argument('--reseed', action='store_true', help='Seed again even if the data is there')
+    parser.add_argument('--baselines', default=BASELINES_PATH)
+    parser.add_argument('--check', action='store_true', help='Exit 1 if a hot scenario regressed')
+    parser.add_argument('--save-baseline', action='store_true')
+    args = parser.parse_args()
+
+    database = args.database or f"sqlite:///{os.path.join(tempfile.gettempdir(), f'revobank-bench-{args.scale}.db')}"
+    results = run(database, args.scale, args.clients, args.requests, args.scenario, args.url, args.reseed)
+
+    with open(args.baselines) as f:
+        baselines = json.load(f)
+    recorded = baselines.get('scenarios', {})
+    print(f"{args.scale} scale, {args.clients} clients, {args.requests} requests per scenario")
+    print(f"  {'scenario':<22}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'base p95':>10}")
+    for name, result in results.items():
+        base = recorded.get(name, {}).get('p95_ms', '-')
+        print(f"  {name:<22}{result['errors']:>8}{result['rps']:>10}{result['p50_ms']:>10}"
+              f"{result['p95_ms']:>10}{result['p99_ms']:>10}{base:>10}")
+
+    if args.save_baseline:
+        meta = {'scale': args.scale, 'clients': args.clients, 'requests': args.requests,
+                'database': database.split(':', 1)[0], 'date': date.today().isoformat()}
+        with open(args.baselines, 'w') as f:
+            json.dump(save_baseline(results, baselines, meta), f, indent=2)
+            f.write('\n')
+        print(f"Saved baseline to {args.baselines}")
+
+    if args.check:
+        problems = compare(results, baselines)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        if problems:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""Compare list serialization paths on 10k rows
+
+Run from revobank-api/: python -m benchmarks.bench_serialization
+"""
+import timeit
+from datetime import datetime, timedelta
+from decimal import Decimal
+from flask import jsonify
+from flask.json.provider import DefaultJSONProvider
+from app import create_app
+from app.models import Transaction
+from app.serialization import OrjsonProvider, serialize_rows, orjson
+
+ROWS = 10_000
+REPEAT = 5
+
+def make_rows():
+    start = datetime(2025, 1, 1)
+    return [
+        Transaction(id=i, type='transfer', amount=Decimal(i) / 100, from_account_id=1, to_account_id=2,
+                    category_id=None, description=f'Payment {i}', created_at=start + timedelta(seconds=i))
+        for i in range(ROWS)
+    ]
+
+def main():
+    app = create_app('testing')
+    rows = make_rows()
+
+    def current_path():
+        return jsonify([t.serialize() for t in rows]).get_data()
+
+    def rows_path():
+        return jsonify(serialize_rows(Transaction, rows)).get_data()
+
+    with app.app_context():
+        app.json = DefaultJSONProvider(app)
+        results = {'serialize() + stdlib jsonify': min(timeit.repeat(current_path, number=1, repeat=REPEAT))}
+        results['serialize_rows() + stdlib'] = min(timeit.repeat(rows_path, number=1, repeat=REPEAT))
+        if orjson is not None:
+            app.json = OrjsonProvider(app)
+            results['serialize_rows() + orjson'] = min(timeit.repeat(rows_path, number=1, repeat=REPEAT))
+
+    baseline = results['serialize() + stdlib jsonify']
+    print(f"{ROWS} transactions, best of {REPEAT}")
+    for name, seconds in results.items():
+        print(f"  {name:<32} {seconds * 1000:8.1f} ms  {baseline / seconds:5.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+"""Add composite indexes for transaction history
+
+Revision ID: 3c1f9a7d2e45
+Revises: b585e4d3ef4b
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+
+revision = '3c1f9a7d2e45'
+down_revision = 'b585e4d3ef4b'
+
+def upgrade():
+    # Outgoing and incoming history are each read per account, newest first
+    op.create_index(
+        'ix_transactions_from_account_created_at',
+        'transactions',
+        ['from_account_id', 'created_at']
+    )
+    op.create_index(
+        'ix_transactions_to_account_created_at',
+        'transactions',
+        ['to_account_id', 'created_at']
+    )
+
+def downgrade():
+    op.drop_index('ix_transactions_to_account_created_at', table_name='transactions')
+    op.drop_index('ix_transactions_from_account_created_at', table_name='transactions')
@@ -0,0 +1,28 @@
+"""Add idempotency_keys table
+
+Revision ID: 5a8e2c4b7d10
+Revises: 3c1f9a7d2e45
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '5a8e2c4b7d10'
+down_revision = '3c1f9a7d2e45'
+
+def upgrade():
+    op.create_table('idempotency_keys',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('key', sa.String(length=255), nullable=False),
+        sa.Column('request_hash', sa.String(length=64), nullable=False),
+        sa.Column('response_status', sa.Integer(), nullable=True),
+        sa.Column('response_body', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()')),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.UniqueConstraint('user_id', 'key', name='uq_idempotency_keys_user_key')
+    )
+
+def downgrade():
+    op.drop_table('idempotency_keys')
@@ -0,0 +1,25 @@
+"""Add balance_checkpoints table
+
+Revision ID: 7d4b1e9f3a62
+Revises: 5a8e2c4b7d10
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '7d4b1e9f3a62'
+down_revision = '5a8e2c4b7d10'
+
+def upgrade():
+    op.create_table('balance_checkpoints',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('account_id', sa.Integer(), sa.ForeignKey('accounts.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('as_of', sa.DateTime(), nullable=False),
+        sa.Column('balance', sa.Numeric(10, 2), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()')),
+        sa.UniqueConstraint('account_id', 'as_of', name='uq_balance_checkpoints_account_as_of')
+    )
+
+def downgrade():
+    op.drop_table('balance_checkpoints')
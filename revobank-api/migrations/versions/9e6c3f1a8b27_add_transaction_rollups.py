@@ -0,0 +1,29 @@
+"""Add transaction_rollups table
+
+Revision ID: 9e6c3f1a8b27
+Revises: 7d4b1e9f3a62
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '9e6c3f1a8b27'
+down_revision = '7d4b1e9f3a62'
+
+def upgrade():
+    op.create_table('transaction_rollups',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('account_id', sa.Integer(), sa.ForeignKey('accounts.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('month', sa.Date(), nullable=False),
+        sa.Column('category_id', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('type', sa.String(length=50), nullable=False),
+        sa.Column('amount_in', sa.Numeric(14, 2), nullable=False, server_default='0'),
+        sa.Column('amount_out', sa.Numeric(14, 2), nullable=False, server_default='0'),
+        sa.Column('transaction_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.UniqueConstraint('account_id', 'month', 'category_id', 'type', name='uq_transaction_rollups_key')
+    )
+    # Backfill existing history with `flask rebuild-rollups`
+
+def downgrade():
+    op.drop_table('transaction_rollups')
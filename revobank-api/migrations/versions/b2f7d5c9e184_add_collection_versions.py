@@ -0,0 +1,26 @@
+"""Add collection_versions table
+
+Revision ID: b2f7d5c9e184
+Revises: 9e6c3f1a8b27
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'b2f7d5c9e184'
+down_revision = '9e6c3f1a8b27'
+
+def upgrade():
+    op.create_table('collection_versions',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('collection', sa.String(length=50), nullable=False),
+        sa.Column('scope_id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.UniqueConstraint('collection', 'scope_id', name='uq_collection_versions_key')
+    )
+    # No backfill: a missing row is version 0 and the first write creates it
+
+def downgrade():
+    op.drop_table('collection_versions')
@@ -0,0 +1,28 @@
+"""Add token_revocations table
+
+Revision ID: c8a1e6f2d359
+Revises: b2f7d5c9e184
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'c8a1e6f2d359'
+down_revision = 'b2f7d5c9e184'
+
+def upgrade():
+    op.create_table('token_revocations',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('jti', sa.String(length=36), nullable=True, unique=True),
+        sa.Column('revoked_at', sa.DateTime(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False)
+    )
+    op.create_index('ix_token_revocations_revoked_at', 'token_revocations', ['revoked_at'])
+    op.create_index('ix_token_revocations_user_revoked_at', 'token_revocations', ['user_id', 'revoked_at'])
+
+def downgrade():
+    op.drop_index('ix_token_revocations_user_revoked_at', table_name='token_revocations')
+    op.drop_index('ix_token_revocations_revoked_at', table_name='token_revocations')
+    op.drop_table('token_revocations')
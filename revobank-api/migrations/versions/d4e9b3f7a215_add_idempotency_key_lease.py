@@ -0,0 +1,20 @@
+"""Add idempotency_keys.locked_until and an expires_at index
+
+Revision ID: d4e9b3f7a215
+Revises: c8a1e6f2d359
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'd4e9b3f7a215'
+down_revision = 'c8a1e6f2d359'
+
+def upgrade():
+    op.add_column('idempotency_keys', sa.Column('locked_until', sa.DateTime(), nullable=True))
+    op.create_index('ix_idempotency_keys_expires_at', 'idempotency_keys', ['expires_at'])
+
+def downgrade():
+    op.drop_index('ix_idempotency_keys_expires_at', table_name='idempotency_keys')
+    op.drop_column('idempotency_keys', 'locked_until')
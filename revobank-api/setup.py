@@ -10,6 +10,7 @@ setup(
         "flask-sqlalchemy==3.1.1",
         "flask-migrate==4.0.5",
         "sqlalchemy==2.0.25",
+        "orjson==3.10.15",
         "psycopg2-binary==2.9.6",
         "python-dotenv==1.0.1",
         "werkzeug==3.0.3",
@@ -18,4 +19,12 @@ setup(
         "httpie==3.2.2",
         "gunicorn==20.1.0"
     ],
+    extras_require={
+        # ASGI serving: uvicorn --factory app.asgi:create_asgi_app
+        "asgi": [
+            "uvicorn==0.29.0",
+            "asyncpg==0.29.0",
+            "aiosqlite==0.22.1",
+        ],
+    },
 )
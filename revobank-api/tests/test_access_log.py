@@ -0,0 +1,61 @@
+import logging
+import queue
+import pytest
+from app.middleware.access_log import DroppingQueueHandler, logger, parse_sampling
+
+class Records(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record.fields)
+
+@pytest.fixture
+def access_records():
+    handler = Records()
+    logger.addHandler(handler)
+    yield handler.records
+    logger.removeHandler(handler)
+
+def test_one_record_per_request(test_client, auth_tokens, access_records):
+    response = test_client.get('/api/accounts', headers={
+        'Authorization': f'Bearer {auth_tokens["access_token"]}', 'X-Request-ID': 'req-42'
+    })
+    assert response.headers['X-Request-ID'] == 'req-42'
+
+    [record] = access_records
+    assert record['method'] == 'GET'
+    assert record['path'] == '/api/accounts'
+    assert record['status'] == 200
+    assert record['user_id'] == 1
+    assert record['request_id'] == 'req-42'
+    assert record['duration_ms'] >= 0
+
+def test_unusable_request_ids_are_replaced(test_client, access_records):
+    response = test_client.get('/', headers={'X-Request-ID': 'not an id'})
+    assert len(response.headers['X-Request-ID']) == 32
+    assert access_records[0]['request_id'] == response.headers['X-Request-ID']
+    assert access_records[0]['user_id'] is None
+
+def test_sampling_keeps_errors(app, test_client, init_database, access_records):
+    app.extensions['access_log_sampling'] = {'home': 0.0, 'accounts.get_all_accounts': 0.0}
+    try:
+        test_client.get('/')
+        test_client.get('/api/accounts')
+    finally:
+        app.extensions['access_log_sampling'] = {}
+    assert [record['status'] for record in access_records] == [401]
+
+def test_parse_sampling():
+    assert parse_sampling('accounts.get_all_accounts=0.1; bills.get_bills=1') == {
+        'accounts.get_all_accounts': 0.1, 'bills.get_bills': 1.0
+    }
+    with pytest.raises(ValueError):
+        parse_sampling('home=2')
+
+def test_full_queue_drops_records():
+    handler = DroppingQueueHandler(queue.Queue(1))
+    for _ in range(3):
+        handler.emit(logging.LogRecord('revobank.access', logging.INFO, __file__, 1, 'access', None, None))
+    assert handler.dropped == 2
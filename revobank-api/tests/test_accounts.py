@@ -117,4 +117,86 @@ def test_delete_account(test_client, auth_tokens, init_database):
 
     headers = {'Authorization': f'Bearer {auth_tokens["access_token"]}'}
     res = test_client.delete(f"/api/accounts/{account.id}", headers=headers)
-    assert res.status_code == 204
\ No newline at end of file
+    assert res.status_code == 204
+
+def test_account_balance_as_of(test_client, auth_tokens, init_database):
+    from datetime import datetime
+    from decimal import Decimal
+    from app.models.transaction import Transaction
+    from app.models.balance_checkpoint import BalanceCheckpoint
+    from app.services.balances import write_checkpoints
+
+    # Opening balance of 1000, then three days of activity
+    db.session.add_all([
+        Transaction(type='deposit', amount=100, to_account_id=1, created_at=datetime(2025, 1, 1, 10)),
+        Transaction(type='withdrawal', amount=50, from_account_id=1, created_at=datetime(2025, 1, 2, 10)),
+        Transaction(type='deposit', amount=25, to_account_id=1, created_at=datetime(2025, 1, 3, 10)),
+    ])
+    db.session.get(Account, 1).balance = Decimal('1075.00')
+    db.session.commit()
+
+    headers = {'Authorization': f'Bearer {auth_tokens["access_token"]}'}
+    expected = {
+        '2025-01-01T09:00:00': '1000.00',
+        '2025-01-02T12:00:00': '1050.00',
+        '2025-01-03T11:00:00': '1075.00',
+    }
+
+    def check_balances():
+        for as_of, balance in expected.items():
+            res = test_client.get(f"/api/accounts/1/balance?as_of={as_of}", headers=headers)
+            assert res.status_code == 200
+            assert res.get_json()["balance"] == balance
+
+    # Without checkpoints the live balance is walked back
+    check_balances()
+
+    # First run anchors a checkpoint at the last day boundary
+    assert write_checkpoints(now=datetime(2025, 1, 3, 12)) == 1
+    checkpoint = BalanceCheckpoint.query.one()
+    assert checkpoint.as_of == datetime(2025, 1, 3)
+    assert checkpoint.balance == Decimal('1050.00')
+    check_balances()
+
+    # Enough postings since the checkpoint make the account due again
+    assert write_checkpoints(now=datetime(2025, 1, 3, 12), min_postings=2) == 0
+    assert write_checkpoints(now=datetime(2025, 1, 3, 12), min_postings=1) == 1
+    check_balances()
+
+    res = test_client.get("/api/accounts/1/balance?as_of=yesterday", headers=headers)
+    assert res.status_code == 400
+
+def test_write_checkpoints_queries_do_not_grow_with_accounts(test_client, init_database):
+    from datetime import datetime
+    from decimal import Decimal
+    from sqlalchemy import event
+    from app.models.transaction import Transaction
+    from app.models.balance_checkpoint import BalanceCheckpoint
+    from app.services.balances import write_checkpoints
+
+    db.session.add_all([
+        Account(user_id=1, account_type='checking', account_number=f'ACC-CP{i}', balance=500) for i in range(5)
+    ])
+    db.session.flush()
+    db.session.add_all([
+        Transaction(type='transfer', amount=200, from_account_id=1, to_account_id=2, created_at=datetime(2025, 1, 2, 10)),
+        Transaction(type='deposit', amount=40, to_account_id=3, created_at=datetime(2025, 1, 3, 10)),
+    ])
+    db.session.commit()
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        assert write_checkpoints(now=datetime(2025, 1, 3, 12)) == 6
+        assert write_checkpoints(now=datetime(2025, 1, 4, 12)) == 1
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    balances = {c.account_id: c.balance for c in BalanceCheckpoint.query.filter_by(as_of=datetime(2025, 1, 3))}
+    assert balances[1] == Decimal('1000.00') and balances[2] == Decimal('500.00')
+    assert balances[3] == Decimal('460.00')
+    assert BalanceCheckpoint.query.filter_by(as_of=datetime(2025, 1, 4)).one().balance == Decimal('500.00')
+    assert sum(statement.lstrip().startswith('SELECT') for statement in statements) == 6
@@ -0,0 +1,181 @@
+import asyncio
+import shutil
+import pytest
+from sqlalchemy import event, text
+from app import create_app, db
+from app.asgi import AsyncReadApp, async_database_uri
+from app.models.user import User
+from app.models.account import Account
+
+pytest.importorskip('aiosqlite')
+
+@pytest.fixture
+def asgi(tmp_path):
+    """ASGI app on a SQLite file, which the sync and async engines share"""
+    flask_app = create_app('testing', {'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "revobank.db"}'})
+    with flask_app.app_context():
+        db.create_all()
+        user = User(username='testuser', email='test@revobank.com')
+        user.set_password('TestPass123!')
+        db.session.add(user)
+        db.session.commit()
+        db.session.add(Account(user_id=user.id, account_type='savings', account_number='ACC-123456', balance=1000))
+        db.session.commit()
+        db.session.remove()
+    return AsyncReadApp(flask_app)
+
+def _run(asgi, *requests):
+    """Send requests concurrently; returns (status, headers, body) for each"""
+    async def main():
+        try:
+            return await asyncio.gather(*(_request(asgi, *request) for request in requests))
+        finally:
+            await asgi.engine.dispose()
+    return asyncio.run(main())
+
+async def _request(asgi, method, path, headers=None, body=b''):
+    path, _, query = path.partition('?')
+    scope = {
+        'type': 'http', 'method': method, 'path': path, 'query_string': query.encode(),
+        'root_path': '', 'scheme': 'http', 'http_version': '1.1',
+        'server': ('testserver', 80), 'client': ('127.0.0.1', 5000),
+        'headers': [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+    }
+    received = []
+    messages = []
+
+    async def receive():
+        if received:
+            return {'type': 'http.disconnect'}
+        received.append(True)
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    await asgi(scope, receive, send)
+    start, *bodies = messages
+    headers = {name.decode(): value.decode() for name, value in start['headers']}
+    return start['status'], headers, b''.join(message['body'] for message in bodies)
+
+def _login(asgi):
+    [(status, _, body)] = _run(asgi, ('POST', '/api/auth/login', {'Content-Type': 'application/json'},
+                                      b'{"email": "test@revobank.com", "password": "TestPass123!"}'))
+    assert status == 200
+    return {'Authorization': 'Bearer ' + asgi.flask_app.json.loads(body)['access_token']}
+
+def test_async_database_uri():
+    assert str(async_database_uri('sqlite:////tmp/revobank.db')) == 'sqlite+aiosqlite:////tmp/revobank.db'
+    url = async_database_uri('postgresql://user:secret@db:5432/revobank?sslmode=require')
+    assert url.drivername == 'postgresql+asyncpg'
+    assert dict(url.query) == {'ssl': 'require'}
+    with pytest.raises(ValueError):
+        async_database_uri('sqlite:///:memory:')
+
+def test_async_reads_match_flask_views(asgi):
+    headers = _login(asgi)
+    [(status, _, _)] = _run(asgi, ('POST', '/api/transactions', {**headers, 'Content-Type': 'application/json'},
+                                   b'{"type": "deposit", "amount": "25.00", "to_account_id": 1}'))
+    assert status == 201
+
+    paths = [
+        '/api/accounts', '/api/accounts/1', '/api/accounts/99', '/api/transactions',
+        '/api/transactions?limit=1', '/api/transactions/1', '/api/transactions/99',
+        '/api/transactions/categories', '/api/bills', '/api/budgets',
+    ]
+    statements = []
+    event.listen(asgi.engine.sync_engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    responses = _run(asgi, *[('GET', path, headers) for path in paths])
+    assert len(statements) >= len(paths)
+
+    client = asgi.flask_app.test_client()
+    for path, (status, _, body) in zip(paths, responses):
+        expected = client.get(path, headers=headers)
+        assert (status, body) == (expected.status_code, expected.get_data()), path
+
+def test_async_reads_check_tokens_and_validators(asgi):
+    headers = _login(asgi)
+    [(status, response_headers, _), (unauthorized, _, _)] = _run(
+        asgi, ('GET', '/api/accounts', headers), ('GET', '/api/accounts', None)
+    )
+    assert status == 200
+    assert unauthorized == 401
+
+    [(status, _, body)] = _run(asgi, ('GET', '/api/accounts', {**headers, 'If-None-Match': response_headers['etag']}))
+    assert status == 304
+    assert body == b''
+
+def test_concurrent_async_reads(asgi):
+    headers = _login(asgi)
+    responses = _run(asgi, *[('GET', '/api/accounts/1', headers)] * 20)
+    assert {status for status, _, _ in responses} == {200}
+    assert len({body for _, _, body in responses}) == 1
+
+def test_slow_token_check_does_not_block_other_reads(asgi):
+    import time
+    from flask import request
+
+    headers = _login(asgi)
+    blocklist = asgi.flask_app.extensions['token_blocklist']
+    is_revoked = blocklist.is_revoked
+
+    def slow_is_revoked(*args):
+        if 'X-Slow' in request.headers:
+            # A blocking query on the primary, as in a blocklist refresh
+            time.sleep(1)
+        return is_revoked(*args)
+    blocklist.is_revoked = slow_is_revoked
+
+    async def main():
+        try:
+            started = time.monotonic()
+            slow = asyncio.create_task(_request(asgi, 'GET', '/api/accounts', {**headers, 'X-Slow': '1'}))
+            await asyncio.sleep(0.1)
+            status, _, _ = await _request(asgi, 'GET', '/api/accounts/1', headers)
+            fast_elapsed = time.monotonic() - started
+            return status, fast_elapsed, slow.done(), (await slow)[0]
+        finally:
+            await asgi.engine.dispose()
+
+    status, fast_elapsed, slow_done, slow_status = asyncio.run(main())
+    assert (status, slow_status) == (200, 200)
+    assert fast_elapsed < 0.5
+    assert not slow_done
+
+def test_async_reads_use_the_replica(tmp_path):
+    primary, replica = tmp_path / 'primary.db', tmp_path / 'replica.db'
+    flask_app = create_app('testing', {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{primary}',
+        'REPLICA_DATABASE_URI': f'sqlite:///{replica}',
+    })
+    with flask_app.app_context():
+        db.create_all()
+        user = User(username='testuser', email='test@revobank.com')
+        user.set_password('TestPass123!')
+        db.session.add(user)
+        db.session.commit()
+        db.session.add(Account(user_id=user.id, account_type='savings', account_number='ACC-123456', balance=1000))
+        db.session.commit()
+        db.session.remove()
+        db.engine.dispose()
+    shutil.copy(primary, replica)
+    with flask_app.extensions['read_replica'].begin() as connection:
+        connection.execute(text('UPDATE accounts SET balance = 5'))
+    asgi = AsyncReadApp(flask_app)
+    headers = _login(asgi)
+
+    async def main():
+        try:
+            _, _, replica_body = await _request(asgi, 'GET', '/api/accounts/1', headers)
+            await _request(asgi, 'PUT', '/api/accounts/1', {**headers, 'Content-Type': 'application/json'},
+                           b'{"account_type": "checking"}')
+            # The writer's token reads from the primary during the read-your-writes window
+            _, _, primary_body = await _request(asgi, 'GET', '/api/accounts/1', headers)
+            return replica_body, primary_body
+        finally:
+            await asgi.engine.dispose()
+            await asgi.replica_engine.dispose()
+
+    replica_body, primary_body = asyncio.run(main())
+    assert flask_app.json.loads(replica_body)['balance'] == '5.00'
+    assert flask_app.json.loads(primary_body)['balance'] == '1000.00'
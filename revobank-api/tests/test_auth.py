@@ -1,4 +1,5 @@
 import pytest
+from datetime import datetime, timezone
 from app import create_app, db
 from app.models.user import User
 from app.models.account import Account
@@ -244,4 +245,99 @@ def test_delete_user_with_accounts(test_client, init_database):
     response = test_client.delete('/api/auth/users/me', headers=headers)
     assert response.status_code == 400
     assert 'error' in response.json
-    assert 'Cannot delete user with active accounts' in response.json['error']
\ No newline at end of file
+    assert 'Cannot delete user with active accounts' in response.json['error']
+
+def _login(test_client):
+    response = test_client.post('/api/auth/login', json={
+        'email': 'test@revobank.com',
+        'password': 'TestPass123!'
+    })
+    return {'Authorization': f'Bearer {response.json["access_token"]}'}
+
+def test_logout_revokes_only_that_token(test_client, init_database):
+    headers, other = _login(test_client), _login(test_client)
+    response = test_client.post('/api/auth/logout', headers=headers)
+    assert response.status_code == 200
+
+    response = test_client.get('/api/auth/users/me', headers=headers)
+    assert response.status_code == 401
+    assert test_client.get('/api/auth/users/me', headers=other).status_code == 200
+
+def test_logout_all_revokes_every_token(test_client, init_database):
+    headers, other = _login(test_client), _login(test_client)
+    assert test_client.post('/api/auth/logout/all', headers=headers).status_code == 200
+    assert test_client.get('/api/auth/users/me', headers=headers).status_code == 401
+    assert test_client.get('/api/auth/users/me', headers=other).status_code == 401
+
+    # Tokens issued after the cutoff are accepted
+    from app.models.token_revocation import TokenRevocation
+    revocation = TokenRevocation.query.one()
+    blocklist = test_client.application.extensions['token_blocklist']
+    issued_later = int(revocation.revoked_at.replace(tzinfo=timezone.utc).timestamp()) + 1
+    assert not blocklist.is_revoked(revocation.user_id, 'new-jti', issued_later)
+
+def test_blocklist_checks_skip_the_database(test_client, init_database):
+    from sqlalchemy import event
+    from app.services.revocation import TokenBlocklist, revoke_token
+
+    blocklist = TokenBlocklist(refresh_interval=0)
+    exp = int(datetime.now(timezone.utc).timestamp()) + 3600
+    for i in range(50):
+        revoke_token({'sub': '1', 'jti': f'revoked-{i}', 'exp': exp, 'iat': 0})
+
+    # Another worker picks revocations up from the table on refresh
+    assert blocklist.is_revoked(1, 'revoked-7', 0)
+
+    blocklist.refresh_interval = 60
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        assert not blocklist.is_revoked(1, 'valid-token', 0)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert statements == []
+
+    # A Bloom filter false positive is confirmed against the table
+    blocklist._filter.add('valid-token')
+    assert not blocklist.is_revoked(1, 'valid-token', 0)
+
+def test_prune_expired_revocations(test_client, init_database):
+    from app.models.token_revocation import TokenRevocation
+    from app.services.revocation import prune_revocations, revoke_token
+
+    now = int(datetime.now(timezone.utc).timestamp())
+    revoke_token({'sub': '1', 'jti': 'expired', 'exp': now - 60, 'iat': 0})
+    revoke_token({'sub': '1', 'jti': 'live', 'exp': now + 60, 'iat': 0})
+    assert prune_revocations() == 1
+    assert [row.jti for row in TokenRevocation.query.all()] == ['live']
+
+def test_register_does_not_select(test_client, init_database):
+    from sqlalchemy import event
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        response = test_client.post('/api/auth/users', json={
+            'username': 'single', 'email': 'single@revobank.com', 'password': 'Single123!'
+        })
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert response.status_code == 201
+    # The row, then its password hash in the same transaction
+    assert [statement.split()[0] for statement in statements] == ['INSERT', 'UPDATE']
+    assert User.query.filter_by(username='single').one().check_password('Single123!')
+
+def test_register_duplicate_is_checked_before_password(test_client, init_database, monkeypatch):
+    from app.models import user
+
+    hashed = []
+    monkeypatch.setattr(user, 'hash_password', lambda password: hashed.append(password))
+    response = test_client.post('/api/auth/users', json={
+        'username': 'weakdup', 'email': 'test@revobank.com', 'password': 'weak'
+    })
+    assert response.status_code == 409
+    assert response.json['error'] == 'Email already exists'
+    assert hashed == []
+    assert User.query.filter_by(username='weakdup').count() == 0
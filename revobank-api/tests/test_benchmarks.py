@@ -0,0 +1,30 @@
+from benchmarks.bench_endpoints import compare, run, save_baseline
+
+def test_benchmark_runs_and_flags_regressions(tmp_path):
+    results = run(
+        f'sqlite:///{tmp_path / "bench.db"}', scale='tiny', clients=2, requests=10,
+        scenarios=['accounts.list', 'transactions.create'], config={'PASSWORD_HASH_WORKERS': 0}
+    )
+    assert [results[name]['requests'] for name in results] == [10, 10]
+    assert [results[name]['errors'] for name in results] == [0, 0]
+
+    baselines = save_baseline(results, {'threshold_pct': 20, 'hot': ['accounts.list']}, {'scale': 'tiny'})
+    assert compare(results, baselines) == []
+
+    slower = dict(results, **{'accounts.list': dict(results['accounts.list'], p95_ms=results['accounts.list']['p95_ms'] * 2 + 1)})
+    [problem] = compare(slower, baselines)
+    assert problem.startswith('accounts.list: p95')
+
+def test_interrupted_seed_is_redone(tmp_path):
+    from app import create_app, db
+    from app.models import Transaction
+    from benchmarks.bench_endpoints import SCALES, seed
+
+    app = create_app(None, {'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "bench.db"}'})
+    with app.app_context():
+        seed('tiny')
+        Transaction.query.filter(Transaction.id > 100).delete()
+        db.session.commit()
+        seed('tiny')
+        assert Transaction.query.count() == SCALES['tiny']['transactions']
+        db.session.remove()
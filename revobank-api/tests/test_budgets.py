@@ -0,0 +1,90 @@
+import pytest
+from datetime import date, datetime
+from sqlalchemy import event
+from app.models.account import Account
+from app.models.budget import Budget
+from app.models.transaction import Transaction
+from app.models.user import User
+from app import db
+
+@pytest.fixture
+def spending(init_database):
+    """Withdrawals and transfers across January 2025 for the test user"""
+    user2 = User(username='user2', email='user2@example.com')
+    user2.set_password('Pass123!')
+    db.session.add(user2)
+    db.session.commit()
+    db.session.add_all([
+        Account(user_id=1, account_type='checking', account_number='ACC-OWN2', balance=0),
+        Account(user_id=user2.id, account_type='savings', account_number='ACC-OTHER', balance=0),
+    ])
+    db.session.add_all([
+        Transaction(type='withdrawal', amount=40, from_account_id=1, created_at=datetime(2025, 1, 5, 9)),
+        Transaction(type='transfer', amount=60, from_account_id=1, to_account_id=3,
+                    created_at=datetime(2025, 1, 10, 23, 59)),
+        # Moving money between own accounts is not spending
+        Transaction(type='transfer', amount=500, from_account_id=1, to_account_id=2,
+                    created_at=datetime(2025, 1, 12, 12)),
+        Transaction(type='deposit', amount=1000, to_account_id=1, created_at=datetime(2025, 1, 15, 12)),
+        Transaction(type='withdrawal', amount=25, from_account_id=1, created_at=datetime(2025, 1, 20, 8)),
+    ])
+    db.session.commit()
+    return db
+
+def test_budget_status(test_client, auth_tokens, spending):
+    budget = Budget(user_id=1, name='January', amount=200,
+                    start_date=date(2025, 1, 1), end_date=date(2025, 1, 10))
+    db.session.add(budget)
+    db.session.commit()
+
+    headers = {'Authorization': f'Bearer {auth_tokens["access_token"]}'}
+    res = test_client.get(f'/api/budgets/{budget.id}/status', headers=headers)
+    assert res.status_code == 200
+    status = res.get_json()
+    assert status['spent'] == '100.00'
+    assert status['remaining'] == '100.00'
+    assert status['percent_used'] == 50.0
+
+    res = test_client.get('/api/budgets/999/status', headers=headers)
+    assert res.status_code == 404
+
+def test_bulk_budget_status_query_count(app, test_client, auth_tokens, spending, monkeypatch):
+    headers = {'Authorization': f'Bearer {auth_tokens["access_token"]}'}
+    # Load the token blocklist now and keep its periodic refresh from adding a query to one request
+    test_client.get('/api/budgets/status', headers=headers)
+    monkeypatch.setattr(app.extensions['token_blocklist'], 'refresh_interval', float('inf'))
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    def queries_for_status():
+        statements.clear()
+        event.listen(db.engine, 'before_cursor_execute', count)
+        try:
+            res = test_client.get('/api/budgets/status', headers=headers)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count)
+        assert res.status_code == 200
+        return res.get_json(), len(statements)
+
+    db.session.add(Budget(user_id=1, name='Early', amount=50,
+                          start_date=date(2025, 1, 1), end_date=date(2025, 1, 5)))
+    db.session.commit()
+    statuses, single = queries_for_status()
+    assert [s['spent'] for s in statuses] == ['40.00']
+
+    db.session.add_all([
+        Budget(user_id=1, name='Month', amount=100,
+               start_date=date(2025, 1, 1), end_date=date(2025, 1, 31)),
+        Budget(user_id=1, name='Late', amount=0,
+               start_date=date(2025, 1, 11), end_date=date(2025, 1, 31)),
+    ])
+    db.session.commit()
+    statuses, many = queries_for_status()
+    assert [s['spent'] for s in statuses] == ['40.00', '125.00', '25.00']
+    assert statuses[1]['remaining'] == '-25.00'
+    assert statuses[2]['percent_used'] is None
+
+    # More budgets do not mean more queries
+    assert many == single
@@ -0,0 +1,128 @@
+import gzip
+import zlib
+import pytest
+from werkzeug.test import create_environ
+from app.middleware.compression import CompressionMiddleware
+from app.models.transaction import Transaction
+from app import db
+
+def _run(app, accept_encoding='gzip', **middleware_options):
+    middleware = CompressionMiddleware(app, **middleware_options)
+    environ = create_environ('/', headers={'Accept-Encoding': accept_encoding})
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started['status'], started['headers'] = status, dict(headers)
+
+    body = middleware(environ, start_response)
+    chunks = list(body)
+    return started['headers'], chunks
+
+def _json_app(body, **headers):
+    def app(environ, start_response):
+        start_response('200 OK', [('Content-Type', 'application/json'),
+                                  ('Content-Length', str(len(body))), *headers.items()])
+        return [body]
+    return app
+
+def test_large_body_is_gzipped():
+    body = b'{"amount": "10.00"}' * 200
+    headers, chunks = _run(_json_app(body, ETag='"v1"'))
+    data = b''.join(chunks)
+    assert headers['Content-Encoding'] == 'gzip'
+    assert headers['Content-Length'] == str(len(data))
+    assert headers['Vary'] == 'Accept-Encoding'
+    assert headers['ETag'] == 'W/"v1"'
+    assert gzip.decompress(data) == body
+
+def test_small_or_unaccepted_bodies_pass_through():
+    headers, chunks = _run(_json_app(b'{}'))
+    assert 'Content-Encoding' not in headers
+    assert headers['Vary'] == 'Accept-Encoding'
+    assert chunks == [b'{}']
+
+    body = b'x' * 5000
+    headers, chunks = _run(_json_app(body, Vary='Authorization'), accept_encoding='identity')
+    assert 'Content-Encoding' not in headers
+    assert headers['Vary'] == 'Authorization, Accept-Encoding'
+    assert b''.join(chunks) == body
+
+def test_encoded_and_binary_bodies_pass_through():
+    body = b'x' * 5000
+    headers, chunks = _run(_json_app(body, **{'Content-Encoding': 'gzip'}))
+    assert headers['Content-Encoding'] == 'gzip'
+    assert b''.join(chunks) == body
+
+    def image_app(environ, start_response):
+        start_response('200 OK', [('Content-Type', 'image/png')])
+        return [body]
+    headers, chunks = _run(image_app)
+    assert 'Content-Encoding' not in headers
+    assert 'Vary' not in headers
+
+def test_stream_is_compressed_incrementally():
+    produced = []
+    closed = []
+
+    class Stream:
+        def __iter__(self):
+            for i in range(50):
+                produced.append(i)
+                yield b'%d,deposit,10.00\n' % i * 20
+
+        def close(self):
+            closed.append(True)
+
+    def app(environ, start_response):
+        start_response('200 OK', [('Content-Type', 'text/csv')])
+        return Stream()
+
+    middleware = CompressionMiddleware(app)
+    environ = create_environ('/', headers={'Accept-Encoding': 'gzip'})
+    started = {}
+    body = middleware(environ, lambda status, headers, exc_info=None: started.update(headers=dict(headers)))
+
+    decompressor = zlib.decompressobj(31)
+    first = next(iter(body))
+    # Output starts long before the application has finished
+    assert len(produced) < 5
+    assert 'Content-Length' not in started['headers']
+    assert started['headers']['Content-Encoding'] == 'gzip'
+    text = decompressor.decompress(first)
+    assert text.startswith(b'0,deposit')
+
+    for chunk in body:
+        text += decompressor.decompress(chunk)
+    body.close()
+    assert text == b''.join(b'%d,deposit,10.00\n' % i * 20 for i in range(50))
+    assert closed == [True]
+
+def test_brotli_preferred_when_installed():
+    brotli = pytest.importorskip('brotli')
+    body = b'{"amount": "10.00"}' * 200
+    headers, chunks = _run(_json_app(body), accept_encoding='gzip, br')
+    assert headers['Content-Encoding'] == 'br'
+    assert brotli.decompress(b''.join(chunks)) == body
+
+def test_client_preference_wins_over_brotli():
+    body = b'{"amount": "10.00"}' * 200
+    headers, chunks = _run(_json_app(body), accept_encoding='gzip;q=1, br;q=0.1')
+    assert headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(b''.join(chunks)) == body
+    headers, _ = _run(_json_app(body), accept_encoding='gzip;q=0, br;q=0')
+    assert 'Content-Encoding' not in headers
+
+def test_export_is_gzipped(test_client, auth_tokens):
+    db.session.add_all(
+        Transaction(type='deposit', amount=10, to_account_id=1, description=f'Deposit {i}') for i in range(100)
+    )
+    db.session.commit()
+
+    response = test_client.get('/api/transactions/export', headers={
+        'Authorization': f'Bearer {auth_tokens["access_token"]}',
+        'Accept-Encoding': 'gzip'
+    })
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    lines = gzip.decompress(response.get_data()).decode().splitlines()
+    assert len(lines) == 101
@@ -0,0 +1,118 @@
+from datetime import date, datetime, timedelta
+from sqlalchemy import event
+from app.models.bill import Bill
+from app.models.collection_version import CollectionVersion
+from app.models.transaction_category import TransactionCategory
+from app import db
+
+def _headers(auth_tokens, **extra):
+    return {'Authorization': f'Bearer {auth_tokens["access_token"]}', **extra}
+
+def test_unchanged_collection_returns_304_without_loading_rows(test_client, auth_tokens):
+    first = test_client.get('/api/accounts', headers=_headers(auth_tokens))
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert 'Authorization' in first.headers['Vary']
+    assert 'private' in first.headers['Cache-Control']
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        second = test_client.get('/api/accounts', headers=_headers(auth_tokens, **{'If-None-Match': etag}))
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+
+    assert second.status_code == 304
+    assert second.get_data() == b''
+    assert second.headers['ETag'] == etag
+    assert not any('FROM accounts' in statement for statement in statements)
+
+def test_posting_changes_account_etag(test_client, auth_tokens):
+    etag = test_client.get('/api/accounts', headers=_headers(auth_tokens)).headers['ETag']
+    bills_etag = test_client.get('/api/bills', headers=_headers(auth_tokens)).headers['ETag']
+
+    response = test_client.post('/api/transactions', json={
+        'type': 'deposit', 'amount': '5.00', 'to_account_id': 1
+    }, headers=_headers(auth_tokens))
+    assert response.status_code == 201
+
+    response = test_client.get('/api/accounts', headers=_headers(auth_tokens, **{'If-None-Match': etag}))
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert response.json[0]['balance'] == '1005.00'
+
+    # Other collections keep their validators
+    response = test_client.get('/api/bills', headers=_headers(auth_tokens, **{'If-None-Match': bills_etag}))
+    assert response.status_code == 304
+
+def test_posting_bumps_version_after_commit(test_client, auth_tokens):
+    events = []
+    listener = lambda conn, cursor, statement, *args: events.append(statement)
+    on_commit = lambda conn: events.append('COMMIT')
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    event.listen(db.engine, 'commit', on_commit)
+    try:
+        response = test_client.post('/api/transactions', json={
+            'type': 'deposit', 'amount': '5.00', 'to_account_id': 1
+        }, headers=_headers(auth_tokens))
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+        event.remove(db.engine, 'commit', on_commit)
+
+    assert response.status_code == 201
+    # The version row is written in its own transaction after the posting commits
+    bump = next(i for i, statement in enumerate(events) if 'INTO collection_versions' in statement)
+    assert 'INSERT INTO transactions' in ' '.join(events[:bump])
+    assert events[bump - 1] == 'COMMIT' and events[bump + 1] == 'COMMIT'
+    assert CollectionVersion.query.filter_by(collection='accounts', scope_id=1).one().version >= 1
+
+def test_orm_writes_change_etag(test_client, auth_tokens):
+    etag = test_client.get('/api/bills', headers=_headers(auth_tokens)).headers['ETag']
+
+    db.session.add(Bill(user_id=1, account_id=1, biller_name='Power', due_date=date(2025, 2, 1), amount=30))
+    db.session.commit()
+    response = test_client.get('/api/bills', headers=_headers(auth_tokens, **{'If-None-Match': etag}))
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+
+    db.session.rollback()
+    bill = Bill.query.first()
+    db.session.delete(bill)
+    db.session.commit()
+    response = test_client.get('/api/bills', headers=_headers(auth_tokens, **{'If-None-Match': etag}))
+    assert response.status_code == 200
+    assert response.json == []
+
+def test_rolled_back_write_keeps_etag(test_client, auth_tokens):
+    etag = test_client.get('/api/bills', headers=_headers(auth_tokens)).headers['ETag']
+    db.session.add(Bill(user_id=1, account_id=1, biller_name='Power', due_date=date(2025, 2, 1), amount=30))
+    db.session.flush()
+    db.session.rollback()
+    response = test_client.get('/api/bills', headers=_headers(auth_tokens, **{'If-None-Match': etag}))
+    assert response.status_code == 304
+
+def test_shared_categories_and_last_modified(test_client, auth_tokens):
+    db.session.add(TransactionCategory(name='Groceries'))
+    db.session.commit()
+
+    # Last-Modified is only sent once the collection has settled
+    response = test_client.get('/api/transactions/categories', headers=_headers(auth_tokens))
+    assert 'Last-Modified' not in response.headers
+
+    version = CollectionVersion.query.filter_by(collection='categories', scope_id=0).one()
+    version.updated_at = datetime(2025, 1, 1, 12)
+    db.session.commit()
+    response = test_client.get('/api/transactions/categories', headers=_headers(auth_tokens))
+    assert response.headers['Last-Modified'] == 'Wed, 01 Jan 2025 12:00:00 GMT'
+
+    response = test_client.get('/api/transactions/categories', headers=_headers(
+        auth_tokens, **{'If-Modified-Since': 'Wed, 01 Jan 2025 12:00:00 GMT'}
+    ))
+    assert response.status_code == 304
+
+    response = test_client.get('/api/transactions/categories', headers=_headers(
+        auth_tokens, **{'If-Modified-Since': 'Tue, 31 Dec 2024 12:00:00 GMT'}
+    ))
+    assert response.status_code == 200
+    assert [category['name'] for category in response.json] == ['Groceries']
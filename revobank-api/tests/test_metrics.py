@@ -0,0 +1,89 @@
+import subprocess
+import sys
+import threading
+import time
+from app.middleware.metrics import Metrics
+
+def _sample(text, line_start):
+    for line in text.splitlines():
+        if line.startswith(line_start + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    return 0.0
+
+def test_requests_are_counted_per_endpoint(test_client, auth_tokens):
+    headers = {'Authorization': f'Bearer {auth_tokens["access_token"]}'}
+    series = 'revobank_http_requests_total{endpoint="accounts.get_all_accounts",method="GET",status="200"}'
+    before = _sample(test_client.get('/metrics').get_data(as_text=True), series)
+
+    for _ in range(3):
+        assert test_client.get('/api/accounts', headers=headers).status_code == 200
+    test_client.get('/no/such/page')
+
+    response = test_client.get('/metrics')
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    text = response.get_data(as_text=True)
+    assert _sample(text, series) == before + 3
+    assert 'endpoint="unmatched",method="GET",status="404"' in text
+    labels = '{endpoint="accounts.get_all_accounts",method="GET"}'
+    assert _sample(text, 'revobank_http_request_duration_seconds_count' + labels) >= 3
+    assert _sample(text, 'revobank_http_request_db_seconds_sum' + labels) > 0
+
+    assert test_client.get('/metrics', environ_base={'REMOTE_ADDR': '203.0.113.7'}).status_code == 404
+
+def test_histogram_buckets_are_cumulative():
+    metrics = Metrics()
+    for duration in (0.004, 0.005, 0.2, 30):
+        metrics.observe('accounts.get_all_accounts', 'GET', '200', duration, 0.0)
+    text = metrics.render()
+    prefix = 'revobank_http_request_duration_seconds_bucket{endpoint="accounts.get_all_accounts",method="GET",'
+    assert _sample(text, prefix + 'le="0.005"}') == 2
+    assert _sample(text, prefix + 'le="0.25"}') == 3
+    assert _sample(text, prefix + 'le="10.0"}') == 3
+    assert _sample(text, prefix + 'le="+Inf"}') == 4
+
+def test_worker_processes_are_added_up(tmp_path):
+    worker = (
+        "from app.middleware.metrics import Metrics\n"
+        f"metrics = Metrics({str(tmp_path)!r})\n"
+        "for _ in range(2): metrics.observe('bills.get_bills', 'GET', '200', 0.01, 0.001)\n"
+        "metrics.flush()\n"
+    )
+    for _ in range(2):
+        subprocess.run([sys.executable, '-c', worker], check=True)
+
+    metrics = Metrics(str(tmp_path))
+    metrics.observe('bills.get_bills', 'GET', '200', 0.01, 0.001)
+    text = metrics.render()
+    assert _sample(text, 'revobank_http_requests_total{endpoint="bills.get_bills",method="GET",status="200"}') == 5
+    assert _sample(text, 'revobank_http_request_db_seconds_count{endpoint="bills.get_bills",method="GET"}') == 5
+
+def test_reused_pid_does_not_overwrite_a_dead_worker(tmp_path):
+    # Same PID, as when a new worker gets the PID of one that exited
+    for _ in range(2):
+        dead = Metrics(str(tmp_path))
+        dead.observe('bills.get_bills', 'GET', '200', 0.01, 0.001)
+        dead.flush()
+
+    text = Metrics(str(tmp_path)).render()
+    assert len(list(tmp_path.glob('metrics-*.json'))) == 2
+    assert _sample(text, 'revobank_http_requests_total{endpoint="bills.get_bills",method="GET",status="200"}') == 2
+
+def test_files_are_written_off_the_request_thread(tmp_path, monkeypatch):
+    metrics = Metrics(str(tmp_path), flush_interval=0.01)
+    writers = []
+    flush = metrics.flush
+
+    def recording_flush():
+        writers.append(threading.current_thread())
+        flush()
+
+    monkeypatch.setattr(metrics, 'flush', recording_flush)
+    metrics.observe('bills.get_bills', 'GET', '200', 0.01, 0.001)
+    assert writers == []
+
+    deadline = time.monotonic() + 5
+    while not list(tmp_path.glob('metrics-*.json')) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert writers and threading.current_thread() not in writers
+    text = Metrics(str(tmp_path)).render()
+    assert _sample(text, 'revobank_http_requests_total{endpoint="bills.get_bills",method="GET",status="200"}') == 1
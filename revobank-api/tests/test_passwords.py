@@ -0,0 +1,55 @@
+import pytest
+from werkzeug.security import generate_password_hash
+from app.models.user import User
+from app.services import passwords
+from app import db
+
+@pytest.fixture
+def pooled(app):
+    """Hash in a one-process pool that takes a single call at a time"""
+    app.config.update(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_QUEUE=1)
+    yield app
+    app.config.update(PASSWORD_HASH_WORKERS=0, PASSWORD_HASH_QUEUE=8)
+    pool = passwords._state.get('pool')
+    if pool is not None:
+        passwords._reset_pool(pool)
+
+def test_hash_method_fills_in_defaults(app):
+    app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2'
+    try:
+        assert passwords.hash_method() == 'pbkdf2:sha256:600000'
+        assert not passwords.needs_rehash(generate_password_hash('Secret123!', method='pbkdf2'))
+        assert passwords.needs_rehash(generate_password_hash('Secret123!', method='scrypt'))
+    finally:
+        app.config['PASSWORD_HASH_METHOD'] = 'scrypt:32768:8:1'
+
+def test_login_rehashes_outdated_hash(test_client, init_database):
+    user = db.session.get(User, 1)
+    user.password_hash = generate_password_hash('TestPass123!', method='pbkdf2:sha256:1000')
+    db.session.commit()
+
+    response = test_client.post('/api/auth/login', json={'email': 'test@revobank.com', 'password': 'TestPass123!'})
+    assert response.status_code == 200
+
+    db.session.expire_all()
+    user = db.session.get(User, 1)
+    assert user.password_hash.startswith('scrypt:32768:8:1$')
+    assert user.check_password('TestPass123!')
+
+def test_pool_hashes_and_verifies(pooled):
+    with pooled.app_context():
+        password_hash = passwords.hash_password('Secret123!')
+        assert passwords.verify_password(password_hash, 'Secret123!')
+        assert not passwords.verify_password(password_hash, 'wrong')
+
+def test_saturated_pool_returns_503(test_client, init_database, pooled):
+    _, slots = passwords._pool(1, 1)
+    slots.acquire()
+    try:
+        response = test_client.post('/api/auth/login', json={
+            'email': 'test@revobank.com', 'password': 'TestPass123!'
+        })
+    finally:
+        slots.release()
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
@@ -0,0 +1,39 @@
+import pytest
+from sqlalchemy import create_engine, exc, text
+from app.middleware.pool_stats import PoolStats
+
+def test_pool_stats_count_checkouts_timeouts_and_invalidations(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "pool.db"}', pool_size=1, max_overflow=0, pool_timeout=0.05)
+    stats = PoolStats(engine)
+
+    with engine.connect() as connection:
+        connection.execute(text('SELECT 1'))
+        assert stats.snapshot()['checkedout'] == 1
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+        connection.invalidate()
+
+    snapshot = stats.snapshot()
+    assert snapshot['pool_class'] == 'QueuePool'
+    assert snapshot['size'] == 1
+    assert snapshot['max_overflow'] == 0
+    assert snapshot['checkedout'] == 0
+    assert snapshot['peak_checked_out'] == 1
+    assert snapshot['checkouts'] == 1
+    assert snapshot['timeouts'] == 1
+    assert snapshot['invalidations'] == 1
+    assert snapshot['checkout_wait_ms']['max'] >= 50
+
+    # Still measured after the engine gets a new pool
+    engine.dispose()
+    engine.connect().close()
+    assert stats.snapshot()['checkouts'] == 2
+    assert stats.snapshot()['connects'] == 2
+
+def test_pool_endpoint_is_internal_only(test_client, init_database):
+    response = test_client.get('/internal/pool')
+    assert response.status_code == 200
+    assert response.json['engines']['default']['checkouts'] >= 1
+
+    response = test_client.get('/internal/pool', environ_base={'REMOTE_ADDR': '203.0.113.7'})
+    assert response.status_code == 404
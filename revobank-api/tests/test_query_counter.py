@@ -0,0 +1,48 @@
+import pytest
+from flask import jsonify
+from sqlalchemy.exc import InvalidRequestError
+from app import create_app, db
+from app.middleware.query_counter import QueryLimitExceeded
+from app.models.account import Account
+from app.models.transaction import Transaction
+
+@pytest.fixture
+def counting_app():
+    """Separate app with a route that runs one query per account"""
+    app = create_app('testing')
+    app.config['QUERY_COUNT_LIMIT'] = 3
+
+    @app.route('/n-plus-one')
+    def n_plus_one():
+        ids = [account_id for (account_id,) in db.session.query(Account.id)]
+        return jsonify([db.session.get(Account, account_id).serialize() for account_id in ids])
+
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([
+            Account(user_id=1, account_type='savings', account_number=f'ACC-{i}') for i in range(5)
+        ])
+        db.session.commit()
+        db.session.expunge_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+def test_query_limit_raises_in_tests(counting_app):
+    with pytest.raises(QueryLimitExceeded, match='GET /n-plus-one ran 6 queries'):
+        counting_app.test_client().get('/n-plus-one')
+
+def test_query_limit_warns(counting_app, caplog):
+    counting_app.config['QUERY_COUNT_MODE'] = 'warn'
+    response = counting_app.test_client().get('/n-plus-one')
+    assert response.status_code == 200
+    assert 'GET /n-plus-one ran 6 queries' in caplog.text
+
+def test_relationships_do_not_lazy_load(counting_app):
+    db.session.add(Transaction(type='deposit', amount=10, to_account_id=1))
+    db.session.commit()
+    db.session.expunge_all()
+
+    transaction = db.session.get(Transaction, 1)
+    with pytest.raises(InvalidRequestError):
+        transaction.to_account
@@ -0,0 +1,136 @@
+import pytest
+from app.middleware.rate_limit import MemoryBackend, SQLiteBackend, RateLimiter, parse_limit
+
+@pytest.fixture
+def limited(app, init_database):
+    """Testing app with limiting switched on and a small transactions limit"""
+    original = app.extensions['rate_limiter']
+    app.extensions['rate_limiter'] = RateLimiter(MemoryBackend(), {'transactions': '2/minute', 'auth': '3/minute'})
+    app.config['RATE_LIMIT_ENABLED'] = True
+    yield app
+    app.config['RATE_LIMIT_ENABLED'] = False
+    app.extensions['rate_limiter'] = original
+
+def test_parse_limit():
+    assert parse_limit('10/minute') == (10, 10 / 60)
+    with pytest.raises(ValueError):
+        parse_limit('10 per minute')
+
+@pytest.mark.parametrize('make_backend', [
+    lambda tmp_path: MemoryBackend(),
+    lambda tmp_path: SQLiteBackend(str(tmp_path / 'buckets.db')),
+])
+def test_token_bucket(tmp_path, make_backend, monkeypatch):
+    backend = make_backend(tmp_path)
+    clock = [1000.0]
+    monkeypatch.setattr('app.middleware.rate_limit.time.monotonic', lambda: clock[0])
+    monkeypatch.setattr('app.middleware.rate_limit.time.time', lambda: clock[0])
+
+    # Burst up to the capacity, then one token every 30 seconds
+    assert [backend.take('k', 2, 1 / 30) for _ in range(2)] == [0, 0]
+    assert backend.take('k', 2, 1 / 30) == pytest.approx(30)
+    assert backend.take('other', 2, 1 / 30) == 0
+
+    clock[0] += 15
+    assert backend.take('k', 2, 1 / 30) == pytest.approx(15)
+    clock[0] += 15
+    assert backend.take('k', 2, 1 / 30) == 0
+
+def test_sqlite_buckets_are_shared(tmp_path):
+    path = str(tmp_path / 'buckets.db')
+    first, second = SQLiteBackend(path), SQLiteBackend(path)
+    assert first.take('k', 1, 1 / 60) == 0
+    assert second.take('k', 1, 1 / 60) > 0
+
+def test_requests_over_the_limit_get_429(test_client, auth_tokens, limited):
+    headers = {'Authorization': f'Bearer {auth_tokens["access_token"]}'}
+    for _ in range(2):
+        assert test_client.get('/api/transactions', headers=headers).status_code == 200
+
+    response = test_client.post('/api/transactions', json={
+        'type': 'deposit', 'amount': '5.00', 'to_account_id': 1
+    }, headers=headers)
+    assert response.status_code == 429
+    assert response.json['code'] == 429
+    assert 1 <= int(response.headers['Retry-After']) <= 30
+
+    # Other blueprints have their own buckets, unlisted ones are not limited
+    assert test_client.get('/api/accounts', headers=headers).status_code == 200
+
+def test_unauthenticated_requests_are_limited_per_ip(test_client, limited):
+    statuses = [
+        test_client.post('/api/auth/login', json={'email': 'test@revobank.com', 'password': 'wrong'},
+                         environ_base={'REMOTE_ADDR': '10.0.0.1'}).status_code
+        for _ in range(4)
+    ]
+    assert statuses == [401, 401, 401, 429]
+
+    response = test_client.post('/api/auth/login', json={'email': 'test@revobank.com', 'password': 'wrong'},
+                                environ_base={'REMOTE_ADDR': '10.0.0.2'})
+    assert response.status_code == 401
+
+@pytest.fixture
+def proxied_app():
+    """Separate app behind one trusted proxy, with one login per minute"""
+    from app import create_app, db
+
+    app = create_app('testing', {'TRUSTED_PROXY_COUNT': 1, 'RATE_LIMIT_ENABLED': True})
+    app.extensions['rate_limiter'] = RateLimiter(MemoryBackend(), {'auth': '1/minute'})
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+def test_forwarded_clients_get_their_own_buckets(proxied_app):
+    client = proxied_app.test_client()
+
+    def login(forwarded_for):
+        return client.post('/api/auth/login', json={'email': 'test@revobank.com', 'password': 'wrong'},
+                           headers={'X-Forwarded-For': forwarded_for},
+                           environ_base={'REMOTE_ADDR': '10.0.0.1'}).status_code
+
+    # Every request comes from the proxy at 10.0.0.1
+    assert [login('203.0.113.1'), login('203.0.113.1')] == [401, 429]
+    assert login('203.0.113.2') == 401
+    # Only the hop the proxy appended is trusted, not what the client sent
+    assert login('198.51.100.9, 203.0.113.1') == 429
+
+def test_address_limited_blueprints_skip_the_token_check(test_client, auth_tokens, limited, monkeypatch):
+    from app.middleware import rate_limit
+
+    decoded = []
+    decode_token = rate_limit.decode_token
+
+    def counting_decode_token(token, **kwargs):
+        decoded.append(token)
+        return decode_token(token, **kwargs)
+
+    monkeypatch.setattr(rate_limit, 'decode_token', counting_decode_token)
+    headers = {'Authorization': f'Bearer {auth_tokens["access_token"]}'}
+    assert test_client.get('/api/auth/users/me', headers=headers).status_code == 200
+    assert decoded == []
+    assert test_client.get('/api/transactions', headers=headers).status_code == 200
+    assert decoded == [auth_tokens['access_token']]
+
+def test_token_revocation_is_checked_once_per_request(app, test_client, auth_tokens, limited, monkeypatch):
+    blocklist = app.extensions['token_blocklist']
+    checks = []
+    is_revoked = blocklist.is_revoked
+    monkeypatch.setattr(blocklist, 'is_revoked', lambda *args: checks.append(args) or is_revoked(*args))
+    headers = {'Authorization': f'Bearer {auth_tokens["access_token"]}'}
+    assert test_client.get('/api/transactions', headers=headers).status_code == 200
+    assert len(checks) == 1
+
+def test_memory_backend_sweeps_full_buckets(monkeypatch):
+    backend = MemoryBackend()
+    monkeypatch.setattr(MemoryBackend, 'SWEEP_INTERVAL', 10)
+    clock = [1000.0]
+    monkeypatch.setattr('app.middleware.rate_limit.time.monotonic', lambda: clock[0])
+
+    for i in range(9):
+        backend.take(f'k{i}', 2, 1)
+    assert len(backend._buckets) == 9
+    clock[0] += 5
+    backend.take('fresh', 2, 1)
+    assert list(backend._buckets) == ['fresh']
@@ -0,0 +1,75 @@
+import shutil
+import pytest
+from sqlalchemy import text
+from app import create_app, db
+from app.middleware.read_replica import RecentWrites
+from app.models.user import User
+from app.models.account import Account
+
+@pytest.fixture
+def replicated(tmp_path):
+    """App on a primary SQLite file and a replica that is a copy of it"""
+    primary, replica = tmp_path / 'primary.db', tmp_path / 'replica.db'
+    flask_app = create_app('testing', {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{primary}',
+        'REPLICA_DATABASE_URI': f'sqlite:///{replica}',
+    })
+    with flask_app.app_context():
+        db.create_all()
+        user = User(username='testuser', email='test@revobank.com')
+        user.set_password('TestPass123!')
+        db.session.add(user)
+        db.session.commit()
+        db.session.add(Account(user_id=user.id, account_type='savings', account_number='ACC-123456', balance=1000))
+        db.session.commit()
+        db.session.remove()
+        db.engine.dispose()
+    shutil.copy(primary, replica)
+    return flask_app
+
+def _headers(client):
+    response = client.post('/api/auth/login', json={'email': 'test@revobank.com', 'password': 'TestPass123!'})
+    return {'Authorization': f'Bearer {response.json["access_token"]}'}
+
+def _set_replica_balance(app, balance):
+    with app.extensions['read_replica'].begin() as connection:
+        connection.execute(text('UPDATE accounts SET balance = :balance'), {'balance': balance})
+
+def test_gets_read_from_the_replica(replicated):
+    client = replicated.test_client()
+    headers = _headers(client)
+    _set_replica_balance(replicated, 5)
+
+    assert client.get('/api/accounts/1', headers=headers).json['balance'] == '5.00'
+    # Only listed blueprints: the login above and this write went to the primary
+    response = client.put('/api/accounts/1', json={'account_type': 'checking'}, headers=headers)
+    assert response.json['balance'] == '1000.00'
+
+def test_clients_read_their_own_writes(replicated):
+    # Like most API clients, these keep no cookies
+    writer = replicated.test_client(use_cookies=False)
+    headers = _headers(writer)
+    response = writer.post('/api/accounts', json={'account_type': 'checking', 'account_number': 'ACC-654321'},
+                           headers=headers)
+    assert response.status_code == 201
+    until = response.headers['X-Read-Primary-Until']
+
+    # Within the window the writer's token reads from the primary
+    assert len(writer.get('/api/accounts', headers=headers).json) == 2
+    assert len(replicated.test_client(use_cookies=False).get('/api/accounts', headers=headers).json) == 2
+
+    # On a host that did not see the write, the echoed header or the cookie does the same
+    replicated.extensions['recent_writes'] = RecentWrites('memory')
+    assert len(writer.get('/api/accounts', headers=headers).json) == 1
+    assert len(writer.get('/api/accounts', headers={**headers, 'X-Read-Primary-Until': until}).json) == 2
+    browser = replicated.test_client()
+    browser.set_cookie('revobank_read_primary_until', until)
+    assert len(browser.get('/api/accounts', headers=headers).json) == 2
+
+def test_recent_writes_are_shared_through_sqlite(tmp_path):
+    path = f'sqlite:///{tmp_path / "writes.db"}'
+    first, second = RecentWrites(path), RecentWrites(path)
+    first.remember(1, 2000.0)
+    first.remember(1, 1000.0)
+    assert second.until(1) == 2000.0
+    assert second.until(2) == 0
@@ -0,0 +1,87 @@
+import json
+import pytest
+from datetime import date, datetime
+from decimal import Decimal
+from flask.json.provider import DefaultJSONProvider
+from app.models import Account, Bill, Budget, Transaction, TransactionCategory
+from app.serialization import OrjsonProvider, serializer_for, orjson
+
+CREATED = datetime(2025, 1, 2, 3, 4, 5, 678901)
+
+SAMPLES = [
+    Account(id=1, user_id=2, account_type='savings', account_number='ACC-1', balance=Decimal('10.50'),
+            created_at=CREATED, updated_at=None, status='active'),
+    Transaction(id=3, type='transfer', amount=Decimal('99.99'), from_account_id=1, to_account_id=2,
+                category_id=None, description='Rent – March', created_at=CREATED),
+    Bill(id=4, user_id=2, account_id=1, biller_name='Power', due_date=date(2025, 2, 1),
+         amount=Decimal('12.00'), created_at=CREATED, updated_at=CREATED),
+    Budget(id=5, user_id=2, name='Food', amount=Decimal('300.00'), start_date=date(2025, 1, 1),
+           end_date=date(2025, 1, 31), created_at=None, updated_at=None),
+    TransactionCategory(id=6, name='Groceries', created_at=CREATED, updated_at=CREATED),
+]
+
+EXPECTED = [
+    {'id': 1, 'user_id': 2, 'account_type': 'savings', 'account_number': 'ACC-1', 'balance': '10.50',
+     'created_at': '2025-01-02T03:04:05.678901', 'updated_at': None, 'status': 'active'},
+    {'id': 3, 'type': 'transfer', 'amount': '99.99', 'from_account_id': 1, 'to_account_id': 2,
+     'category_id': None, 'description': 'Rent – March', 'created_at': '2025-01-02T03:04:05.678901'},
+    {'id': 4, 'user_id': 2, 'account_id': 1, 'biller_name': 'Power', 'due_date': '2025-02-01',
+     'amount': '12.00', 'created_at': '2025-01-02T03:04:05.678901', 'updated_at': '2025-01-02T03:04:05.678901'},
+    {'id': 5, 'user_id': 2, 'name': 'Food', 'amount': '300.00', 'start_date': '2025-01-01',
+     'end_date': '2025-01-31', 'created_at': None, 'updated_at': None},
+    {'id': 6, 'name': 'Groceries', 'created_at': '2025-01-02T03:04:05.678901',
+     'updated_at': '2025-01-02T03:04:05.678901'},
+]
+
+@pytest.mark.parametrize('instance, expected', list(zip(SAMPLES, EXPECTED)), ids=lambda value: type(value).__name__)
+def test_serialize_follows_column_types(instance, expected):
+    serialized = instance.serialize()
+    assert serialized == expected
+    assert list(serialized) == list(expected)
+
+@pytest.mark.parametrize('instance', SAMPLES, ids=lambda instance: type(instance).__name__)
+def test_tuple_serializer_matches_serialize(instance):
+    model = type(instance)
+    row = tuple(getattr(instance, name) for name in model.SERIALIZED_FIELDS)
+    assert serializer_for(model, tuples=True)(row) == instance.serialize()
+
+@pytest.mark.skipif(orjson is None, reason='orjson is not installed')
+@pytest.mark.parametrize('instance', SAMPLES, ids=lambda instance: type(instance).__name__)
+def test_orjson_output_matches_default_provider(app, instance):
+    native = serializer_for(type(instance), native_dates=True)(instance)
+    fast = OrjsonProvider(app).response([native]).get_data()
+    default = DefaultJSONProvider(app).response([instance.serialize()]).get_data()
+    assert fast == default
+
+@pytest.mark.skipif(orjson is None, reason='orjson is not installed')
+def test_orjson_escapes_non_ascii_like_default_provider(app):
+    payload = {'description': 'Café – 日本 🎉', 'plain': 'ascii', 'names': ['Zoë']}
+    fast = OrjsonProvider(app).response(payload).get_data()
+    assert fast.isascii()
+    assert fast == DefaultJSONProvider(app).response(payload).get_data()
+
+def test_list_endpoints_match_serialize(test_client, auth_tokens, init_database):
+    from flask import jsonify
+    from app import db
+
+    db.session.add_all([
+        Bill(user_id=1, account_id=1, biller_name='Water', due_date=date(2025, 3, 1), amount=Decimal('45.10')),
+        Budget(user_id=1, name='Travel', amount=Decimal('800'), start_date=date(2025, 1, 1),
+               end_date=date(2025, 12, 31)),
+        Transaction(type='deposit', amount=Decimal('12.34'), to_account_id=1, description='Salary'),
+        Transaction(type='withdrawal', amount=Decimal('0.50'), from_account_id=1, created_at=CREATED),
+    ])
+    db.session.commit()
+
+    headers = {'Authorization': f'Bearer {auth_tokens["access_token"]}'}
+    transactions = Transaction.query.order_by(Transaction.created_at.desc(), Transaction.id.desc()).all()
+    expected = {
+        '/api/accounts': [a.serialize() for a in Account.query.filter_by(user_id=1)],
+        '/api/bills': [b.serialize() for b in Bill.query.filter_by(user_id=1)],
+        '/api/budgets': [b.serialize() for b in Budget.query.filter_by(user_id=1)],
+        '/api/transactions': {'transactions': [t.serialize() for t in transactions], 'next_cursor': None},
+    }
+    for url, payload in expected.items():
+        response = test_client.get(url, headers=headers)
+        assert response.status_code == 200
+        assert response.get_data() == jsonify(payload).get_data(), url
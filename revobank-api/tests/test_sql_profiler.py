@@ -0,0 +1,51 @@
+import re
+import logging
+import pytest
+from app.middleware.sql_profiler import logger, parameter_shape
+
+@pytest.fixture
+def profiling(app):
+    app.config.update(SQL_PROFILING=True, SLOW_QUERY_MS=1e-6, SLOW_QUERY_EXPLAIN_MS=1e-6)
+    yield app
+    app.config.update(SQL_PROFILING=False, SLOW_QUERY_MS=200, SLOW_QUERY_EXPLAIN_MS=0)
+
+def test_server_timing_reports_sql_time(test_client, auth_tokens, profiling):
+    response = test_client.get('/api/accounts', headers={'Authorization': f'Bearer {auth_tokens["access_token"]}'})
+    db_timing, app_timing = response.headers['Server-Timing'].split(', ')
+    # The version lookup and the accounts select, plus any blocklist refresh
+    assert re.fullmatch(r'db;desc="\d+ queries";dur=[\d.]+', db_timing)
+    assert int(db_timing.split('"')[1].split()[0]) >= 2
+    assert app_timing.startswith('app;dur=')
+    assert float(db_timing.rsplit('=', 1)[1]) <= float(app_timing.rsplit('=', 1)[1])
+
+def test_server_timing_is_off_by_default(test_client, init_database):
+    assert 'Server-Timing' not in test_client.get('/').headers
+
+def test_slow_queries_are_logged_with_plan(test_client, auth_tokens, profiling):
+    records = []
+    handler = logging.Handler()
+    handler.emit = lambda record: records.append(record.fields)
+    logger.addHandler(handler)
+    try:
+        test_client.get('/api/accounts/1', headers={
+            'Authorization': f'Bearer {auth_tokens["access_token"]}', 'X-Request-ID': 'req-7'
+        })
+    finally:
+        logger.removeHandler(handler)
+    [record] = [record for record in records if 'FROM accounts' in record['statement']]
+    assert record['event'] == 'slow_query'
+    assert record['endpoint'] == 'accounts.get_single_account'
+    assert record['request_id'] == 'req-7'
+    assert record['parameters'] == ['int']
+    assert any('accounts' in line for line in record['plan'])
+
+def test_parameter_shape():
+    assert parameter_shape({'id': 1, 'name': 'x'}) == {'id': 'int', 'name': 'str'}
+    assert parameter_shape([{'id': 1}, {'id': 2}]) == '2 x {"id": "int"}'
+    assert parameter_shape(()) == []
+
+def test_slow_query_log_is_written_off_the_request_thread(app):
+    from app.middleware.access_log import DroppingQueueHandler
+
+    assert any(isinstance(handler, DroppingQueueHandler) for handler in logger.handlers)
+    assert not logger.propagate
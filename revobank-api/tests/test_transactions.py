@@ -1,9 +1,12 @@
 import pytest
+import json
 from decimal import Decimal
 from app.models.account import Account
 from app.models.user import User
 from app.models.transaction import Transaction
 from app import db
+from sqlalchemy.exc import OperationalError
+from werkzeug.exceptions import BadRequest
 
 def test_deposit(test_client, auth_tokens, init_database):
     headers = {'Authorization': f'Bearer {auth_tokens["access_token"]}'}
@@ -227,7 +230,46 @@ def test_transaction_date_filtering(test_client, auth_tokens, init_database):
         headers=headers
     )
     assert response.status_code == 200
-    assert len(response.json) >= 1
+    assert len(response.json['transactions']) >= 1
+
+def test_transaction_pagination(test_client, auth_tokens, init_database):
+    headers = {'Authorization': f'Bearer {auth_tokens["access_token"]}'}
+    for amount in range(1, 6):
+        test_client.post('/api/transactions', json={
+            'type': 'deposit',
+            'to_account_id': 1,
+            'amount': amount
+        }, headers=headers)
+
+    seen = []
+    cursor = None
+    while True:
+        url = '/api/transactions?limit=2'
+        if cursor:
+            url += f'&cursor={cursor}'
+        response = test_client.get(url, headers=headers)
+        assert response.status_code == 200
+        assert len(response.json['transactions']) <= 2
+        seen.extend(t['id'] for t in response.json['transactions'])
+        cursor = response.json['next_cursor']
+        if cursor is None:
+            break
+
+    # Newest first, no duplicates or gaps across pages
+    assert seen == [5, 4, 3, 2, 1]
+
+def test_transaction_pagination_limits(test_client, auth_tokens, init_database):
+    headers = {'Authorization': f'Bearer {auth_tokens["access_token"]}'}
+    response = test_client.get('/api/transactions?limit=0', headers=headers)
+    assert response.status_code == 400
+
+    response = test_client.get('/api/transactions?cursor=not-a-cursor', headers=headers)
+    assert response.status_code == 400
+
+    # Oversized pages are clamped to the server maximum
+    response = test_client.get('/api/transactions?limit=1000000', headers=headers)
+    assert response.status_code == 200
+    assert response.json['next_cursor'] is None
 
 def test_negative_amount(test_client, auth_tokens, init_database):
     headers = {'Authorization': f'Bearer {auth_tokens["access_token"]}'}
@@ -238,4 +280,352 @@ def test_negative_amount(test_client, auth_tokens, init_database):
     }, headers=headers)
     
     assert response.status_code == 400
-    assert 'Amount must be positive' in response.json['description']
\ No newline at end of file
+    assert 'Amount must be positive' in response.json['description']
+
+def test_own_transfer_listed_once(test_client, auth_tokens, init_database):
+    account2 = Account(
+        user_id=1,
+        account_type='checking',
+        account_number='ACC-654321',
+        balance=500.00
+    )
+    db.session.add(account2)
+    db.session.commit()
+
+    headers = {'Authorization': f'Bearer {auth_tokens["access_token"]}'}
+    test_client.post('/api/transactions', json={
+        'type': 'transfer',
+        'from_account_id': 1,
+        'to_account_id': 2,
+        'amount': 200.00
+    }, headers=headers)
+
+    response = test_client.get('/api/transactions', headers=headers)
+    assert response.status_code == 200
+    assert len(response.json['transactions']) == 1
+
+def test_history_query_uses_indexes(app, init_database):
+    from app.routes.transactions import _history_query
+
+    query = _history_query(1, {'start_date': '2023-01-01T00:00:00'})
+    compiled = query.compile(dialect=db.engine.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    with db.engine.connect() as conn:
+        plan = [row[-1] for row in conn.exec_driver_sql(
+            'EXPLAIN QUERY PLAN ' + str(compiled), params
+        )]
+
+    # Each branch seeks its own index instead of scanning transactions
+    assert any('ix_transactions_from_account_created_at' in step for step in plan)
+    assert any('ix_transactions_to_account_created_at' in step for step in plan)
+    assert not any(step.startswith('SCAN transactions') for step in plan)
+
+def test_export_transactions_csv(test_client, auth_tokens, init_database):
+    headers = {'Authorization': f'Bearer {auth_tokens["access_token"]}'}
+    for amount in (100, 200):
+        test_client.post('/api/transactions', json={
+            'type': 'deposit',
+            'to_account_id': 1,
+            'amount': amount
+        }, headers=headers)
+
+    response = test_client.get('/api/transactions/export?format=csv', headers=headers)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    lines = response.get_data(as_text=True).splitlines()
+    assert lines[0] == ','.join(Transaction().serialize())
+    assert len(lines) == 3
+
+def test_export_transactions_ndjson(test_client, auth_tokens, init_database):
+    headers = {'Authorization': f'Bearer {auth_tokens["access_token"]}'}
+    test_client.post('/api/transactions', json={
+        'type': 'deposit',
+        'to_account_id': 1,
+        'amount': 100
+    }, headers=headers)
+
+    response = test_client.get('/api/transactions/export?format=ndjson', headers=headers)
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert len(rows) == 1
+    assert list(rows[0]) == list(Transaction().serialize())
+    assert rows[0]['amount'] == '100.00'
+
+    response = test_client.get('/api/transactions/export?format=xml', headers=headers)
+    assert response.status_code == 400
+
+def test_batch_transactions_atomic(test_client, auth_tokens, init_database):
+    account2 = Account(
+        user_id=1,
+        account_type='checking',
+        account_number='ACC-654321',
+        balance=0
+    )
+    db.session.add(account2)
+    db.session.commit()
+
+    headers = {'Authorization': f'Bearer {auth_tokens["access_token"]}'}
+    response = test_client.post('/api/transactions/batch', json=[
+        {'type': 'deposit', 'to_account_id': 1, 'amount': 500},
+        {'type': 'transfer', 'from_account_id': 1, 'to_account_id': 2, 'amount': 1200},
+        {'type': 'withdrawal', 'from_account_id': 2, 'amount': 200},
+    ], headers=headers)
+
+    assert response.status_code == 201
+    assert response.json['committed'] is True
+    assert [r['status'] for r in response.json['results']] == [201, 201, 201]
+    assert db.session.get(Account, 1).balance == Decimal('300.00')
+    assert db.session.get(Account, 2).balance == Decimal('1000.00')
+    assert Transaction.query.count() == 3
+
+def test_batch_transactions_atomic_rollback(test_client, auth_tokens, init_database):
+    headers = {'Authorization': f'Bearer {auth_tokens["access_token"]}'}
+    response = test_client.post('/api/transactions/batch', json=[
+        {'type': 'deposit', 'to_account_id': 1, 'amount': 500},
+        {'type': 'withdrawal', 'from_account_id': 1, 'amount': 5000},
+    ], headers=headers)
+
+    assert response.status_code == 400
+    assert response.json['committed'] is False
+    assert response.json['results'][0]['status'] == 424
+    assert 'Insufficient funds' in response.json['results'][1]['error']
+    assert db.session.get(Account, 1).balance == Decimal('1000.00')
+    assert Transaction.query.count() == 0
+
+def test_batch_transactions_best_effort(test_client, auth_tokens, init_database):
+    headers = {'Authorization': f'Bearer {auth_tokens["access_token"]}'}
+    response = test_client.post('/api/transactions/batch?mode=best_effort', json=[
+        {'type': 'deposit', 'to_account_id': 1, 'amount': 500},
+        {'type': 'loan', 'to_account_id': 1, 'amount': 500},
+        {'type': 'withdrawal', 'from_account_id': 999, 'amount': 10},
+    ], headers=headers)
+
+    assert response.status_code == 207
+    assert [r['status'] for r in response.json['results']] == [201, 400, 404]
+    assert db.session.get(Account, 1).balance == Decimal('1500.00')
+    assert Transaction.query.count() == 1
+
+def test_batch_accepts_string_account_ids(test_client, auth_tokens, init_database):
+    headers = {'Authorization': f'Bearer {auth_tokens["access_token"]}'}
+    response = test_client.post('/api/transactions/batch?mode=best_effort', json=[
+        {'type': 'deposit', 'to_account_id': '1', 'amount': 500},
+        {'type': 'withdrawal', 'from_account_id': 'one', 'amount': 10},
+    ], headers=headers)
+
+    assert response.status_code == 207
+    assert [r['status'] for r in response.json['results']] == [201, 400]
+    assert response.json['results'][0]['transaction']['to_account_id'] == 1
+    assert db.session.get(Account, 1).balance == Decimal('1500.00')
+
+def test_withdrawal_checks_funds_in_database(test_client, auth_tokens, init_database):
+    from app.services.ledger import post_transaction
+
+    # Drain the account behind the session's back so the loaded balance is stale
+    account = db.session.get(Account, 1)
+    assert account.balance == Decimal('1000.00')
+    with db.engine.begin() as conn:
+        conn.execute(db.text("UPDATE accounts SET balance = 100 WHERE id = 1"))
+
+    with pytest.raises(BadRequest, match='Insufficient funds'):
+        post_transaction('withdrawal', Decimal('500'), from_account_id=1)
+
+    db.session.expire_all()
+    assert db.session.get(Account, 1).balance == Decimal('100.00')
+    assert Transaction.query.count() == 0
+
+def test_post_transaction_retries_deadlock(app, init_database, monkeypatch):
+    from app.services import ledger
+
+    class Deadlock(Exception):
+        pgcode = '40P01'
+
+    real_post_once = ledger._post_once
+    calls = []
+
+    def flaky_post_once(*args):
+        calls.append(args)
+        if len(calls) == 1:
+            raise OperationalError('UPDATE accounts', {}, Deadlock())
+        return real_post_once(*args)
+
+    monkeypatch.setattr(ledger, '_post_once', flaky_post_once)
+    monkeypatch.setattr(ledger.time, 'sleep', lambda seconds: None)
+
+    ledger.post_transaction('deposit', Decimal('50'), to_account_id=1)
+
+    assert len(calls) == 2
+    assert db.session.get(Account, 1).balance == Decimal('1050.00')
+
+def test_idempotent_transaction_replay(test_client, auth_tokens, init_database):
+    headers = {
+        'Authorization': f'Bearer {auth_tokens["access_token"]}',
+        'Idempotency-Key': 'deposit-1'
+    }
+    payload = {'type': 'deposit', 'to_account_id': 1, 'amount': 500.00}
+    first = test_client.post('/api/transactions', json=payload, headers=headers)
+    second = test_client.post('/api/transactions', json=payload, headers=headers)
+
+    assert first.status_code == 201
+    assert second.status_code == 201
+    assert second.json == first.json
+    assert second.headers['Idempotent-Replayed'] == 'true'
+    assert Transaction.query.count() == 1
+    assert db.session.get(Account, 1).balance == Decimal('1500.00')
+
+    # Same key with a different body is rejected
+    response = test_client.post('/api/transactions', json=dict(payload, amount=1), headers=headers)
+    assert response.status_code == 422
+
+def test_idempotency_key_in_progress(test_client, auth_tokens, init_database, app, monkeypatch):
+    from datetime import datetime, timedelta
+    from app.models.idempotency_key import IdempotencyKey
+
+    payload = {'type': 'deposit', 'to_account_id': 1, 'amount': 10}
+    response = test_client.post('/api/transactions', json=payload, headers={
+        'Authorization': f'Bearer {auth_tokens["access_token"]}',
+        'Idempotency-Key': 'busy'
+    })
+    record = IdempotencyKey.query.filter_by(key='busy').first()
+
+    # Pretend the first request is still running
+    record.response_status = None
+    record.response_body = None
+    record.locked_until = datetime.utcnow() + timedelta(minutes=1)
+    db.session.commit()
+    monkeypatch.setitem(app.config, 'IDEMPOTENCY_WAIT_TIMEOUT', 0)
+
+    response = test_client.post('/api/transactions', json=payload, headers={
+        'Authorization': f'Bearer {auth_tokens["access_token"]}',
+        'Idempotency-Key': 'busy'
+    })
+    assert response.status_code == 409
+    assert Transaction.query.count() == 1
+
+def test_stale_idempotency_claim_is_taken_over(test_client, auth_tokens, init_database):
+    from datetime import datetime, timedelta
+    from app.models.idempotency_key import IdempotencyKey
+
+    headers = {
+        'Authorization': f'Bearer {auth_tokens["access_token"]}',
+        'Idempotency-Key': 'killed'
+    }
+    payload = {'type': 'deposit', 'to_account_id': 1, 'amount': 10}
+    test_client.post('/api/transactions', json=payload, headers=headers)
+
+    # The worker holding the claim died before storing a response
+    record = IdempotencyKey.query.filter_by(key='killed').first()
+    record.response_status = None
+    record.response_body = None
+    record.locked_until = datetime.utcnow() - timedelta(seconds=1)
+    Transaction.query.delete()
+    db.session.commit()
+
+    response = test_client.post('/api/transactions', json=payload, headers=headers)
+    assert response.status_code == 201
+    assert 'Idempotent-Replayed' not in response.headers
+    assert Transaction.query.count() == 1
+    record = IdempotencyKey.query.filter_by(key='killed').first()
+    assert record.response_status == 201 and record.locked_until is None
+
+def test_prune_expired_idempotency_keys(test_client, auth_tokens, init_database):
+    from datetime import datetime, timedelta
+    from app.models.idempotency_key import IdempotencyKey
+    from app.services.idempotency import prune_idempotency_keys
+
+    now = datetime.utcnow()
+    db.session.add_all([
+        IdempotencyKey(user_id=1, key='old', request_hash='x', response_status=201, expires_at=now - timedelta(hours=1)),
+        IdempotencyKey(user_id=1, key='live', request_hash='x', response_status=201, expires_at=now + timedelta(hours=1)),
+    ])
+    db.session.commit()
+
+    assert prune_idempotency_keys() == 1
+    assert [record.key for record in IdempotencyKey.query.all()] == ['live']
+
+def test_client_error_is_stored_for_idempotency_key(test_client, auth_tokens, init_database):
+    from app.models.idempotency_key import IdempotencyKey
+
+    headers = {
+        'Authorization': f'Bearer {auth_tokens["access_token"]}',
+        'Idempotency-Key': 'too-much'
+    }
+    payload = {'type': 'withdrawal', 'from_account_id': 1, 'amount': 5000}
+    first = test_client.post('/api/transactions', json=payload, headers=headers)
+    assert first.status_code == 400
+    assert IdempotencyKey.query.filter_by(key='too-much').first().response_status == 400
+
+    # The retry gets the same answer even though the funds are now there
+    db.session.get(Account, 1).balance = Decimal('10000.00')
+    db.session.commit()
+    second = test_client.post('/api/transactions', json=payload, headers=headers)
+    assert second.status_code == 400
+    assert second.json == first.json
+    assert second.headers['Idempotent-Replayed'] == 'true'
+    assert Transaction.query.count() == 0
+
+def test_idempotent_posting_commits_with_stored_response(test_client, auth_tokens, init_database, monkeypatch):
+    from app.models.idempotency_key import IdempotencyKey
+
+    def crash(self):
+        raise RuntimeError("worker died")
+
+    # Fail after the posting was written but before the response exists
+    monkeypatch.setattr(Transaction, 'serialize', crash)
+    response = test_client.post('/api/transactions', json={
+        'type': 'deposit', 'to_account_id': 1, 'amount': 10
+    }, headers={
+        'Authorization': f'Bearer {auth_tokens["access_token"]}',
+        'Idempotency-Key': 'crash'
+    })
+    assert response.status_code == 500
+    db.session.expire_all()
+    assert Transaction.query.count() == 0
+    assert db.session.get(Account, 1).balance == Decimal('1000.00')
+    assert IdempotencyKey.query.filter_by(key='crash').count() == 0
+
+def test_transaction_summary_rollups(test_client, auth_tokens, init_database):
+    from app.models.transaction_category import TransactionCategory
+    from app.models.transaction_rollup import TransactionRollup
+    from app.services.rollups import rebuild_rollups
+
+    groceries = TransactionCategory(name='Groceries')
+    account2 = Account(user_id=1, account_type='checking', account_number='ACC-654321', balance=0)
+    db.session.add_all([groceries, account2])
+    db.session.commit()
+
+    headers = {'Authorization': f'Bearer {auth_tokens["access_token"]}'}
+    test_client.post('/api/transactions', json={
+        'type': 'deposit', 'to_account_id': 1, 'amount': 100
+    }, headers=headers)
+    test_client.post('/api/transactions', json={
+        'type': 'withdrawal', 'from_account_id': 1, 'amount': 30, 'category_id': groceries.id
+    }, headers=headers)
+    test_client.post('/api/transactions/batch', json=[
+        {'type': 'withdrawal', 'from_account_id': 1, 'amount': 20, 'category_id': groceries.id},
+        {'type': 'transfer', 'from_account_id': 1, 'to_account_id': 2, 'amount': 50},
+    ], headers=headers)
+
+    response = test_client.get('/api/transactions/summary?group_by=category,type', headers=headers)
+    assert response.status_code == 200
+    assert response.json == [
+        {'category_id': None, 'type': 'deposit', 'amount_in': '100.00', 'amount_out': '0.00', 'transaction_count': 1},
+        {'category_id': None, 'type': 'transfer', 'amount_in': '50.00', 'amount_out': '50.00', 'transaction_count': 2},
+        {'category_id': groceries.id, 'type': 'withdrawal', 'amount_in': '0.00', 'amount_out': '50.00',
+         'transaction_count': 2},
+    ]
+
+    response = test_client.get('/api/transactions/summary?group_by=month,account', headers=headers)
+    assert [row['account_id'] for row in response.json] == [1, 2]
+
+    response = test_client.get('/api/transactions/summary?group_by=day', headers=headers)
+    assert response.status_code == 400
+
+    # Rebuilding from the transactions table gives the same rollups
+    def snapshot():
+        return sorted(
+            (r.account_id, r.month, r.category_id, r.type, r.amount_in, r.amount_out, r.transaction_count)
+            for r in TransactionRollup.query.all()
+        )
+    incremental = snapshot()
+    assert rebuild_rollups() == len(incremental)
+    assert snapshot() == incremental
@@ -0,0 +1,40 @@
+import json
+from app.models.user import User
+
+def test_import_users_from_csv(app, init_database, tmp_path):
+    path = tmp_path / 'users.csv'
+    path.write_text(
+        'username,email,password\n'
+        'alice,alice@example.com,Alice123!\n'
+        'bob,bob@example.com,weak\n'
+        'testuser,dupe@example.com,Dupe1234!\n'
+        'carol,carol@example.com,Carol123!\n'
+    )
+    app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+    try:
+        result = app.test_cli_runner().invoke(
+            args=['import-users', str(path), '--workers', '1', '--batch-size', '2']
+        )
+    finally:
+        app.config['PASSWORD_HASH_METHOD'] = 'scrypt:32768:8:1'
+
+    assert result.exit_code == 0, result.output
+    assert 'Imported 2 users, skipped 1 existing, rejected 1 invalid' in result.stdout
+    assert 'Line 3: Password must be at least 8 characters long' in result.stderr
+    carol = User.query.filter_by(username='carol').one()
+    assert carol.password_hash.startswith('pbkdf2:sha256:1000$')
+    assert carol.check_password('Carol123!')
+
+def test_import_users_from_ndjson(app, init_database, tmp_path):
+    path = tmp_path / 'users.ndjson'
+    path.write_text('\n'.join([
+        json.dumps({'username': 'dave', 'email': 'dave@example.com', 'password': 'Dave1234!'}),
+        'not json',
+        json.dumps({'username': 'erin', 'password': 'Erin1234!'}),
+    ]))
+    result = app.test_cli_runner().invoke(args=['import-users', str(path), '--workers', '1'])
+    assert result.exit_code == 0, result.output
+    assert 'Imported 1 users, skipped 0 existing, rejected 2 invalid' in result.stdout
+    assert 'Line 2: Not a JSON object' in result.stderr
+    assert 'Line 3: Missing email' in result.stderr
+    assert User.query.filter_by(username='dave').one().check_password('Dave1234!')